@@ -0,0 +1,261 @@
+"""
+Admission control and per-client rate limiting for the API's expensive endpoints
+"""
+import math
+import time
+import logging
+import threading
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Dict, IO, Optional
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from metrics import (
+    ADMISSION_QUEUE, ADMISSION_ACTIVE, ADMISSION_REJECTED, ADMISSION_QUEUE_SECONDS, BULK_PREEMPTED_SECONDS
+)
+from config import ADMISSION_CONFIG
+
+logger = logging.getLogger(__name__)
+
+LANES = ("interactive", "bulk")
+
+
+class Overloaded(Exception):
+    """A request refused or dropped by admission control, with a suggested retry delay"""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"Server overloaded ({reason}); retry after {retry_after:.0f}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Run at most max_concurrent requests, queueing up to max_queue more per lane in arrival order.
+
+    Requests belong to the "interactive" or the "bulk" lane. reserved_interactive
+    slots are never given to bulk work, and when both lanes are waiting a freed
+    slot goes to the interactive lane ("strict") or is shared in proportion to
+    the lane weights ("weighted"). A request arriving to a full queue is refused
+    at once. A queued request whose deadline passes before a slot frees up is
+    dropped without running, so no compute is spent on answers its client has
+    stopped waiting for.
+
+    Slots, queues and lanes are per process. Running interactive requests are
+    also announced through a shared lock on interactive_lock_path, so bulk work
+    in every process on the host (such as other serve.py workers) yields to them.
+    """
+
+    def __init__(self, max_concurrent: Optional[int] = None, max_queue: Optional[int] = None,
+                 queue_timeout: Optional[float] = None, reserved_interactive: Optional[int] = None,
+                 policy: Optional[str] = None, weights: Optional[Dict[str, float]] = None,
+                 interactive_lock_path: Optional[str] = None):
+        self.max_concurrent = max_concurrent or ADMISSION_CONFIG["max_concurrent"]
+        self.max_queue = max_queue if max_queue is not None else ADMISSION_CONFIG["max_queue"]
+        self.queue_timeout = queue_timeout or ADMISSION_CONFIG["queue_timeout"]
+        if reserved_interactive is None:
+            reserved_interactive = ADMISSION_CONFIG["reserved_interactive"]
+        # Bulk work always gets at least one slot
+        self.bulk_limit = max(1, self.max_concurrent - reserved_interactive)
+        self.policy = policy or ADMISSION_CONFIG["lane_policy"]
+        if self.policy not in ("weighted", "strict"):
+            raise ValueError(f"Unknown lane policy: {self.policy}")
+        self.weights = dict(weights or ADMISSION_CONFIG["lane_weights"])
+        self.interactive_lock_path = interactive_lock_path or ADMISSION_CONFIG["interactive_lock_path"]
+        self.active = 0
+        self.lane_active = {lane: 0 for lane in LANES}
+        self._waiting = {lane: deque() for lane in LANES}
+        # Stride scheduling: each grant advances a lane's pass by 1/weight and the lowest pass goes next
+        self._pass = {lane: 0.0 for lane in LANES}
+        self._virtual_time = 0.0
+        self._condition = threading.Condition()
+        self._service_time = None  # moving average of seconds per admitted request
+
+    def retry_after(self) -> float:
+        """Seconds until a slot is likely to free up for a newcomer"""
+        service_time = self._service_time or 1.0
+        waiting = sum(len(waiting) for waiting in self._waiting.values())
+        return max(1.0, math.ceil(service_time * (waiting + 1) / self.max_concurrent))
+
+    def _has_room(self, lane: str) -> bool:
+        if self.active >= self.max_concurrent:
+            return False
+        return lane == "interactive" or self.lane_active["bulk"] < self.bulk_limit
+
+    def _announce_interactive(self) -> Optional[IO]:
+        """Take a shared lock that tells other processes an interactive request is running.
+
+        Closing the returned file releases it; None where file locks are unavailable.
+        """
+        if fcntl is None or not self.interactive_lock_path:
+            return None
+        try:
+            marker = open(self.interactive_lock_path, 'a')
+        except OSError as e:
+            logger.warning(f"Cannot announce interactive requests through {self.interactive_lock_path}: {e}")
+            return None
+        fcntl.flock(marker, fcntl.LOCK_SH)
+        return marker
+
+    def _interactive_running(self) -> bool:
+        """Whether an interactive request holds a slot in this or any other process"""
+        if self.lane_active["interactive"]:
+            return True
+        if fcntl is None or not self.interactive_lock_path:
+            return False
+        try:
+            with open(self.interactive_lock_path, 'a') as probe:
+                # Fails while any process holds the shared lock
+                fcntl.flock(probe, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return True
+        except OSError:
+            return False
+        return False
+
+    def _next_lane(self) -> Optional[str]:
+        """The lane whose head request gets the next free slot, if any can run now"""
+        ready = [lane for lane in LANES if self._waiting[lane] and self._has_room(lane)]
+        if len(ready) < 2:
+            return ready[0] if ready else None
+        if self.policy == "strict":
+            return "interactive"
+        return min(ready, key=lambda lane: self._pass[lane])
+
+    @contextmanager
+    def slot(self, deadline: Optional[float] = None, lane: str = "interactive"):
+        """Hold a slot in lane for the duration of the block; raises Overloaded if none is granted.
+
+        deadline is a time.monotonic() value; queueing never outlasts queue_timeout.
+        """
+        if lane not in LANES:
+            raise ValueError(f"Unknown lane: {lane}")
+        arrived = time.monotonic()
+        queue_deadline = arrived + self.queue_timeout
+        if deadline is not None:
+            queue_deadline = min(queue_deadline, deadline)
+
+        ticket = object()
+        waiting = self._waiting[lane]
+        with self._condition:
+            if not waiting:
+                # A lane returning from idle does not get to spend credit it banked meanwhile
+                self._pass[lane] = max(self._pass[lane], self._virtual_time)
+            waiting.append(ticket)
+            try:
+                if self._next_lane() != lane or waiting[0] is not ticket:
+                    if len(waiting) > self.max_queue:
+                        ADMISSION_REJECTED.inc(reason="queue_full")
+                        raise Overloaded("queue full", self.retry_after())
+                    ADMISSION_QUEUE.inc(lane=lane)
+                    try:
+                        while self._next_lane() != lane or waiting[0] is not ticket:
+                            remaining = queue_deadline - time.monotonic()
+                            if remaining <= 0:
+                                ADMISSION_REJECTED.inc(reason="deadline")
+                                raise Overloaded("deadline passed while queued", self.retry_after())
+                            self._condition.wait(remaining)
+                    finally:
+                        ADMISSION_QUEUE.dec(lane=lane)
+            finally:
+                waiting.remove(ticket)
+                # The next in line may be able to go now, or has become the head
+                self._condition.notify_all()
+            self._virtual_time = self._pass[lane]
+            self._pass[lane] += 1.0 / self.weights.get(lane, 1.0)
+            self.active += 1
+            self.lane_active[lane] += 1
+            ADMISSION_ACTIVE.inc(lane=lane)
+        ADMISSION_QUEUE_SECONDS.observe(time.monotonic() - arrived, lane=lane)
+
+        start_time = time.monotonic()
+        marker = self._announce_interactive() if lane == "interactive" else None
+        try:
+            yield
+        finally:
+            if marker is not None:
+                marker.close()
+            elapsed = time.monotonic() - start_time
+            with self._condition:
+                self.active -= 1
+                self.lane_active[lane] -= 1
+                ADMISSION_ACTIVE.dec(lane=lane)
+                self._service_time = elapsed if self._service_time is None else 0.8 * self._service_time + 0.2 * elapsed
+                self._condition.notify_all()
+
+    def yield_to_interactive(self, paused: float = 0.0, max_pause: Optional[float] = None) -> float:
+        """Pause bulk work at a stage boundary while interactive requests run in any process.
+
+        paused is the seconds the document has already been held. Returns the
+        seconds paused; a pause never exceeds max_pause, and a document is never
+        held for more than preempt_max_total in all, so bulk work keeps moving
+        under steady interactive load.
+        """
+        if max_pause is None:
+            max_pause = ADMISSION_CONFIG["preempt_max_pause"]
+        max_pause = min(max_pause, ADMISSION_CONFIG["preempt_max_total"] - paused)
+        if max_pause <= 0:
+            return 0.0
+        start_time = time.monotonic()
+        with self._condition:
+            while self._interactive_running():
+                remaining = start_time + max_pause - time.monotonic()
+                if remaining <= 0:
+                    break
+                # Requests finishing in other processes cannot notify us, so poll for them
+                self._condition.wait(min(remaining, ADMISSION_CONFIG["preempt_poll_interval"]))
+        paused = time.monotonic() - start_time
+        if paused > 0.001:
+            BULK_PREEMPTED_SECONDS.inc(paused)
+            return paused
+        return 0.0
+
+
+class TokenBucket:
+    """Allow rate requests per second on average with bursts of up to capacity"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Spend a token; returns 0, or the seconds until one is available if none is"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """One token bucket per client, keeping the most recently seen max_clients"""
+
+    def __init__(self, rate: Optional[float] = None, burst: Optional[float] = None,
+                 max_clients: Optional[int] = None):
+        self.rate = rate or ADMISSION_CONFIG["rate_per_client"]
+        self.burst = burst or ADMISSION_CONFIG["burst_per_client"]
+        self.max_clients = max_clients or ADMISSION_CONFIG["max_clients"]
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def check(self, client: str) -> float:
+        """0 if client may make a request now, else the seconds until it may"""
+        with self._lock:
+            bucket = self._buckets.get(client)
+            if bucket is None:
+                bucket = self._buckets[client] = TokenBucket(self.rate, self.burst)
+                if len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(client)
+            wait = bucket.take()
+        if wait:
+            ADMISSION_REJECTED.inc(reason="rate_limit")
+        return wait
@@ -3,12 +3,15 @@ Advanced analytics and statistics for PDF processing
 """
 import pandas as pd
 import numpy as np
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Optional, Tuple
 import re
 from collections import Counter
 import logging
 from datetime import datetime, timedelta
 
+from dedup import MinHasher, candidate_pairs
+from config import ANALYTICS_CONFIG
+
 logger = logging.getLogger(__name__)
 
 class DocumentAnalytics:
@@ -183,6 +186,11 @@ class DocumentComparator:
     
     def __init__(self, results: List[Dict[str, Any]]):
         self.results = results
+        # Built once so repeated comparisons and clusterings reuse them
+        self.keyword_sets = [set(doc.get('keywords', [])) for doc in results]
+        self._incidence = None
+        self._signatures = None
+        self._tfidf_matrix = None
     
     def calculate_similarity(self, doc1: Dict[str, Any], doc2: Dict[str, Any]) -> float:
         """Calculate similarity between two documents"""
@@ -198,20 +206,100 @@ class DocumentComparator:
         
         return len(intersection) / len(union) if union else 0.0
     
-    def find_similar_documents(self, threshold: float = 0.3) -> List[Dict[str, Any]]:
-        """Find documents with similarity above threshold"""
-        similar_pairs = []
-        
-        for i, doc1 in enumerate(self.results):
-            for j, doc2 in enumerate(self.results[i+1:], i+1):
-                similarity = self.calculate_similarity(doc1, doc2)
-                if similarity >= threshold:
-                    similar_pairs.append({
-                        "doc1": doc1['file_name'],
-                        "doc2": doc2['file_name'],
-                        "similarity": similarity,
-                        "common_keywords": list(set(doc1.get('keywords', [])).intersection(set(doc2.get('keywords', []))))
-                    })
+    def _keyword_matrix(self):
+        """Sparse document-keyword incidence matrix (CSR, one row per document) and keyword counts"""
+        if self._incidence is None:
+            from scipy import sparse
+            
+            vocabulary: Dict[str, int] = {}
+            columns = [vocabulary.setdefault(keyword, len(vocabulary))
+                       for keywords in self.keyword_sets for keyword in keywords]
+            row_lengths = [len(keywords) for keywords in self.keyword_sets]
+            indptr = np.concatenate(([0], np.cumsum(row_lengths))).astype(np.int64)
+            matrix = sparse.csr_matrix(
+                (np.ones(len(columns), dtype=np.int32), np.array(columns, dtype=np.int64), indptr),
+                shape=(len(self.keyword_sets), len(vocabulary))
+            )
+            self._incidence = (matrix, np.array(row_lengths, dtype=np.int64))
+        return self._incidence
+    
+    def _exact_pairs(self, threshold: float) -> List[Tuple[int, int, float]]:
+        """Every pair at or above threshold, with Jaccard computed from blocks of X @ X.T"""
+        matrix, sizes = self._keyword_matrix()
+        transposed = matrix.T.tocsr()
+        block_size = ANALYTICS_CONFIG["similarity_block_size"]
+        pairs = []
+        for start in range(0, matrix.shape[0], block_size):
+            block = matrix[start:start + block_size]
+            if threshold > 0:
+                # Only pairs sharing a keyword can reach a positive threshold
+                overlap = (block @ transposed).tocoo()
+                rows, cols, common = overlap.row + start, overlap.col, overlap.data
+            else:
+                overlap = (block @ transposed).toarray()
+                rows, cols = np.indices(overlap.shape)
+                rows, cols, common = rows.ravel() + start, cols.ravel(), overlap.ravel()
+            keep = cols > rows
+            rows, cols, common = rows[keep], cols[keep], common[keep]
+            # A document without keywords is 0.0 similar to any other, as in calculate_similarity
+            union = sizes[rows] + sizes[cols] - common
+            similarity = np.divide(common, union, out=np.zeros(len(common)), where=union > 0)
+            keep = similarity >= threshold
+            pairs.extend(zip(rows[keep].tolist(), cols[keep].tolist(), similarity[keep].tolist()))
+        return pairs
+    
+    def _lsh_pairs(self, threshold: float) -> List[Tuple[int, int, float]]:
+        """Pairs at or above threshold among MinHash-LSH candidates, scored exactly"""
+        matrix, sizes = self._keyword_matrix()
+        hasher = MinHasher(ANALYTICS_CONFIG["similarity_lsh_num_perm"])
+        if self._signatures is None or self._signatures.shape[1] != hasher.num_perm:
+            self._signatures = np.array([hasher.signature(keywords) for keywords in self.keyword_sets],
+                                        dtype=np.uint64).reshape(len(self.keyword_sets), hasher.num_perm)
+        
+        # Band for a lower similarity than reported so pairs near the threshold are still found
+        documents = np.flatnonzero(sizes)
+        candidates = documents[candidate_pairs(self._signatures[documents],
+                                               threshold * ANALYTICS_CONFIG["similarity_lsh_threshold_ratio"])]
+        logger.info(f"LSH proposed {len(candidates)} of {len(documents) * (len(documents) - 1) // 2} pairs")
+        
+        pairs = []
+        chunk = ANALYTICS_CONFIG["similarity_block_size"] ** 2
+        for start in range(0, len(candidates), chunk):
+            rows, cols = candidates[start:start + chunk].T
+            common = np.asarray(matrix[rows].multiply(matrix[cols]).sum(axis=1)).ravel()
+            similarity = common / (sizes[rows] + sizes[cols] - common)
+            keep = similarity >= threshold
+            pairs.extend(zip(rows[keep].tolist(), cols[keep].tolist(), similarity[keep].tolist()))
+        return pairs
+    
+    def find_similar_documents(self, threshold: float = 0.3, method: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Find documents whose keyword Jaccard similarity is at least threshold, most similar first.
+        
+        method is "exact" (sparse matrix products over all pairs), "lsh" (only
+        pairs proposed by MinHash-LSH are scored, so a few pairs near the
+        threshold may be missed) or "auto", which switches to "lsh" for
+        collections of similarity_lsh_min_documents or more.
+        """
+        method = method or ANALYTICS_CONFIG["similarity_method"]
+        if method not in ("auto", "exact", "lsh"):
+            raise ValueError(f"Unknown similarity method: {method}")
+        if method == "auto":
+            method = "lsh" if len(self.results) >= ANALYTICS_CONFIG["similarity_lsh_min_documents"] else "exact"
+        if len(self.results) < 2:
+            return []
+        
+        if method == "lsh" and threshold > 0:
+            pairs = self._lsh_pairs(threshold)
+        else:
+            pairs = self._exact_pairs(threshold)
+        
+        pairs.sort(key=lambda pair: (pair[0], pair[1]))
+        similar_pairs = [{
+            "doc1": self.results[i]['file_name'],
+            "doc2": self.results[j]['file_name'],
+            "similarity": similarity,
+            "common_keywords": list(self.keyword_sets[i] & self.keyword_sets[j])
+        } for i, j, similarity in pairs]
         
         return sorted(similar_pairs, key=lambda x: x['similarity'], reverse=True)
     
@@ -223,15 +311,17 @@ class DocumentComparator:
         if len(self.results) < n_clusters:
             return {"cluster_0": [doc['file_name'] for doc in self.results]}
         
-        # Prepare text data for clustering
-        texts = []
-        for doc in self.results:
-            text = f"{doc.get('title', '')} {' '.join(doc.get('keywords', []))}"
-            texts.append(text)
-        
-        # Vectorize texts
-        vectorizer = TfidfVectorizer(max_features=100, stop_words='english')
-        tfidf_matrix = vectorizer.fit_transform(texts)
+        if self._tfidf_matrix is None:
+            # Prepare text data for clustering
+            texts = []
+            for doc in self.results:
+                text = f"{doc.get('title', '')} {' '.join(doc.get('keywords', []))}"
+                texts.append(text)
+            
+            # Vectorize texts
+            vectorizer = TfidfVectorizer(max_features=100, stop_words='english')
+            self._tfidf_matrix = vectorizer.fit_transform(texts)
+        tfidf_matrix = self._tfidf_matrix
         
         # Perform clustering
         kmeans = KMeans(n_clusters=n_clusters, random_state=42)
@@ -1,32 +1,164 @@
 """
 REST API endpoints for PDF processing
 """
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, request, jsonify, send_file, g, make_response, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 import os
 import tempfile
 import json
 from typing import Dict, Any
+import time
 import logging
+from functools import wraps
+from contextlib import ExitStack
 from werkzeug.utils import secure_filename
 
 from summarizer import (
-    extract_text_from_pdf, improved_extract_title, extract_authors,
-    summarize, extract_keywords_with_bert, clean_text
+    extract_title_and_authors, summarize, extract_keywords_with_bert, clean_text
 )
-from batch_processor import BatchProcessor
-from analytics import DocumentAnalytics
+from extraction_pool import parse_document, ExtractionError
+from timing import StageTimer
+from batch_processor import BatchProcessor, BatchStatistics
+from job_manager import JobManager
+from dataset_store import Dataset, DatasetStore
+from uploads import iter_uploads, UploadError
+from archives import is_archive, iter_archive_pdfs, ArchiveError
+from upload_sessions import UploadSessions, UploadSessionError
+from result_cache import ResultCache, cache_key
+from serialization import dumps, compress_response
+from admission import AdmissionController, RateLimiter, Overloaded
+from stages import ALL_STAGES, ALL_FIELDS, resolve_stages, select_fields
+from metrics import REGISTRY, HTTP_REQUESTS, HTTP_LATENCY, HTTP_IN_FLIGHT, CACHE_REQUESTS, JOBS, observe_stages
+from config import RESULT_CACHE_CONFIG, METRICS_CONFIG, ADMISSION_CONFIG, ARCHIVE_CONFIG
 from export_manager import ExportManager
 
 logger = logging.getLogger(__name__)
 
+class FastJSONProvider(DefaultJSONProvider):
+    """Encode jsonify responses with serialization.dumps (orjson when installed)"""
+    
+    def dumps(self, obj, **kwargs):
+        return dumps(obj).decode('utf-8')
+    
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj), mimetype=self.mimetype)
+
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 CORS(app)  # Enable CORS for all routes
 
 # Configuration
 app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max file size
 ALLOWED_EXTENSIONS = {'pdf'}
 
+admission = AdmissionController()
+rate_limiter = RateLimiter()
+
+def _bulk_checkpoint(paused):
+    """Hold bulk documents at stage boundaries while interactive requests run"""
+    if not (ADMISSION_CONFIG["enabled"] and ADMISSION_CONFIG["preempt_bulk"]):
+        return 0.0
+    return admission.yield_to_interactive(paused)
+
+dataset_store = DatasetStore()
+job_manager = JobManager(datasets=dataset_store, checkpoint=_bulk_checkpoint)
+upload_sessions = UploadSessions()
+result_cache = ResultCache()
+
+def _update_job_gauges():
+    for status, count in job_manager.counts().items():
+        JOBS.set(count, status=status)
+
+# Refreshed for every snapshot, so serve.py workers publish current job counts to each other
+REGISTRY.add_collector(_update_job_gauges)
+
+@app.before_request
+def _start_request_metrics():
+    g.request_start = time.perf_counter()
+    HTTP_IN_FLIGHT.inc()
+
+@app.after_request
+def _record_request_metrics(response):
+    if METRICS_CONFIG["enabled"] and 'request_start' in g:
+        # Label by route pattern, not the raw path, so job and dataset ids do not multiply series
+        endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+        HTTP_REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+        HTTP_LATENCY.observe(time.perf_counter() - g.request_start, endpoint=endpoint)
+    return response
+
+@app.after_request
+def _compress_response(response):
+    # Registered after the metrics hook so it runs first; latency includes compression
+    response, _ = compress_response(response, request.accept_encodings)
+    return response
+
+@app.teardown_request
+def _finish_request_metrics(exc):
+    if 'request_start' in g:
+        HTTP_IN_FLIGHT.dec()
+
+def _retry_response(message, status, retry_after):
+    response = jsonify({"error": message})
+    response.status_code = status
+    response.headers['Retry-After'] = str(max(1, int(retry_after + 0.999)))
+    return response
+
+def _client_id():
+    """A configured API key, else the remote address; unknown keys cannot buy fresh rate limits"""
+    key = request.headers.get(ADMISSION_CONFIG["client_header"])
+    if key and key in ADMISSION_CONFIG["api_keys"]:
+        return f"key:{key}"
+    return request.remote_addr or "unknown"
+
+def admitted(queued=True, lane="interactive"):
+    """Rate-limit an endpoint per client and, if queued, run it under admission control.
+    
+    Clients over their token bucket get 429 and a full queue gets 503, both with
+    Retry-After and before the request body is read. Clients may cap their total
+    wait with the deadline header, and move an interactive request to the bulk
+    lane with the lane header.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not ADMISSION_CONFIG["enabled"]:
+                return view(*args, **kwargs)
+            
+            client = _client_id()
+            wait = rate_limiter.check(client)
+            if wait:
+                return _retry_response("Rate limit exceeded", 429, wait)
+            if not queued:
+                return view(*args, **kwargs)
+            
+            timeout = request.headers.get(ADMISSION_CONFIG["deadline_header"], type=float)
+            deadline = time.monotonic() + timeout if timeout is not None else None
+            request_lane = lane
+            if request.headers.get(ADMISSION_CONFIG["lane_header"], "").strip().lower() == "bulk":
+                request_lane = "bulk"
+            slot = ExitStack()
+            try:
+                slot.enter_context(admission.slot(deadline, lane=request_lane))
+            except Overloaded as e:
+                logger.warning(f"Refused {request.path} from {client}: {e.reason}")
+                return _retry_response(str(e), 503, e.retry_after)
+            
+            try:
+                response = make_response(view(*args, **kwargs))
+            except BaseException:
+                slot.close()
+                raise
+            if response.is_streamed:
+                # Streamed bodies are produced after the view returns; hold the slot until sent
+                response.call_on_close(slot.close)
+            else:
+                slot.close()
+            return response
+        return wrapper
+    return decorator
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
@@ -39,123 +171,500 @@ def health_check():
         "version": "1.0.0"
     })
 
+def _process_document(pdf_path, data, filename, run_stages=ALL_STAGES, fields=None):
+    """Run the pipeline stages on one PDF; returns (response body, status code)"""
+    timer = StageTimer()
+    try:
+        parsed = parse_document(pdf_path, data=data)
+    except ExtractionError as e:
+        error = e.to_dict()
+        error["file_path"] = filename
+        return error, 422
+    timer.merge(parsed["timings"])
+    
+    text = parsed["text"]
+    if not text.strip():
+        return {"error": "No text could be extracted from the PDF"}, 400
+    
+    result = {"file_name": filename}
+    if "metadata" in run_stages:
+        result.update(extract_title_and_authors(
+            text, pdf_path=pdf_path,
+            embedded_metadata=parsed["embedded_metadata"],
+            text_with_font=parsed["text_with_font"],
+            timer=timer
+        ))
+    
+    # Generate summary
+    if "summarize" in run_stages:
+        with timer.stage("summarize"):
+            cleaned_text = clean_text(text)
+            result["summary"] = summarize(cleaned_text[:3000])
+    
+    # Extract keywords
+    if "keywords" in run_stages:
+        with timer.stage("keywords"):
+            result["keywords"] = extract_keywords_with_bert(result["summary"])
+    
+    # Calculate statistics
+    if "summarize" in run_stages:
+        result["statistics"] = {
+            "character_count": len(text),
+            "word_count": len(text.split()),
+            "sentence_count": len(text.split('.')),
+            "compression_ratio": len(result["summary"]) / len(text) if text else 0
+        }
+    
+    if fields is not None:
+        result = select_fields(result, fields)
+    result["timings"] = {"stages": timer.as_dict()}
+    result["status"] = "success"
+    observe_stages(result["timings"]["stages"])
+    return result, 200
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus text exposition of request, stage, cache, job and memory metrics"""
+    return app.response_class(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/process', methods=['POST'])
+@admitted()
 def process_single_pdf():
-    """Process a single PDF file"""
+    """Process a single PDF file.
+    
+    Results are cached by content hash and sent with an ETag; a client that
+    already holds them gets 304 Not Modified via If-None-Match. Concurrent
+    uploads of the same PDF share one run of the pipeline.
+    
+    Optional fields= and stages= query parameters (comma-separated) limit the
+    work to those outputs and the stages they depend on, e.g. fields=title,authors
+    returns metadata without loading any model.
+    """
+    upload = None
     try:
-        if 'file' not in request.files:
-            return jsonify({"error": "No file provided"}), 400
+        try:
+            run_stages, fields = resolve_stages(request.args.get('fields'), request.args.get('stages'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        partial = run_stages != ALL_STAGES or fields != ALL_FIELDS
         
-        file = request.files['file']
-        if file.filename == '':
+        # Read the body as a stream; small files stay in memory, large ones spill to disk
+        uploads = iter_uploads(request.stream, request.content_type, 'file')
+        try:
+            upload = next(uploads, None)
+        finally:
+            uploads.close()
+        if upload is None:
+            return jsonify({"error": "No file provided"}), 400
+        if upload.filename == '':
             return jsonify({"error": "No file selected"}), 400
         
-        if not allowed_file(file.filename):
+        if not allowed_file(upload.filename):
             return jsonify({"error": "Invalid file type. Only PDF files are allowed"}), 400
         
-        # Save uploaded file temporarily
-        filename = secure_filename(file.filename)
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-            file.save(tmp_file.name)
-            tmp_path = tmp_file.name
+        filename = upload.safe_name
+        pdf_path, data = upload.source()
+        if not RESULT_CACHE_CONFIG["enabled"]:
+            body, status = _process_document(pdf_path, data, filename, run_stages, fields)
+            return jsonify(body), status
         
-        try:
-            # Process the PDF
-            text = extract_text_from_pdf(tmp_path)
-            if not text.strip():
-                return jsonify({"error": "No text could be extracted from the PDF"}), 400
-            
-            title = improved_extract_title(text, pdf_path=tmp_path)
-            authors = extract_authors(text, title=title, pdf_path=tmp_path)
-            
-            # Generate summary
-            cleaned_text = clean_text(text)
-            summary = summarize(cleaned_text[:3000])
-            
-            # Extract keywords
-            keywords = extract_keywords_with_bert(summary)
-            
-            # Calculate statistics
-            stats = {
-                "character_count": len(text),
-                "word_count": len(text.split()),
-                "sentence_count": len(text.split('.')),
-                "compression_ratio": len(summary) / len(text) if text else 0
-            }
-            
-            result = {
-                "file_name": filename,
-                "title": title,
-                "authors": authors,
-                "summary": summary,
-                "keywords": keywords,
-                "statistics": stats,
-                "status": "success"
-            }
-            
-            return jsonify(result)
+        # The body differs only in file_name between uploads of one PDF, hence a weak ETag
+        if partial:
+            key = cache_key(upload.content_hash, stages=run_stages, fields=fields)
+        else:
+            key = cache_key(upload.content_hash)
+        if request.if_none_match.contains_weak(key):
+            response = app.response_class(status=304)
+            response.set_etag(key, weak=True)
+            return response
+        
+        body, status = result_cache.get(key), 200
+        cache_status = "HIT"
+        if body is None:
+            def compute():
+                body, status = _process_document(pdf_path, data, filename, run_stages, fields)
+                if status == 200:
+                    result_cache.put(key, body)
+                return body, status
             
-        finally:
-            # Clean up temporary file
-            if os.path.exists(tmp_path):
-                os.unlink(tmp_path)
+            (body, status), shared = result_cache.run_once(key, compute)
+            cache_status = "SHARED" if shared else "MISS"
+        CACHE_REQUESTS.inc(cache="result", result=cache_status.lower())
+        if status != 200:
+            return jsonify(body), status
+        
+        response = jsonify(dict(body, file_name=filename))
+        response.set_etag(key, weak=True)
+        response.headers['X-Cache'] = cache_status
+        return response
+    
+    except UploadError as e:
+        return jsonify({"error": str(e)}), e.status
     
     except Exception as e:
         logger.error(f"Error processing PDF: {e}")
         return jsonify({"error": str(e)}), 500
+    
+    finally:
+        # Clean up the spooled upload
+        if upload is not None:
+            upload.cleanup()
+
+def _validate_uploads():
+    """Return the uploaded PDF files, or an error response tuple"""
+    if 'files' not in request.files:
+        return None, (jsonify({"error": "No files provided"}), 400)
+    
+    files = request.files.getlist('files')
+    if not files or files[0].filename == '':
+        return None, (jsonify({"error": "No files selected"}), 400)
+    
+    for file in files:
+        if not allowed_file(file.filename):
+            return None, (jsonify({"error": f"Invalid file type: {file.filename}. Only PDF files are allowed"}), 400)
+    return files, None
+
+def _save_uploads(files):
+    """Save uploads to temporary files; returns (paths, {path: original file name})"""
+    temp_paths = []
+    file_names = {}
+    try:
+        for file in files:
+            with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
+                file.save(tmp_file.name)
+                temp_paths.append(tmp_file.name)
+                file_names[tmp_file.name] = secure_filename(file.filename)
+    except Exception:
+        _remove_files(temp_paths)
+        raise
+    return temp_paths, file_names
+
+def _remove_files(paths):
+    for path in paths:
+        if os.path.exists(path):
+            os.unlink(path)
 
 @app.route('/batch', methods=['POST'])
+@admitted(lane="bulk")
 def process_batch():
-    """Process multiple PDF files"""
+    """Process multiple PDF files, starting on each as soon as it has been received.
+    
+    With Accept: application/x-ndjson each result is streamed as a line as soon
+    as it completes, followed by a {"summary": ...} line.
+    """
+    uploads = {}
+    # Archives may be larger than the limit for a single PDF
+    request.max_content_length = max(app.config['MAX_CONTENT_LENGTH'],
+                                     ARCHIVE_CONFIG["max_upload_size_mb"] * 1024 * 1024)
+    
+    def received_files():
+        for upload in iter_uploads(request.stream, request.content_type, 'files', allow_archives=True):
+            if upload.filename == '':
+                upload.cleanup()
+                raise UploadError("No files selected")
+            if is_archive(upload.filename):
+                # Members are read one at a time from the spooled archive, never extracted to disk
+                uploads[upload.name] = upload
+                path, data = upload.source()
+                try:
+                    yield from iter_archive_pdfs(data if data is not None else path, name=upload.name)
+                    uploads.pop(upload.name).cleanup()
+                except ArchiveError as e:
+                    # Reported as the archive's own error result, which releases the upload
+                    yield upload.name, e
+                continue
+            if not allowed_file(upload.filename):
+                # Reported as the file's own error result, keeping the results of the others
+                upload.cleanup()
+                yield upload.name, UploadError(f"Invalid file type: {upload.filename}. "
+                                               "Only PDF, ZIP and TAR files are allowed")
+                continue
+            source = upload.source()
+            uploads[source[0]] = upload
+            yield source
+    
+    def cleanup():
+        # Clean up spooled uploads
+        for upload in uploads.values():
+            upload.cleanup()
+        uploads.clear()
+    
+    streaming = request.accept_mimetypes.best_match(
+        ['application/json', 'application/x-ndjson']) == 'application/x-ndjson'
     try:
-        if 'files' not in request.files:
-            return jsonify({"error": "No files provided"}), 400
+        if streaming:
+            streamed = Response(stream_with_context(_stream_batch(received_files(), uploads, cleanup)),
+                                mimetype='application/x-ndjson')
+            streamed.headers['X-Accel-Buffering'] = 'no'
+            return streamed
         
-        files = request.files.getlist('files')
-        if not files or files[0].filename == '':
-            return jsonify({"error": "No files selected"}), 400
+        # Process batch
+        processor = BatchProcessor(checkpoint=_bulk_checkpoint)
+        batch_results = processor.process_batch(
+            received_files(), progress_callback=lambda done, total, result: _release_upload(uploads, result))
+        if batch_results["total_files"] == 0:
+            return jsonify({"error": "No files provided"}), 400
         
-        # Validate all files
-        for file in files:
-            if not allowed_file(file.filename):
-                return jsonify({"error": f"Invalid file type: {file.filename}. Only PDF files are allowed"}), 400
+        # Keep the results server-side for /analyze, /compare and /cluster
+        batch_results["dataset_id"] = dataset_store.create(batch_results["results"], source="batch").dataset_id
         
-        # Save files temporarily
-        temp_paths = []
-        try:
-            for file in files:
-                filename = secure_filename(file.filename)
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-                    file.save(tmp_file.name)
-                    temp_paths.append(tmp_file.name)
-            
-            # Process batch
-            processor = BatchProcessor()
-            batch_results = processor.process_batch(temp_paths)
-            
-            return jsonify(batch_results)
-            
-        finally:
-            # Clean up temporary files
-            for tmp_path in temp_paths:
-                if os.path.exists(tmp_path):
-                    os.unlink(tmp_path)
+        return jsonify(batch_results)
+    
+    except UploadError as e:
+        return jsonify({"error": str(e)}), e.status
     
     except Exception as e:
         logger.error(f"Error processing batch: {e}")
         return jsonify({"error": str(e)}), 500
+    
+    finally:
+        if not streaming:
+            cleanup()
 
-@app.route('/analyze', methods=['POST'])
-def analyze_results():
-    """Analyze processing results"""
+def _release_upload(uploads, result):
+    """Free a file's spooled contents once its result is in"""
+    upload = uploads.pop(result["file_path"], None)
+    if upload is not None:
+        upload.cleanup()
+
+def _stream_batch(files, uploads, cleanup):
+    """NDJSON lines for /batch: one per result as it completes, then the summary.
+    
+    Each upload is released once its result is sent, so neither results nor
+    file contents accumulate. Errors after the first line cannot change the
+    status code and are reported as a final {"error": ...} line instead.
+    """
+    statistics = BatchStatistics()
+    try:
+        for result in BatchProcessor(checkpoint=_bulk_checkpoint).iter_batch(files):
+            statistics.add(result)
+            _release_upload(uploads, result)
+            yield dumps(result) + b"\n"
+        
+        if statistics.total_files == 0:
+            yield dumps({"error": "No files provided"}) + b"\n"
+        else:
+            yield dumps({"summary": statistics.summary()}) + b"\n"
+    except Exception as e:
+        logger.error(f"Error streaming batch: {e}")
+        yield dumps({"error": str(e), "summary": statistics.summary()}) + b"\n"
+    finally:
+        cleanup()
+
+@app.route('/jobs', methods=['POST'])
+@admitted(queued=False)
+def create_job():
+    """Start a batch in the background and return its job id immediately"""
+    temp_paths = []
+    try:
+        files, error_response = _validate_uploads()
+        if error_response:
+            return error_response
+        
+        temp_paths, file_names = _save_uploads(files)
+        job = job_manager.submit(temp_paths, file_names=file_names, cleanup=True)
+        
+        response = jsonify({
+            "job_id": job.job_id,
+            "status": job.status,
+            "total_files": len(temp_paths),
+            "status_url": f"/jobs/{job.job_id}"
+        })
+        response.headers['Location'] = f"/jobs/{job.job_id}"
+        return response, 202
+    
+    except RuntimeError as e:
+        # This worker is stopping; another one will take the job
+        for temp_path in temp_paths:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+        response = jsonify({"error": str(e)})
+        response.headers['Retry-After'] = '1'
+        return response, 503
+    
+    except Exception as e:
+        logger.error(f"Error creating job: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Job status, progress and results; ?offset=N returns only results after the first N"""
+    offset = request.args.get('offset', 0, type=int)
+    status = job_manager.status(job_id, offset=max(offset, 0))
+    if status is None:
+        return jsonify({"error": "Job not found or expired"}), 404
+    return jsonify(status)
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def delete_job(job_id):
+    """Cancel a queued or running job, or forget a finished one"""
+    if job_manager.delete(job_id):
+        return jsonify({"job_id": job_id, "status": "deleted"})
+    if job_manager.cancel(job_id):
+        return jsonify({"job_id": job_id, "status": "cancelling"}), 202
+    return jsonify({"error": "Job not found or expired"}), 404
+
+@app.route('/uploads', methods=['POST'])
+@admitted(queued=False)
+def create_upload_session():
+    """Start a resumable upload session; committing it starts a background job over its files.
+    
+    Files may be declared here as {"files": [{"name", "size", "sha256"?}]} or
+    later via /uploads/<session_id>/files.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        files = data.get('files', [])
+        if not isinstance(files, list) or not all(isinstance(declared, dict) for declared in files):
+            return jsonify({"error": "files must be a list of {name, size, sha256} objects"}), 400
+        
+        session = upload_sessions.create(files)
+        response = jsonify(session)
+        response.headers['Location'] = f"/uploads/{session['session_id']}"
+        return response, 201
+    
+    except UploadSessionError as e:
+        return jsonify(e.to_dict()), e.status
+    
+    except Exception as e:
+        logger.error(f"Error creating upload session: {e}")
+        return jsonify({"error": str(e)}), 500
+
+def _with_status_url(session):
+    if session["job_id"]:
+        session["status_url"] = f"/jobs/{session['job_id']}"
+    return session
+
+@app.route('/uploads/<session_id>', methods=['GET'])
+def get_upload_session(session_id):
+    """Session state with the bytes received for each file"""
+    try:
+        return jsonify(_with_status_url(upload_sessions.info(session_id)))
+    except UploadSessionError as e:
+        return jsonify(e.to_dict()), e.status
+
+@app.route('/uploads/<session_id>', methods=['DELETE'])
+def delete_upload_session(session_id):
+    """Cancel the session's job and discard its files"""
+    try:
+        job_id = upload_sessions.info(session_id)["job_id"]
+    except UploadSessionError as e:
+        return jsonify(e.to_dict()), e.status
+    if job_id:
+        job_manager.cancel(job_id)
+    upload_sessions.delete(session_id)
+    return jsonify({"session_id": session_id, "status": "deleted"})
+
+@app.route('/uploads/<session_id>/files', methods=['POST'])
+def add_upload_file(session_id):
+    """Declare a file: {"name", "size", "sha256"?}"""
+    try:
+        data = request.get_json(silent=True) or {}
+        info = upload_sessions.add_file(session_id, str(data.get('name', '')), data.get('size'), data.get('sha256'))
+        response = jsonify(info)
+        response.headers['Location'] = f"/uploads/{session_id}/files/{info['file_id']}"
+        return response, 201
+    except UploadSessionError as e:
+        return jsonify(e.to_dict()), e.status
+
+@app.route('/uploads/<session_id>/files/<file_id>', methods=['GET'])
+def get_upload_file(session_id, file_id):
+    """Bytes received so far, i.e. the offset to resume from"""
+    try:
+        return jsonify(upload_sessions.file_info(session_id, file_id))
+    except UploadSessionError as e:
+        return jsonify(e.to_dict()), e.status
+
+@app.route('/uploads/<session_id>/files/<file_id>', methods=['PUT'])
+def put_upload_chunk(session_id, file_id):
+    """Write the request body at ?offset=N, checked against an optional X-Chunk-SHA256.
+    
+    Resending a chunk that was already received succeeds without writing it
+    again; a gap or conflicting data gets 409 with the offset to resume from.
+    """
+    offset = request.args.get('offset', type=int)
+    if offset is None:
+        return jsonify({"error": "offset query parameter required"}), 400
+    try:
+        info = upload_sessions.write_chunk(session_id, file_id, offset, request.get_data(),
+                                           checksum=request.headers.get('X-Chunk-SHA256'))
+        return jsonify(info)
+    except UploadSessionError as e:
+        return jsonify(e.to_dict()), e.status
+    except Exception as e:
+        logger.error(f"Error writing chunk of {file_id} in upload session {session_id}: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/uploads/<session_id>/commit', methods=['POST'])
+def commit_upload_session(session_id):
+    """Close the session once every file is complete and start a background job over its files"""
+    def start_job(paths, names):
+        # The files live in the session directory and are deleted once processed
+        return job_manager.submit(paths, file_names=names, cleanup=True).job_id
+    
+    try:
+        return jsonify(_with_status_url(upload_sessions.commit(session_id, start_job)))
+    except UploadSessionError as e:
+        return jsonify(e.to_dict()), e.status
+    except RuntimeError as e:
+        # This worker is stopping; the commit can be retried on another
+        response = jsonify({"error": str(e)})
+        response.headers['Retry-After'] = '1'
+        return response, 503
+
+def _resolve_dataset(data):
+    """The stored dataset named by dataset_id, or a transient one over posted results"""
+    if data and data.get('dataset_id'):
+        dataset = dataset_store.get(data['dataset_id'])
+        if dataset is None:
+            return None, (jsonify({"error": "Dataset not found or expired"}), 404)
+        return dataset, None
+    if not data or 'results' not in data:
+        return None, (jsonify({"error": "No results data provided"}), 400)
+    return Dataset(data['results']), None
+
+@app.route('/datasets', methods=['POST'])
+@admitted(queued=False)
+def create_dataset():
+    """Store results server-side so analytics calls can refer to them by dataset_id"""
     try:
         data = request.get_json()
         if not data or 'results' not in data:
             return jsonify({"error": "No results data provided"}), 400
         
-        results = data['results']
-        analytics = DocumentAnalytics(results)
-        report = analytics.generate_report()
+        dataset = dataset_store.create(data['results'], source="upload")
+        response = jsonify(dataset.info())
+        response.headers['Location'] = f"/datasets/{dataset.dataset_id}"
+        return response, 201
+    
+    except Exception as e:
+        logger.error(f"Error creating dataset: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/datasets/<dataset_id>', methods=['GET'])
+def get_dataset(dataset_id):
+    """Dataset size and origin"""
+    dataset = dataset_store.get(dataset_id)
+    if dataset is None:
+        return jsonify({"error": "Dataset not found or expired"}), 404
+    return jsonify(dataset.info())
+
+@app.route('/datasets/<dataset_id>', methods=['DELETE'])
+def delete_dataset(dataset_id):
+    if not dataset_store.delete(dataset_id):
+        return jsonify({"error": "Dataset not found or expired"}), 404
+    return jsonify({"dataset_id": dataset_id, "status": "deleted"})
+
+@app.route('/analyze', methods=['POST'])
+@admitted()
+def analyze_results():
+    """Analyze processing results given inline or by dataset_id"""
+    try:
+        dataset, error_response = _resolve_dataset(request.get_json())
+        if error_response:
+            return error_response
+        
+        report = dataset.report()
         
         return jsonify(report)
     
@@ -177,7 +686,7 @@ def export_results():
         export_manager = ExportManager()
         
         if format_type == 'json':
-            filepath = export_manager.export_to_json(results)
+            filepath = export_manager.export_to_json(results, compact=data.get('compact'))
         elif format_type == 'csv':
             filepath = export_manager.export_to_csv(results)
         elif format_type == 'excel':
@@ -196,19 +705,17 @@ def export_results():
         return jsonify({"error": str(e)}), 500
 
 @app.route('/compare', methods=['POST'])
+@admitted()
 def compare_documents():
-    """Compare documents for similarity"""
+    """Compare documents given inline or by dataset_id for similarity"""
     try:
         data = request.get_json()
-        if not data or 'results' not in data:
-            return jsonify({"error": "No results data provided"}), 400
+        dataset, error_response = _resolve_dataset(data)
+        if error_response:
+            return error_response
         
-        results = data['results']
         threshold = data.get('threshold', 0.3)
-        
-        from analytics import DocumentComparator
-        comparator = DocumentComparator(results)
-        similar_docs = comparator.find_similar_documents(threshold)
+        similar_docs = dataset.similar_documents(threshold)
         
         return jsonify({
             "similar_documents": similar_docs,
@@ -221,24 +728,22 @@ def compare_documents():
         return jsonify({"error": str(e)}), 500
 
 @app.route('/cluster', methods=['POST'])
+@admitted()
 def cluster_documents():
-    """Cluster documents based on content similarity"""
+    """Cluster documents given inline or by dataset_id based on content similarity"""
     try:
         data = request.get_json()
-        if not data or 'results' not in data:
-            return jsonify({"error": "No results data provided"}), 400
+        dataset, error_response = _resolve_dataset(data)
+        if error_response:
+            return error_response
         
-        results = data['results']
         n_clusters = data.get('n_clusters', 3)
-        
-        from analytics import DocumentComparator
-        comparator = DocumentComparator(results)
-        clusters = comparator.cluster_documents(n_clusters)
+        clusters = dataset.clusters(n_clusters)
         
         return jsonify({
             "clusters": clusters,
             "n_clusters": n_clusters,
-            "total_documents": len(results)
+            "total_documents": len(dataset.results)
         })
     
     except Exception as e:
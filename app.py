@@ -13,13 +13,14 @@ import plotly.graph_objects as go
 
 # Import our modules
 from summarizer import (
-    extract_text_from_pdf, improved_extract_title, extract_authors,
-    summarize, extract_keywords_with_bert, clean_text
+    extract_title_and_authors, summarize, extract_keywords_with_bert, clean_text
 )
+from extraction_pool import parse_document
 from batch_processor import BatchProcessor, find_pdf_files
 from analytics import DocumentAnalytics, DocumentComparator
 from export_manager import ExportManager
 from visualization import display_analytics_dashboard
+from stages import resolve_stages, select_fields
 from config import FILE_CONFIG, UI_CONFIG
 
 # Page configuration
@@ -59,12 +60,17 @@ def single_pdf_analysis():
     st.header("📄 Single PDF Analysis")
     
     uploaded_file = st.file_uploader("Upload a PDF file", type="pdf", help="Upload a scientific paper PDF file")
+    outputs = st.multiselect(
+        "Outputs", ["title", "authors", "summary", "keywords"],
+        default=["title", "authors", "summary", "keywords"],
+        help="Only the selected outputs and the stages they need are computed; title and authors alone skip summarization"
+    )
     
     if uploaded_file:
         if not validate_pdf_file(uploaded_file):
             st.stop()
         
-        result = process_pdf(uploaded_file)
+        result = process_pdf(uploaded_file, fields=outputs or None)
         
         if not result:
             st.stop()
@@ -76,17 +82,21 @@ def single_pdf_analysis():
             col1, col2 = st.columns([2, 1])
             
             with col1:
-                st.subheader("📌 Title")
-                st.markdown(f"**{result['title']}**")
+                if 'title' in result:
+                    st.subheader("📌 Title")
+                    st.markdown(f"**{result['title']}**")
                 
-                st.subheader("👥 Authors")
-                st.write(result['authors'])
+                if 'authors' in result:
+                    st.subheader("👥 Authors")
+                    st.write(result['authors'])
                 
-                st.subheader("📝 Summary")
-                st.write(result['summary'])
+                if 'summary' in result:
+                    st.subheader("📝 Summary")
+                    st.write(result['summary'])
                 
-                st.subheader("🔑 Keywords")
-                st.write(", ".join(result['keywords']))
+                if 'keywords' in result:
+                    st.subheader("🔑 Keywords")
+                    st.write(", ".join(result['keywords']))
             
             with col2:
                 st.subheader("📊 Document Stats")
@@ -361,41 +371,44 @@ def validate_pdf_file(uploaded_file) -> bool:
         return False
     return True
 
-def process_pdf(uploaded_file) -> Dict[str, Any]:
-    """Process a single PDF file"""
+def process_pdf(uploaded_file, fields=None, stages=None) -> Dict[str, Any]:
+    """Process a single PDF file, running only the stages the requested fields need"""
+    run_stages, output_fields = resolve_stages(fields, stages)
     with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
         tmp_file.write(uploaded_file.read())
         tmp_path = tmp_file.name
     
     try:
         with st.spinner("Extracting text from PDF..."):
-            raw_text = extract_text_from_pdf(tmp_path)
+            parsed = parse_document(tmp_path)
+            raw_text = parsed["text"]
             if not raw_text.strip():
                 st.error("No text could be extracted from the PDF.")
                 return {}
         
-        with st.spinner("Extracting title..."):
-            title = improved_extract_title(raw_text, pdf_path=tmp_path)
-        
-        with st.spinner("Extracting authors..."):
-            authors = extract_authors(raw_text, title=title, pdf_path=tmp_path)
+        result = {}
+        if "metadata" in run_stages:
+            with st.spinner("Extracting title and authors..."):
+                result.update(extract_title_and_authors(
+                    raw_text, pdf_path=tmp_path,
+                    embedded_metadata=parsed["embedded_metadata"],
+                    text_with_font=parsed["text_with_font"]
+                ))
         
-        with st.spinner("Generating summary..."):
-            cleaned_text = clean_text(raw_text)
-            summary_text = cleaned_text[:FILE_CONFIG["text_chunk_size"]]
-            summary = summarize(summary_text)
+        if "summarize" in run_stages:
+            with st.spinner("Generating summary..."):
+                cleaned_text = clean_text(raw_text)
+                summary_text = cleaned_text[:FILE_CONFIG["text_chunk_size"]]
+                result["summary"] = summarize(summary_text)
         
-        with st.spinner("Extracting keywords..."):
-            keywords = extract_keywords_with_bert(summary)
+        if "keywords" in run_stages:
+            with st.spinner("Extracting keywords..."):
+                result["keywords"] = extract_keywords_with_bert(result["summary"])
         
-        return {
-            "title": title,
-            "authors": authors,
-            "summary": summary,
-            "keywords": keywords,
-            "raw_text": raw_text,
-            "file_size": uploaded_file.size
-        }
+        result = select_fields(result, output_fields)
+        result["raw_text"] = raw_text
+        result["file_size"] = uploaded_file.size
+        return result
     except Exception as e:
         st.error(f"Error processing PDF: {str(e)}")
         return {}
@@ -409,9 +422,9 @@ def display_single_document_stats(result: Dict[str, Any]):
         "Character Count": len(result['raw_text']),
         "Word Count": len(result['raw_text'].split()),
         "Sentence Count": len(result['raw_text'].split('.')),
-        "Keyword Count": len(result['keywords']),
-        "Summary Length": len(result['summary']),
-        "Compression Ratio": len(result['summary']) / len(result['raw_text']) if result['raw_text'] else 0
+        "Keyword Count": len(result.get('keywords', [])),
+        "Summary Length": len(result.get('summary', '')),
+        "Compression Ratio": len(result.get('summary', '')) / len(result['raw_text']) if result['raw_text'] else 0
     }
     
     col1, col2 = st.columns(2)
@@ -439,9 +452,10 @@ def display_debug_info(uploaded_file, result: Dict[str, Any]):
     with st.expander("Processing Statistics"):
         st.json({
             "text_length": len(result['raw_text']),
-            "title_length": len(result['title']),
-            "summary_length": len(result['summary']),
-            "keyword_count": len(result['keywords'])
+            "title_length": len(result.get('title', '')),
+            "summary_length": len(result.get('summary', '')),
+            "keyword_count": len(result.get('keywords', [])),
+            "extraction_strategy": result.get('extraction_strategy', {})
         })
 
 def export_single_document(result: Dict[str, Any]):
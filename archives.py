@@ -0,0 +1,154 @@
+"""
+Streaming PDF ingestion from ZIP and TAR archives
+"""
+import os
+import io
+import logging
+import posixpath
+import tarfile
+import zipfile
+import zlib
+from typing import BinaryIO, Iterable, Iterator, Optional, Tuple, Union
+
+from config import ARCHIVE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+ZIP_SUFFIXES = (".zip",)
+TAR_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+MB = 1024 * 1024
+
+
+class ArchiveError(ValueError):
+    """A malformed archive, or one that exceeds the member count or size limits"""
+
+    kind = "archive"
+
+
+def is_archive(filename: str) -> bool:
+    return filename.lower().endswith(ZIP_SUFFIXES + TAR_SUFFIXES)
+
+
+def _is_pdf_member(member_name: str) -> bool:
+    base = os.path.basename(member_name)
+    # Skip macOS resource forks and other dotfiles that merely look like PDFs
+    return base.lower().endswith(".pdf") and not base.startswith(".") and "__MACOSX/" not in member_name
+
+
+class _Limits:
+    """Member count and size checks shared by the ZIP and TAR readers"""
+
+    def __init__(self, archive_name: str, max_members: Optional[int], max_member_size: Optional[int],
+                 max_total_size: Optional[int]):
+        self.archive_name = archive_name
+        self.max_members = max_members or ARCHIVE_CONFIG["max_members"]
+        self.max_member_size = max_member_size or ARCHIVE_CONFIG["max_member_size_mb"] * MB
+        self.max_total_size = max_total_size or ARCHIVE_CONFIG["max_total_size_mb"] * MB
+        self.members = 0
+        self.total_size = 0
+
+    def admit(self, member_name: str, size: int):
+        """Check a member's declared size before reading it"""
+        self.members += 1
+        if self.members > self.max_members:
+            raise ArchiveError(f"{self.archive_name} holds more than {self.max_members} PDFs")
+        self.check(member_name, size)
+
+    def check(self, member_name: str, size: int):
+        if size > self.max_member_size:
+            raise ArchiveError(
+                f"{member_name} in {self.archive_name} is larger than {self.max_member_size // MB}MB"
+            )
+        if self.total_size + size > self.max_total_size:
+            raise ArchiveError(
+                f"{self.archive_name} expands to more than {self.max_total_size // MB}MB of PDFs"
+            )
+
+    def read(self, member_name: str, handle: BinaryIO) -> bytes:
+        """Read at most the size limit, whatever the header claimed"""
+        data = handle.read(self.max_member_size + 1)
+        self.check(member_name, len(data))
+        self.total_size += len(data)
+        return data
+
+
+def _iter_zip(source: Union[str, BinaryIO], limits: _Limits) -> Iterator[Tuple[str, bytes]]:
+    try:
+        with zipfile.ZipFile(source) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or not _is_pdf_member(info.filename):
+                    continue
+                if info.flag_bits & 0x1:
+                    logger.warning(f"Skipping encrypted member {info.filename} of {limits.archive_name}")
+                    continue
+                limits.admit(info.filename, info.file_size)
+                with archive.open(info) as handle:
+                    yield info.filename, limits.read(info.filename, handle)
+    except (zipfile.BadZipFile, zipfile.LargeZipFile, NotImplementedError, EOFError, OSError, zlib.error) as e:
+        raise ArchiveError(f"Cannot read {limits.archive_name}: {e}")
+
+
+def _iter_tar(source: Union[str, BinaryIO], limits: _Limits) -> Iterator[Tuple[str, bytes]]:
+    # Stream mode reads members strictly in order, so non-seekable sources work too
+    try:
+        if isinstance(source, str):
+            archive = tarfile.open(name=source, mode="r|*")
+        else:
+            archive = tarfile.open(fileobj=source, mode="r|*")
+        with archive:
+            for member in archive:
+                if not member.isfile() or not _is_pdf_member(member.name):
+                    continue
+                limits.admit(member.name, member.size)
+                handle = archive.extractfile(member)
+                yield member.name, limits.read(member.name, handle)
+    except (tarfile.TarError, EOFError, OSError, zlib.error) as e:
+        raise ArchiveError(f"Cannot read {limits.archive_name}: {e}")
+
+
+def iter_archive_pdfs(source: Union[str, BinaryIO, bytes], name: Optional[str] = None,
+                      max_members: Optional[int] = None, max_member_size: Optional[int] = None,
+                      max_total_size: Optional[int] = None) -> Iterator[Tuple[str, bytes]]:
+    """Yield (name, bytes) for each PDF in a ZIP or TAR archive, one member at a time.
+
+    source is a path, an open binary file or the archive's bytes; name, which
+    defaults to the path, picks the format by its suffix and prefixes each
+    member's name, so results read e.g. "corpus.zip/2024/paper.pdf". Nothing is
+    extracted to disk. TAR archives (optionally compressed) are read as a
+    stream; ZIP archives need a seekable source for their central directory.
+    Raises ArchiveError when a limit is exceeded or the archive is malformed.
+    """
+    name = name or (source if isinstance(source, str) else "archive")
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    limits = _Limits(os.path.basename(name), max_members, max_member_size, max_total_size)
+
+    lowered = name.lower()
+    if lowered.endswith(ZIP_SUFFIXES):
+        members = _iter_zip(source, limits)
+    elif lowered.endswith(TAR_SUFFIXES):
+        members = _iter_tar(source, limits)
+    else:
+        raise ArchiveError(f"Not a ZIP or TAR archive: {name}")
+
+    for member_name, data in members:
+        yield f"{name}/{posixpath.normpath(member_name).lstrip('/')}", data
+    logger.info(f"Read {limits.members} PDFs ({limits.total_size / MB:.1f}MB) from {name}")
+
+
+def expand_archives(paths: Iterable[Union[str, Tuple[str, bytes]]]
+                    ) -> Iterator[Union[str, Tuple[str, Union[bytes, ArchiveError]]]]:
+    """Replace archive paths with their PDF members, lazily; other items pass through.
+
+    A malformed or over-limit archive yields (path, ArchiveError) after any
+    members read before the error, so it fails on its own instead of the batch.
+    """
+    for path in paths:
+        if isinstance(path, str) and is_archive(path):
+            try:
+                yield from iter_archive_pdfs(path)
+            except ArchiveError as e:
+                logger.error(f"Skipping the rest of {path}: {e}")
+                yield path, e
+        else:
+            yield path
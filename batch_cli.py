@@ -0,0 +1,213 @@
+"""
+Headless command-line batch runner with live throughput reporting
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+from collections import defaultdict
+from typing import List, Dict, Any, Optional
+
+from batch_processor import BatchProcessor, find_pdf_files
+from archives import is_archive
+from concurrency import AdaptiveConcurrencyController
+from job_journal import JobJournal, file_content_hash
+from result_sinks import create_sink
+from summarizer import apply_model_tier
+from timing import LatencyReservoir
+from metrics import REGISTRY
+from config import BATCH_CONFIG, MODEL_TIERS
+
+logger = logging.getLogger(__name__)
+
+# Default --output file extension for each --sink
+SINK_EXTENSIONS = {"jsonl": "jsonl", "csv": "csv", "sqlite": "sqlite3"}
+
+
+def collect_inputs(inputs: List[str], file_list: Optional[str] = None) -> List[str]:
+    """Expand directories and PDF paths, plus one path per line of file_list ("-" for stdin).
+
+    ZIP and TAR archives are kept as single paths; their members are read when processed.
+    """
+    pdf_paths = []
+    for path in inputs:
+        if os.path.isdir(path):
+            pdf_paths.extend(find_pdf_files(path))
+        else:
+            pdf_paths.append(path)
+
+    if file_list:
+        handle = sys.stdin if file_list == "-" else open(file_list, encoding="utf-8")
+        try:
+            pdf_paths.extend(line.strip() for line in handle if line.strip())
+        finally:
+            if handle is not sys.stdin:
+                handle.close()
+
+    # Keep the first occurrence of each path
+    return list(dict.fromkeys(pdf_paths))
+
+
+def _format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m{seconds:02d}s" if hours else f"{minutes}m{seconds:02d}s"
+
+
+class ProgressReporter:
+    """Print docs/sec, ETA and per-stage p50 latency to stderr at a fixed interval.
+
+    With metrics_file, the Prometheus metrics served by the API's /metrics are
+    also written there at each report. Without a total, as when archives are
+    read, no ETA is given.
+    """
+
+    def __init__(self, total: Optional[int], interval: float = 5.0, stream=None, metrics_file: Optional[str] = None):
+        self.total = total
+        self.interval = interval
+        self.stream = stream or sys.stderr
+        self.metrics_file = metrics_file
+        self.start_time = time.perf_counter()
+        self.last_report = 0.0
+        self.failed = 0
+        self.resumed = 0
+        self.stage_wall = defaultdict(LatencyReservoir)
+
+    def __call__(self, done: int, total: int, result: Dict[str, Any]):
+        if result["status"] == "error":
+            self.failed += 1
+        if result.get("resumed"):
+            self.resumed += 1
+        for stage, recorded in result.get("timings", {}).get("stages", {}).items():
+            self.stage_wall[stage].add(recorded["wall"])
+
+        now = time.perf_counter()
+        if now - self.last_report >= self.interval or done == self.total:
+            self.last_report = now
+            self.report(done, now - self.start_time)
+            if self.metrics_file:
+                REGISTRY.write_textfile(self.metrics_file)
+
+    def report(self, done: int, elapsed: float):
+        rate = (done - self.resumed) / elapsed if elapsed > 0 else 0.0
+        eta = _format_duration((self.total - done) / rate) if rate > 0 and self.total else "?"
+        stages = " ".join(
+            f"{stage}={reservoir.summary()['p50']:.2f}s" for stage, reservoir in self.stage_wall.items()
+        )
+        print(
+            f"[{done}/{self.total or '?'}] {rate:.2f} docs/s, ETA {eta}, {self.failed} failed | p50 {stages}",
+            file=self.stream, flush=True
+        )
+
+
+def dry_run(processor: BatchProcessor, pdf_paths: List[str], workers: int,
+            journal_path: Optional[str] = None, resume: bool = False) -> Dict[str, Any]:
+    """Report what a run would process and its predicted cost without running models"""
+    skipped = 0
+    if journal_path and resume and os.path.exists(journal_path):
+        with JobJournal(journal_path) as journal:
+            completed = journal.completed()
+        remaining = []
+        for pdf_path in pdf_paths:
+            entry = completed.get(pdf_path)
+            try:
+                resumable = bool(entry) and processor.can_resume(entry, file_content_hash(pdf_path))
+            except OSError:
+                resumable = False
+            if resumable:
+                skipped += 1
+            else:
+                remaining.append(pdf_path)
+        pdf_paths = remaining
+
+    archives = [pdf_path for pdf_path in pdf_paths if is_archive(pdf_path)]
+    pdf_paths = [pdf_path for pdf_path in pdf_paths if not is_archive(pdf_path)]
+    plan = {
+        "files": len(pdf_paths),
+        "archives": len(archives),
+        "archive_bytes": sum(os.path.getsize(archive) for archive in archives if os.path.exists(archive)),
+        "resumed": skipped,
+        "total_bytes": sum(os.path.getsize(pdf_path) for pdf_path in pdf_paths if os.path.exists(pdf_path)),
+        # Missing or unreadable; the run reports each of them as a failed file
+        "missing": [pdf_path for pdf_path in pdf_paths if not os.access(pdf_path, os.R_OK)]
+    }
+    if processor.scheduler:
+        predicted = sum(job["predicted_cost"] for _, job in processor.scheduler.plan(pdf_paths))
+        plan["predicted_cost_seconds"] = predicted
+        plan["predicted_wall_seconds"] = predicted / max(workers, 1)
+    return plan
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Process a directory or list of PDFs without the web UI")
+    parser.add_argument("inputs", nargs="*",
+                        help="PDF files, ZIP/TAR archives of PDFs or directories to search recursively")
+    parser.add_argument("--file-list", help="File with one PDF path per line, or - for stdin")
+    parser.add_argument("--workers", type=int, default=BATCH_CONFIG["max_workers"])
+    parser.add_argument("--memory-limit-mb", type=float,
+                        help="Adapt concurrency up to --workers while staying under this RSS")
+    parser.add_argument("--tier", choices=sorted(MODEL_TIERS), default="full", help="Model tier")
+    parser.add_argument("--fields", help="Comma-separated outputs to compute, e.g. title,authors; default all")
+    parser.add_argument("--sink", choices=["jsonl", "csv", "sqlite"], default="jsonl")
+    parser.add_argument("--output", help="Results path; default exports/batch_results with the --sink extension")
+    parser.add_argument("--journal", help="Checkpoint journal path")
+    parser.add_argument("--resume", action="store_true", help="Skip files already completed in the journal")
+    parser.add_argument("--dry-run", action="store_true", help="List the work and predicted cost, then exit")
+    parser.add_argument("--progress-interval", type=float, default=5.0, help="Seconds between progress lines")
+    parser.add_argument("--summary-file", help="Also write the final JSON summary to this path")
+    parser.add_argument("--metrics-file", help="Write Prometheus metrics to this path as the run progresses")
+    parser.add_argument("--log-level", default="WARNING", help="Logging level while running")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(args.log_level.upper())
+    if args.resume and not args.journal:
+        parser.error("--resume requires --journal")
+    if not args.output:
+        args.output = os.path.join("exports", f"batch_results.{SINK_EXTENSIONS[args.sink]}")
+
+    pdf_paths = collect_inputs(args.inputs, args.file_list)
+    if not pdf_paths:
+        parser.error("no PDF files found")
+
+    concurrency = None
+    if args.memory_limit_mb:
+        concurrency = AdaptiveConcurrencyController(max_limit=args.workers, memory_limit_mb=args.memory_limit_mb)
+    try:
+        processor = BatchProcessor(max_workers=args.workers, concurrency=concurrency, fields=args.fields)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.dry_run:
+        summary = dry_run(processor, pdf_paths, args.workers, args.journal, args.resume)
+    else:
+        apply_model_tier(args.tier)
+
+        total = None if any(is_archive(pdf_path) for pdf_path in pdf_paths) else len(pdf_paths)
+        reporter = ProgressReporter(total, interval=args.progress_interval, metrics_file=args.metrics_file)
+        start_time = time.perf_counter()
+        with create_sink(args.sink, args.output) as sink:
+            summary = processor.run_batch(pdf_paths, sinks=[sink], progress_callback=reporter,
+                                          journal_path=args.journal, resume=args.resume)
+        wall_time = time.perf_counter() - start_time
+        if args.metrics_file:
+            REGISTRY.write_textfile(args.metrics_file)
+        summary.update({
+            "tier": args.tier,
+            "workers": args.workers,
+            "output": args.output,
+            "wall_time": wall_time,
+            # Files restored from the journal took no time in this run
+            "docs_per_second": (summary["total_files"] - summary["resumed"]) / wall_time if wall_time > 0 else 0.0
+        })
+
+    output = json.dumps(summary, indent=2, default=str)
+    print(output)
+    if args.summary_file:
+        with open(args.summary_file, 'w', encoding='utf-8') as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,66 +4,271 @@ Batch processing functionality for multiple PDFs
 import os
 import json
 import pandas as pd
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Callable, Optional, Iterable, Iterator, Tuple, Union
 from pathlib import Path
 import logging
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import hashlib
+import threading
+import contextvars
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
 import time
 from datetime import datetime
 
 from summarizer import (
-    extract_text_from_pdf, improved_extract_title, extract_authors,
-    summarize, extract_keywords_with_bert, clean_text
+    extract_title_and_authors, summarize, extract_keywords_with_bert, clean_text
 )
-from config import FILE_CONFIG
+from extraction_pool import parse_document, ExtractionError
+from job_journal import JobJournal, file_content_hash
+from result_sinks import ResultSink, MemorySink
+from scheduler import JobScheduler, get_scheduler
+from dedup import DuplicateDetector
+from timing import StageTimer, LatencyReservoir
+from concurrency import AdaptiveConcurrencyController
+from work_queue import WorkQueue, LeaseKeeper, default_worker_id
+from metrics import BATCH_FILES, CACHE_REQUESTS, DOCUMENTS, observe_stages
+from stages import ALL_FIELDS, ALL_STAGES, resolve_stages, select_fields
+from archives import is_archive, expand_archives
+from config import FILE_CONFIG, BATCH_CONFIG, DEDUP_CONFIG, CONCURRENCY_CONFIG, QUEUE_CONFIG
 
 logger = logging.getLogger(__name__)
 
+def _release_if_cancelled(future: Future):
+    # Files dropped from the executor's queue never reach _run_task
+    if future.cancelled():
+        BATCH_FILES.dec(state="queued")
+
+class BatchStatistics:
+    """Running aggregates over a stream of batch results"""
+    
+    def __init__(self):
+        self.start_time = time.time()
+        self.total_files = 0
+        self.successful = 0
+        self.failed = 0
+        self.resumed = 0
+        self.metadata_fast_path = 0
+        self.error_types = Counter()
+        self.duplicates = 0
+        self.saved_seconds = 0.0
+        self.stage_wall = defaultdict(LatencyReservoir)
+        self.stage_cpu = defaultdict(float)
+        self.queue_wait = LatencyReservoir()
+        self.document_latency = LatencyReservoir()
+        self.scheduled = 0
+        self.predicted_cost = 0.0
+        self.actual_cost = 0.0
+        self.absolute_error = 0.0
+    
+    def add(self, result: Dict[str, Any]):
+        self.total_files += 1
+        if result.get("resumed"):
+            self.resumed += 1
+        if "timings" in result and not result.get("resumed"):
+            timings = result["timings"]
+            for stage, recorded in timings.get("stages", {}).items():
+                self.stage_wall[stage].add(recorded["wall"])
+                self.stage_cpu[stage] += recorded["cpu"]
+            if "queue_wait" in timings:
+                self.queue_wait.add(timings["queue_wait"])
+            if "total_wall" in timings:
+                self.document_latency.add(timings["total_wall"])
+        if "duplicate" in result:
+            self.duplicates += 1
+            self.saved_seconds += result["duplicate"]["saved_seconds"]
+        if "scheduling" in result:
+            scheduling = result["scheduling"]
+            self.scheduled += 1
+            self.predicted_cost += scheduling["predicted_cost"]
+            self.actual_cost += scheduling["actual_cost"]
+            self.absolute_error += abs(scheduling["predicted_cost"] - scheduling["actual_cost"])
+        if result["status"] == "duplicate":
+            pass
+        elif result["status"] == "success":
+            self.successful += 1
+            strategy = result.get("extraction_strategy", {})
+            if strategy.get("title") == "metadata" and strategy.get("authors") == "metadata":
+                self.metadata_fast_path += 1
+        else:
+            self.failed += 1
+            self.error_types[result.get("error_type", "error")] += 1
+    
+    def summary(self) -> Dict[str, Any]:
+        processing_time = time.time() - self.start_time
+        return {
+            "total_files": self.total_files,
+            "successful": self.successful,
+            "failed": self.failed,
+            "resumed": self.resumed,
+            "duplicates": self.duplicates,
+            "inference_seconds_saved": self.saved_seconds,
+            "error_types": dict(self.error_types),
+            "processing_time": processing_time,
+            "average_time_per_file": processing_time / self.total_files if self.total_files else 0,
+            "metadata_fast_path_share": self.metadata_fast_path / self.successful if self.successful else 0.0,
+            "stage_latency": {
+                stage: dict(reservoir.summary(), cpu_mean=self.stage_cpu[stage] / reservoir.count)
+                for stage, reservoir in self.stage_wall.items()
+            },
+            "queue_wait": self.queue_wait.summary(),
+            "document_latency": self.document_latency.summary(),
+            "scheduling": {
+                "scheduled_files": self.scheduled,
+                "predicted_cost": self.predicted_cost,
+                "actual_cost": self.actual_cost,
+                "mean_absolute_error": self.absolute_error / self.scheduled if self.scheduled else 0.0
+            },
+            "processed_at": datetime.now().isoformat()
+        }
+
 class BatchProcessor:
     """Handles batch processing of multiple PDF files"""
     
-    def __init__(self, max_workers: int = 4):
+    def __init__(self, max_workers: int = 4, scheduler: Optional[JobScheduler] = None,
+                 deduplicator: Optional[DuplicateDetector] = None,
+                 concurrency: Optional[AdaptiveConcurrencyController] = None,
+                 fields: Optional[Iterable[str]] = None, stages: Optional[Iterable[str]] = None,
+                 checkpoint: Optional[Callable[[float], float]] = None,
+                 cancelled: Optional[Callable[[], bool]] = None):
         self.max_workers = max_workers
+        # Called between stages with the seconds the document has already been paused;
+        # may block while more urgent work runs, returning the seconds paused
+        self.checkpoint = checkpoint
+        # Once it returns True, files not yet started are dropped from batches
+        self.cancelled = cancelled
+        self.stages, self.fields = resolve_stages(fields, stages)
+        self.scheduler = scheduler or (get_scheduler() if BATCH_CONFIG["schedule"] else None)
+        self.deduplicator = deduplicator or (DuplicateDetector() if DEDUP_CONFIG["enabled"] else None)
+        self.concurrency = concurrency or (AdaptiveConcurrencyController() if CONCURRENCY_CONFIG["enabled"] else None)
         self.results = []
         self.errors = []
     
-    def process_single_pdf(self, pdf_path: str) -> Dict[str, Any]:
-        """Process a single PDF file"""
+    def _duplicate_result(self, pdf_path: str, file_size: int, text: str, page_count: int,
+                          original_path: str, similarity: float) -> Optional[Dict[str, Any]]:
+        """Build a result for a near-duplicate from its original, or None if its result is not available"""
+        original, inference_time = self.deduplicator.wait_for_result(original_path,
+                                                                     timeout=DEDUP_CONFIG["wait_timeout"])
+        if original is None:
+            return None
+        
+        logger.info(f"{pdf_path} is a near-duplicate of {original_path} (similarity {similarity:.2f})")
+        result = {
+            "file_path": pdf_path,
+            "file_name": os.path.basename(pdf_path),
+            "file_size": file_size,
+            "duplicate": {
+                "of": original_path,
+                "similarity": similarity,
+                "saved_seconds": inference_time
+            },
+            "processed_at": datetime.now().isoformat()
+        }
+        if DEDUP_CONFIG["mode"] == "mark":
+            result["status"] = "duplicate"
+            return result
+        
+        result.update(original)
+        result["statistics"] = self._calculate_statistics(text, original["summary"], page_count)
+        result["status"] = "success"
+        return result
+    
+    def _yield_stage(self, timer: StageTimer):
+        """Give way at a stage boundary, recording any pause as the "preempted" stage"""
+        if self.checkpoint:
+            paused = self.checkpoint(timer.stages.get("preempted", {}).get("wall", 0.0))
+            if paused:
+                timer.add("preempted", paused, 0.0)
+    
+    def process_single_pdf(self, pdf_path: str, data: Optional[bytes] = None,
+                           fields: Optional[Iterable[str]] = None,
+                           stages: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """Process a single PDF file, recording wall and CPU time for each stage.
+        
+        With data, the PDF is processed from memory and pdf_path only names it.
+        fields and stages override the processor's selection; stages that are
+        not needed for the selected outputs are skipped along with their models.
+        """
+        if fields is None and stages is None:
+            run_stages, output_fields = self.stages, self.fields
+        else:
+            run_stages, output_fields = resolve_stages(fields, stages)
+        registered = False
+        timer = StageTimer()
         try:
             logger.info(f"Processing: {pdf_path}")
             
-            # Extract text
-            text = extract_text_from_pdf(pdf_path)
+            # Extract text, font spans and embedded metadata
+            self._yield_stage(timer)
+            parsed = parse_document(pdf_path, data=data)
+            file_size = len(data) if data is not None else os.path.getsize(pdf_path)
+            timer.merge(parsed["timings"])
+            text = parsed["text"]
             if not text.strip():
                 raise ValueError("No text extracted from PDF")
             
+            # Skip inference for near-duplicates of documents already seen; partial
+            # results cannot stand in for full ones, so only full runs take part
+            if self.deduplicator and run_stages == ALL_STAGES:
+                with timer.stage("dedup"):
+                    duplicate = self.deduplicator.register(pdf_path, text)
+                if duplicate:
+                    duplicate_result = self._duplicate_result(pdf_path, file_size, text, parsed["page_count"],
+                                                             *duplicate)
+                    if duplicate_result:
+                        CACHE_REQUESTS.inc(cache="dedup", result="hit")
+                        duplicate_result["timings"] = {"stages": timer.as_dict()}
+                        return select_fields(duplicate_result, output_fields)
+                else:
+                    registered = True
+                CACHE_REQUESTS.inc(cache="dedup", result="miss")
+            
+            result = {
+                "file_path": pdf_path,
+                "file_name": os.path.basename(pdf_path),
+                "file_size": file_size
+            }
+            
             # Extract metadata
-            title = improved_extract_title(text, pdf_path=pdf_path)
-            authors = extract_authors(text, title=title, pdf_path=pdf_path)
+            if "metadata" in run_stages:
+                self._yield_stage(timer)
+                result.update(extract_title_and_authors(
+                    text, pdf_path=pdf_path,
+                    embedded_metadata=parsed["embedded_metadata"],
+                    text_with_font=parsed["text_with_font"],
+                    timer=timer
+                ))
             
             # Generate summary
-            cleaned_text = clean_text(text)
-            summary_text = cleaned_text[:FILE_CONFIG["text_chunk_size"]]
-            summary = summarize(summary_text)
+            if "summarize" in run_stages:
+                self._yield_stage(timer)
+                with timer.stage("summarize"):
+                    cleaned_text = clean_text(text)
+                    summary_text = cleaned_text[:FILE_CONFIG["text_chunk_size"]]
+                    result["summary"] = summarize(summary_text)
             
             # Extract keywords
-            keywords = extract_keywords_with_bert(summary)
+            if "keywords" in run_stages:
+                self._yield_stage(timer)
+                with timer.stage("keywords"):
+                    result["keywords"] = extract_keywords_with_bert(result["summary"])
             
             # Calculate statistics
-            stats = self._calculate_statistics(text, summary)
+            if "summarize" in run_stages:
+                result["statistics"] = self._calculate_statistics(text, result["summary"], parsed["page_count"])
+            inference_time = sum(timer.stages[stage]["wall"] for stage in ("summarize", "keywords")
+                                 if stage in timer.stages)
             
-            result = {
-                "file_path": pdf_path,
-                "file_name": os.path.basename(pdf_path),
-                "file_size": os.path.getsize(pdf_path),
-                "title": title,
-                "authors": authors,
-                "summary": summary,
-                "keywords": keywords,
-                "statistics": stats,
+            # Duplicates reuse every field, so publish before dropping unrequested ones
+            if registered:
+                self.deduplicator.publish(pdf_path, result, inference_time)
+                registered = False
+            
+            result = select_fields(result, output_fields)
+            result.update({
+                "timings": {"stages": timer.as_dict()},
                 "processed_at": datetime.now().isoformat(),
                 "status": "success"
-            }
+            })
             
             logger.info(f"Successfully processed: {pdf_path}")
             return result
@@ -73,18 +278,26 @@ class BatchProcessor:
                 "file_path": pdf_path,
                 "file_name": os.path.basename(pdf_path),
                 "error": str(e),
+                "error_type": e.kind if isinstance(e, ExtractionError) else "error",
+                "timings": {"stages": timer.as_dict()},
                 "processed_at": datetime.now().isoformat(),
                 "status": "error"
             }
             logger.error(f"Error processing {pdf_path}: {e}")
             return error_result
+        
+        finally:
+            # Release duplicates waiting on an original that failed
+            if registered:
+                self.deduplicator.publish(pdf_path, None)
     
-    def _calculate_statistics(self, text: str, summary: str) -> Dict[str, Any]:
+    def _calculate_statistics(self, text: str, summary: str, page_count: int) -> Dict[str, Any]:
         """Calculate document statistics"""
         words = text.split()
         sentences = text.split('.')
         
         return {
+            "page_count": page_count,
             "character_count": len(text),
             "word_count": len(words),
             "sentence_count": len(sentences),
@@ -94,59 +307,335 @@ class BatchProcessor:
             "compression_ratio": len(summary) / len(text) if text else 0
         }
     
-    def process_batch(self, pdf_paths: List[str], progress_callback=None) -> Dict[str, Any]:
-        """Process multiple PDF files in parallel"""
-        start_time = time.time()
-        self.results = []
-        self.errors = []
+    def _process_with_journal(self, pdf_path: str, journal: JobJournal,
+                              completed: Dict[str, Dict[str, Any]], data: Optional[bytes] = None) -> Dict[str, Any]:
+        """Reuse a journaled result for an unchanged file, otherwise process and journal it.
         
-        logger.info(f"Starting batch processing of {len(pdf_paths)} files")
+        In-memory PDFs, such as archive members, are journaled under their name
+        with the hash of their bytes.
+        """
+        content_hash = file_content_hash(pdf_path) if data is None else hashlib.sha256(data).hexdigest()
+        entry = completed.get(pdf_path)
+        if self.can_resume(entry, content_hash):
+            result = select_fields(entry["result"], self.fields)
+            result["resumed"] = True
+            return result
+        
+        result = self.process_single_pdf(pdf_path, data=data)
+        journal.record(result, content_hash, fields=self.fields)
+        return result
+    
+    def can_resume(self, entry: Optional[Dict[str, Any]], content_hash: str) -> bool:
+        """Whether a journal entry for unchanged content holds every field this processor returns.
+        
+        Entries without fields predate field selection and come from full runs.
+        """
+        if not entry or entry.get("content_hash") != content_hash:
+            return False
+        return self.fields <= frozenset(entry.get("fields") or ALL_FIELDS)
+    
+    def _run_task(self, pdf_path: str, journal: Optional[JobJournal],
+                  completed: Dict[str, Dict[str, Any]], job: Optional[Dict[str, Any]],
+                  submitted_at: float, data: Optional[bytes] = None,
+                  cancellable: bool = False) -> Optional[Dict[str, Any]]:
+        """Process one file, recording queue wait, worker and predicted versus actual cost.
         
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            # Submit all tasks
-            future_to_path = {
-                executor.submit(self.process_single_pdf, pdf_path): pdf_path 
-                for pdf_path in pdf_paths
+        If cancellable, returns None without processing the file when the batch
+        was cancelled while it was queued.
+        """
+        BATCH_FILES.dec(state="queued")
+        if cancellable and self.cancelled and self.cancelled():
+            return None
+        BATCH_FILES.inc(state="running")
+        try:
+            start_time = time.perf_counter()
+            if journal:
+                result = self._process_with_journal(pdf_path, journal, completed, data)
+            else:
+                result = self.process_single_pdf(pdf_path, data=data)
+            actual_cost = time.perf_counter() - start_time
+        finally:
+            BATCH_FILES.dec(state="running")
+        
+        if not result.get("resumed"):
+            timings = result.setdefault("timings", {"stages": {}})
+            timings["queue_wait"] = start_time - submitted_at
+            timings["total_wall"] = actual_cost
+            result["worker_id"] = threading.current_thread().name
+            observe_stages(timings["stages"])
+            DOCUMENTS.inc(status=result["status"])
+        
+        if job is not None and not result.get("resumed"):
+            result["scheduling"] = {
+                "priority": job["priority"],
+                "predicted_cost": job["predicted_cost"],
+                "actual_cost": actual_cost
+            }
+            if result["status"] == "success" and self.stages == ALL_STAGES:
+                # Without the statistics field, the estimator imputes the counts from file size
+                statistics = result.get("statistics", {})
+                self.scheduler.record(pdf_path, job, actual_cost,
+                                      pages=statistics.get("page_count"),
+                                      tokens=statistics.get("word_count"))
+        return result
+    
+    def _submit(self, executor: ThreadPoolExecutor, pdf_path: str, journal: Optional[JobJournal],
+                completed: Dict[str, Dict[str, Any]], job: Optional[Dict[str, Any]],
+                data: Optional[bytes] = None, cancellable: bool = False) -> Future:
+        BATCH_FILES.inc(state="queued")
+        future = executor.submit(self._run_task, pdf_path, journal, completed, job, time.perf_counter(), data,
+                                 cancellable)
+        future.add_done_callback(_release_if_cancelled)
+        return future
+    
+    def _collect(self, future: Future, pdf_path: str) -> Optional[Dict[str, Any]]:
+        """Return a finished task's result, feeding its latency to the concurrency controller"""
+        try:
+            result = future.result()
+            if result is None:
+                return None
+        except Exception as e:
+            logger.error(f"Unexpected error processing {pdf_path}: {e}")
+            result = {
+                "file_path": pdf_path,
+                "file_name": os.path.basename(pdf_path),
+                "error": str(e),
+                "error_type": "error",
+                "processed_at": datetime.now().isoformat(),
+                "status": "error"
             }
+        if self.concurrency and not result.get("resumed") and "total_wall" in result.get("timings", {}):
+            self.concurrency.on_complete(result["timings"]["total_wall"])
+        return result
+    
+    def iter_batch(self, pdf_paths: Iterable[Union[str, Tuple[str, bytes]]], max_in_flight: Optional[int] = None,
+                   journal_path: Optional[str] = None, resume: bool = False,
+                   priorities: Optional[Dict[str, int]] = None) -> Iterator[Dict[str, Any]]:
+        """Yield results as they complete, keeping at most max_in_flight files submitted.
+        
+        pdf_paths may be any iterable, including a lazy generator, and may hold
+        (name, bytes) pairs for PDFs held in memory, or (name, exception) pairs
+        for inputs rejected before processing, which yield an error result. ZIP
+        and TAR paths are replaced by their PDF members, read into memory as they
+        are reached; an unreadable archive yields one error result. With journal_path,
+        every finished file is appended to a checkpoint journal; with resume, files
+        already journaled as successful with an unchanged content hash are skipped
+        and their journaled results reused. Sized inputs are dispatched by priority
+        and then longest predicted cost first when a scheduler is configured. With an
+        adaptive concurrency controller, its current limit replaces max_in_flight.
+        Once the processor's cancelled callback returns True, no further files
+        are started and only those already running are yielded.
+        """
+        max_in_flight = max_in_flight or BATCH_CONFIG["max_in_flight"] or 2 * self.max_workers
+        
+        journal = JobJournal(journal_path, fsync=BATCH_CONFIG["journal_fsync"]) if journal_path else None
+        completed = journal.completed() if journal and resume else {}
+        if completed:
+            logger.info(f"Resuming from {journal_path}: {len(completed)} files already completed")
+        
+        jobs = {}
+        if (self.scheduler and hasattr(pdf_paths, "__len__")
+                and all(isinstance(path, str) and not is_archive(path) for path in pdf_paths)):
+            plan = self.scheduler.plan(pdf_paths, priorities=priorities)
+            jobs = dict(plan)
+            pdf_paths = [pdf_path for pdf_path, _ in plan]
+        
+        # Lazy inputs may block while the next file is still arriving (a streamed
+        # upload or an open upload session), so they are read on a reader thread and
+        # finished results are collected in the meantime. It runs in a copy of the
+        # caller's context so request-bound generators keep working.
+        lazy = not hasattr(pdf_paths, "__len__")
+        paths = expand_archives(pdf_paths)
+        controller = self.concurrency
+        if controller:
+            # Latencies of an earlier batch's documents say nothing about this one's
+            controller.reset_baseline()
+        executor = ThreadPoolExecutor(max_workers=controller.max_limit if controller else self.max_workers,
+                                      thread_name_prefix="batch-worker")
+        reader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="batch-reader") if lazy else None
+        context = contextvars.copy_context()
+        in_flight = {}
+        reading = None
+        exhausted = False
+        
+        def submit(next_path: Union[str, Tuple[str, Union[bytes, Exception]]]):
+            data = None
+            if isinstance(next_path, tuple):
+                next_path, data = next_path
+            if isinstance(data, Exception):
+                future = Future()
+                future.set_result({
+                    "file_path": next_path,
+                    "file_name": os.path.basename(next_path),
+                    "error": str(data),
+                    "error_type": getattr(data, "kind", "error"),
+                    "processed_at": datetime.now().isoformat(),
+                    "status": "error"
+                })
+            else:
+                future = self._submit(executor, next_path, journal, completed, jobs.get(next_path), data,
+                                      cancellable=True)
+            in_flight[future] = next_path
+        
+        def refill():
+            nonlocal reading, exhausted
+            if self.cancelled and self.cancelled():
+                exhausted = True
+            # The adaptive limit is re-read on every refill so decisions apply immediately
+            while not exhausted and reading is None and len(in_flight) < (controller.limit if controller else max_in_flight):
+                if reader:
+                    reading = reader.submit(context.run, next, paths, None)
+                    return
+                next_path = next(paths, None)
+                if next_path is None:
+                    exhausted = True
+                    return
+                submit(next_path)
+        
+        try:
+            refill()
             
-            # Process completed tasks
-            for i, future in enumerate(as_completed(future_to_path), 1):
-                pdf_path = future_to_path[future]
-                try:
-                    result = future.result()
-                    if result["status"] == "success":
-                        self.results.append(result)
+            while in_flight or reading:
+                waiting = list(in_flight) + ([reading] if reading else [])
+                done, _ = wait(waiting, return_when=FIRST_COMPLETED)
+                if reading in done:
+                    next_path, reading = reading.result(), None
+                    if next_path is None:
+                        exhausted = True
                     else:
-                        self.errors.append(result)
-                    
-                    if progress_callback:
-                        progress_callback(i, len(pdf_paths), result)
-                        
-                except Exception as e:
-                    error_result = {
-                        "file_path": pdf_path,
-                        "file_name": os.path.basename(pdf_path),
-                        "error": str(e),
-                        "processed_at": datetime.now().isoformat(),
-                        "status": "error"
-                    }
-                    self.errors.append(error_result)
-                    logger.error(f"Unexpected error processing {pdf_path}: {e}")
-        
-        processing_time = time.time() - start_time
-        
-        batch_summary = {
-            "total_files": len(pdf_paths),
-            "successful": len(self.results),
-            "failed": len(self.errors),
-            "processing_time": processing_time,
-            "average_time_per_file": processing_time / len(pdf_paths) if pdf_paths else 0,
-            "results": self.results,
-            "errors": self.errors,
-            "processed_at": datetime.now().isoformat()
-        }
+                        submit(next_path)
+                finished = []
+                for future in done:
+                    if future in in_flight:
+                        result = self._collect(future, in_flight.pop(future))
+                        if result is not None:
+                            finished.append(result)
+                refill()
+                
+                yield from finished
+        finally:
+            if reader:
+                # A read still blocked on its source is left to finish on its own
+                reader.shutdown(wait=False, cancel_futures=True)
+            executor.shutdown(wait=True, cancel_futures=True)
+            if journal:
+                journal.close()
+            if jobs:
+                self.scheduler.save()
+    
+    def run_batch(self, pdf_paths: Iterable[str], sinks: Optional[List[ResultSink]] = None,
+                  progress_callback=None, max_in_flight: Optional[int] = None,
+                  journal_path: Optional[str] = None, resume: bool = False,
+                  priorities: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+        """Stream results into sinks and return a summary holding only aggregates.
+        
+        Memory stays flat regardless of corpus size; sinks are left open for the
+        caller to close.
+        """
+        total = None
+        if hasattr(pdf_paths, "__len__") and not any(isinstance(path, str) and is_archive(path) for path in pdf_paths):
+            total = len(pdf_paths)
+        logger.info(f"Starting batch processing of {total if total is not None else 'streamed'} files")
+        results = self.iter_batch(pdf_paths, max_in_flight=max_in_flight, journal_path=journal_path,
+                                  resume=resume, priorities=priorities)
+        return self._consume(results, sinks, progress_callback, total)
+    
+    def _consume(self, results: Iterator[Dict[str, Any]], sinks: Optional[List[ResultSink]],
+                 progress_callback, total: Optional[int]) -> Dict[str, Any]:
+        """Write streamed results to sinks and aggregate them into a summary"""
+        statistics = BatchStatistics()
+        for i, result in enumerate(results, 1):
+            statistics.add(result)
+            for sink in sinks or []:
+                sink.write(result)
+            if progress_callback:
+                progress_callback(i, total if total is not None else i, result)
+        
+        batch_summary = statistics.summary()
+        if self.concurrency:
+            batch_summary["concurrency"] = self.concurrency.metrics()
+        logger.info(f"Batch processing completed: {batch_summary['successful']} successful, {batch_summary['failed']} failed")
+        return batch_summary
+    
+    def iter_queue(self, queue: WorkQueue, worker_id: Optional[str] = None,
+                   follow: bool = False) -> Iterator[Dict[str, Any]]:
+        """Lease files from a shared work queue and yield results as they complete.
+        
+        Only as many jobs are leased as can run at once, and a background thread
+        heartbeats them until they finish. Successes are completed in the queue and
+        errors released for retry. Returns once nothing is pending or leased by any
+        worker, or keeps polling for new jobs with follow.
+        """
+        worker_id = worker_id or default_worker_id()
+        limit = self.concurrency.max_limit if self.concurrency else self.max_workers
+        if self.concurrency:
+            self.concurrency.reset_baseline()
+        executor = ThreadPoolExecutor(max_workers=limit, thread_name_prefix="batch-worker")
+        keeper = LeaseKeeper(queue, worker_id).start()
+        in_flight = {}
+        
+        logger.info(f"{worker_id} pulling from work queue {queue.queue_path}")
+        try:
+            while True:
+                free = (self.concurrency.limit if self.concurrency else limit) - len(in_flight)
+                if free > 0:
+                    for job in queue.lease(worker_id, count=free):
+                        keeper.add(job["id"])
+                        future = self._submit(executor, job["path"], None, {}, None)
+                        in_flight[future] = job
+                
+                if not in_flight:
+                    if not follow and queue.is_drained():
+                        return
+                    time.sleep(QUEUE_CONFIG["poll_interval"])
+                    continue
+                
+                # Poll for newly queued or expired jobs while there is spare capacity
+                done, _ = wait(in_flight, timeout=QUEUE_CONFIG["poll_interval"] if free > 0 else None,
+                               return_when=FIRST_COMPLETED)
+                for future in done:
+                    job = in_flight.pop(future)
+                    result = self._collect(future, job["path"])
+                    result["queue"] = {"job_id": job["id"], "attempt": job["attempts"], "worker_id": worker_id}
+                    if result["status"] == "error":
+                        held = queue.fail(job["id"], worker_id, result.get("error", ""))
+                    else:
+                        held = queue.complete(job["id"], worker_id)
+                    keeper.discard(job["id"])
+                    if not held:
+                        logger.warning(f"Lease on {job['path']} expired before it finished; another worker may repeat it")
+                    yield result
+        finally:
+            keeper.stop()
+            executor.shutdown(wait=True, cancel_futures=True)
+    
+    def run_queue(self, queue: WorkQueue, sinks: Optional[List[ResultSink]] = None,
+                  progress_callback=None, worker_id: Optional[str] = None,
+                  follow: bool = False) -> Dict[str, Any]:
+        """Stream results of jobs leased from a shared work queue into sinks"""
+        return self._consume(self.iter_queue(queue, worker_id=worker_id, follow=follow),
+                             sinks, progress_callback, None)
+    
+    def process_batch(self, pdf_paths: Iterable[Union[str, Tuple[str, bytes]]], progress_callback=None,
+                      journal_path: Optional[str] = None, resume: bool = False,
+                      priorities: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+        """Process multiple PDF files in parallel and return every result in memory.
+        
+        Use run_batch or iter_batch for large corpora.
+        """
+        self.results = []
+        self.errors = []
+        sink = MemorySink(self.results, self.errors)
         
-        logger.info(f"Batch processing completed: {len(self.results)} successful, {len(self.errors)} failed")
+        batch_summary = self.run_batch(
+            pdf_paths, sinks=[sink],
+            progress_callback=progress_callback, journal_path=journal_path, resume=resume,
+            priorities=priorities
+        )
+        batch_summary["results"] = self.results
+        batch_summary["errors"] = self.errors
+        if sink.duplicates:
+            batch_summary["duplicate_results"] = sink.duplicates
         return batch_summary
     
     def export_results(self, output_dir: str, format: str = "json") -> str:
@@ -185,12 +674,36 @@ class BatchProcessor:
         
         return output_path
 
+def metadata_fast_path_share(results: List[Dict[str, Any]]) -> float:
+    """Share of results whose title and authors both came from embedded PDF metadata"""
+    if not results:
+        return 0.0
+    served = sum(
+        1 for result in results
+        if result.get("extraction_strategy", {}).get("title") == "metadata"
+        and result.get("extraction_strategy", {}).get("authors") == "metadata"
+    )
+    return served / len(results)
+
+def iter_pdf_entries(directory: str) -> Iterator[os.DirEntry]:
+    """Lazily yield os.DirEntry objects for every PDF file under a directory"""
+    stack = [directory]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file() and entry.name.lower().endswith('.pdf'):
+                            yield entry
+                    except OSError as e:
+                        logger.warning(f"Skipping {entry.path}: {e}")
+        except OSError as e:
+            logger.warning(f"Cannot scan {current}: {e}")
+
 def find_pdf_files(directory: str) -> List[str]:
     """Find all PDF files in a directory"""
-    pdf_files = []
-    for root, dirs, files in os.walk(directory):
-        for file in files:
-            if file.lower().endswith('.pdf'):
-                pdf_files.append(os.path.join(root, file))
-    return pdf_files
+    return [entry.path for entry in iter_pdf_entries(directory)]
 
@@ -0,0 +1,233 @@
+"""
+Benchmarks for the PDF processing pipeline
+"""
+import argparse
+import gzip
+import json
+import time
+import random
+import logging
+from typing import List, Dict, Any, Sequence
+
+from analytics import DocumentComparator
+from summarizer import extract_text_from_pdf, extract_title_and_authors
+from batch_processor import find_pdf_files, metadata_fast_path_share
+from serialization import dumps, compress, ORJSON_AVAILABLE, ZSTD_AVAILABLE
+from config import FILE_CONFIG, SERIALIZATION_CONFIG, ANALYTICS_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+def benchmark_metadata(pdf_paths: List[str]) -> Dict[str, Any]:
+    """Time title/author extraction with and without the embedded metadata fast path"""
+    texts = {pdf_path: extract_text_from_pdf(pdf_path) for pdf_path in pdf_paths}
+    report = {"documents": len(pdf_paths)}
+
+    original_setting = FILE_CONFIG["use_pdf_metadata"]
+    try:
+        for label, use_metadata in (("heuristics_only", False), ("metadata_first", True)):
+            FILE_CONFIG["use_pdf_metadata"] = use_metadata
+            results = []
+            start_time = time.perf_counter()
+            for pdf_path in pdf_paths:
+                results.append(extract_title_and_authors(texts[pdf_path], pdf_path=pdf_path))
+            elapsed = time.perf_counter() - start_time
+
+            report[label] = {
+                "total_time": elapsed,
+                "average_time_per_file": elapsed / len(pdf_paths) if pdf_paths else 0,
+                "fast_path_share": metadata_fast_path_share(results)
+            }
+    finally:
+        FILE_CONFIG["use_pdf_metadata"] = original_setting
+
+    return report
+
+
+def _synthetic_results(count: int) -> List[Dict[str, Any]]:
+    """Batch results shaped like BatchProcessor's, with random text"""
+    rng = random.Random(42)
+    vocabulary = [f"term{index}" for index in range(5000)]
+    stages = ["extract", "font_parse", "embedded_metadata", "dedup", "title", "authors", "summarize", "keywords"]
+
+    def words(n):
+        return " ".join(rng.choice(vocabulary) for _ in range(n))
+
+    return [{
+        "file_path": f"/data/corpus/paper_{index:05d}.pdf",
+        "file_name": f"paper_{index:05d}.pdf",
+        "file_size": rng.randint(100_000, 5_000_000),
+        "title": words(10),
+        "authors": ", ".join(words(2) for _ in range(rng.randint(1, 6))),
+        "extraction_strategy": {"title": "metadata", "authors": "font"},
+        "summary": words(90),
+        "keywords": [words(rng.randint(1, 3)) for _ in range(15)],
+        "statistics": {
+            "character_count": rng.randint(5_000, 200_000),
+            "word_count": rng.randint(1_000, 30_000),
+            "sentence_count": rng.randint(50, 2_000),
+            "compression_ratio": rng.random() / 10
+        },
+        "timings": {
+            "stages": {stage: {"wall": rng.random(), "cpu": rng.random()} for stage in stages},
+            "queue_wait": rng.random(),
+            "total_wall": rng.random() * 10
+        },
+        "processed_at": "2025-01-01T00:00:00",
+        "status": "success"
+    } for index in range(count)]
+
+
+def _timed(function, repeat: int = 3):
+    """Best of repeat runs: (seconds, result)"""
+    best, result = None, None
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start_time
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def benchmark_serialization(pdf_paths: List[str], documents: int = 10000) -> Dict[str, Any]:
+    """Encode time and size of a large /batch payload per backend, export mode and compression"""
+    payload = {"total_files": documents, "results": _synthetic_results(documents)}
+    report = {"documents": documents, "orjson_available": ORJSON_AVAILABLE, "zstd_available": ZSTD_AVAILABLE}
+
+    # What jsonify and export_to_json produced before
+    encoders = {
+        "flask_default": lambda: json.dumps(payload, sort_keys=True, separators=(",", ":")).encode("utf-8"),
+        "export_indented_stdlib": lambda: json.dumps(payload, indent=2, ensure_ascii=False).encode("utf-8"),
+    }
+    original_backend = SERIALIZATION_CONFIG["backend"]
+    try:
+        SERIALIZATION_CONFIG["backend"] = "json"
+        encoders["compact_stdlib"] = lambda: dumps(payload)
+        report["encode"] = {}
+        for label, encoder in encoders.items():
+            elapsed, body = _timed(encoder)
+            report["encode"][label] = {"seconds": elapsed, "bytes": len(body)}
+        if ORJSON_AVAILABLE:
+            SERIALIZATION_CONFIG["backend"] = "orjson"
+            for label, indent in (("compact_orjson", False), ("export_indented_orjson", True)):
+                elapsed, body = _timed(lambda: dumps(payload, indent=indent))
+                report["encode"][label] = {"seconds": elapsed, "bytes": len(body)}
+    finally:
+        SERIALIZATION_CONFIG["backend"] = original_backend
+
+    encoded = report["encode"]
+    fastest = min(encoded, key=lambda label: encoded[label]["seconds"])
+    report["summary"] = {
+        "fastest_encoder": fastest,
+        "speedup_vs_flask_default": encoded["flask_default"]["seconds"] / encoded[fastest]["seconds"],
+        "export_bytes_saved_by_compact": encoded["export_indented_stdlib"]["bytes"] - encoded["compact_stdlib"]["bytes"]
+    }
+
+    body = dumps(payload)
+    codecs = {
+        "gzip_level_1": lambda: gzip.compress(body, compresslevel=1),
+        "gzip_level_6": lambda: gzip.compress(body, compresslevel=6),
+    }
+    if ZSTD_AVAILABLE:
+        codecs["zstd"] = lambda: compress(body, "zstd")
+    report["compression"] = {}
+    for label, codec in codecs.items():
+        elapsed, compressed = _timed(codec)
+        report["compression"][label] = {
+            "seconds": elapsed,
+            "bytes": len(compressed),
+            "bytes_saved": len(body) - len(compressed),
+            "ratio": len(compressed) / len(body)
+        }
+    return report
+
+
+def _synthetic_keywords(count: int) -> List[Dict[str, Any]]:
+    """Results with ten keywords each: eight from one of count // 20 topics and two of 20 common ones"""
+    rng = random.Random(42)
+    topics = [[f"topic{topic} term{term}" for term in range(25)] for topic in range(max(1, count // 20))]
+    common = [f"common term{term}" for term in range(20)]
+    return [{
+        "file_name": f"paper_{index:05d}.pdf",
+        "keywords": rng.sample(rng.choice(topics), 8) + rng.sample(common, 2)
+    } for index in range(count)]
+
+
+def _pairwise_similar(results: List[Dict[str, Any]], threshold: float) -> List[Dict[str, Any]]:
+    """The pure-Python double loop find_similar_documents used before"""
+    keyword_sets = [set(doc.get('keywords', [])) for doc in results]
+    similar_pairs = []
+    for i, keywords1 in enumerate(keyword_sets):
+        if not keywords1:
+            continue
+        for j in range(i + 1, len(results)):
+            keywords2 = keyword_sets[j]
+            if not keywords2:
+                continue
+            common = keywords1 & keywords2
+            similarity = len(common) / len(keywords1 | keywords2)
+            if similarity >= threshold:
+                similar_pairs.append({"doc1": results[i]['file_name'], "doc2": results[j]['file_name'],
+                                      "similarity": similarity, "common_keywords": list(common)})
+    return sorted(similar_pairs, key=lambda x: x['similarity'], reverse=True)
+
+
+def benchmark_similarity(pdf_paths: List[str], sizes: Sequence[int] = (1000, 5000, 20000),
+                         threshold: float = 0.3, pairwise_limit: int = 5000) -> Dict[str, Any]:
+    """find_similar_documents time per method and collection size, with LSH recall against exact"""
+    report = {"threshold": threshold, "lsh_threshold_ratio": ANALYTICS_CONFIG["similarity_lsh_threshold_ratio"],
+              "sizes": {}}
+    # Import scipy outside the timings
+    DocumentComparator(_synthetic_keywords(2)).find_similar_documents(threshold, method="exact")
+    for size in sizes:
+        results = _synthetic_keywords(size)
+        timings = {}
+        if size <= pairwise_limit:
+            timings["pairwise_seconds"], _ = _timed(lambda: _pairwise_similar(results, threshold), repeat=1)
+        # A fresh comparator per run so the incidence matrix and signatures are built inside the timing
+        timings["exact_seconds"], exact = _timed(
+            lambda: DocumentComparator(results).find_similar_documents(threshold, method="exact"), repeat=1)
+        timings["lsh_seconds"], approximate = _timed(
+            lambda: DocumentComparator(results).find_similar_documents(threshold, method="lsh"), repeat=1)
+
+        found = {(pair["doc1"], pair["doc2"]) for pair in approximate}
+        expected = {(pair["doc1"], pair["doc2"]) for pair in exact}
+        report["sizes"][size] = {
+            **timings,
+            "pairs": len(expected),
+            "lsh_recall": len(found & expected) / len(expected) if expected else 1.0
+        }
+    return report
+
+
+BENCHMARKS = {
+    "metadata": benchmark_metadata,
+    "serialization": benchmark_serialization,
+    "similarity": benchmark_similarity
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the PDF processing pipeline")
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS))
+    parser.add_argument("directory", nargs="?", help="Directory containing PDF files")
+    parser.add_argument("--documents", type=int, default=10000,
+                        help="Synthetic results to encode for the serialization benchmark")
+    parser.add_argument("--sizes", default="1000,5000,20000",
+                        help="Comma-separated collection sizes for the similarity benchmark")
+    args = parser.parse_args()
+
+    if args.benchmark == "serialization":
+        report = benchmark_serialization([], documents=args.documents)
+    elif args.benchmark == "similarity":
+        report = benchmark_similarity([], sizes=[int(size) for size in args.sizes.split(",")])
+    else:
+        if not args.directory:
+            parser.error(f"the {args.benchmark} benchmark needs a directory of PDFs")
+        pdf_paths = find_pdf_files(args.directory)
+        report = BENCHMARKS[args.benchmark](pdf_paths)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
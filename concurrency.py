@@ -0,0 +1,140 @@
+"""
+Adaptive concurrency control for batch processing
+"""
+import os
+import time
+import logging
+import multiprocessing
+from collections import deque, Counter
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+from config import CONCURRENCY_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+def process_rss_mb(pid: Optional[int] = None) -> float:
+    """Resident set size of a process in MB, or 0 where /proc is unavailable"""
+    try:
+        with open(f"/proc/{pid or 'self'}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+
+def total_rss_mb() -> float:
+    """RSS of this process plus its child processes, such as sandboxed extraction workers"""
+    return process_rss_mb() + sum(process_rss_mb(child.pid) for child in multiprocessing.active_children())
+
+
+class AdaptiveConcurrencyController:
+    """Grow or shrink the number of in-flight tasks AIMD-style.
+
+    After every window of completions the controller checks total RSS against
+    the memory ceiling and mean task latency against a latency baseline. It
+    halves the limit (multiplicative decrease) when either is exceeded, holds it
+    when memory is close to the ceiling or throughput fell, and otherwise adds one
+    task (additive increase), always within [min_limit, max_limit].
+
+    The baseline is the best window latency of the current batch, and closes
+    baseline_decay of the gap to each slower window, so a run of larger
+    documents stops counting as degraded latency once it persists.
+    """
+
+    def __init__(self, min_limit: Optional[int] = None, max_limit: Optional[int] = None,
+                 memory_limit_mb: Optional[float] = None, initial_limit: Optional[int] = None):
+        self.min_limit = min_limit or CONCURRENCY_CONFIG["min_limit"]
+        self.max_limit = max_limit or CONCURRENCY_CONFIG["max_limit"] or os.cpu_count() or 1
+        self.memory_limit_mb = memory_limit_mb or CONCURRENCY_CONFIG["memory_limit_mb"]
+        self.limit = max(self.min_limit, min(initial_limit or self.min_limit, self.max_limit))
+
+        self.decrease_factor = CONCURRENCY_CONFIG["decrease_factor"]
+        self.latency_tolerance = CONCURRENCY_CONFIG["latency_tolerance"]
+        self.memory_headroom = CONCURRENCY_CONFIG["memory_headroom"]
+        self.baseline_decay = CONCURRENCY_CONFIG["baseline_decay"]
+
+        self.baseline_latency: Optional[float] = None
+        self.last_throughput: Optional[float] = None
+        self.rss_mb = total_rss_mb()
+        self.adjustments = Counter()
+        self.decisions = deque(maxlen=CONCURRENCY_CONFIG["decision_history"])
+
+        self._window_start = time.perf_counter()
+        self._window_latencies = []
+
+    def reset_baseline(self):
+        """Forget the latency baseline and throughput of earlier batches, keeping the limit"""
+        self.baseline_latency = None
+        self.last_throughput = None
+        self._window_start = time.perf_counter()
+        self._window_latencies = []
+
+    def on_complete(self, latency: float):
+        """Record a finished task and adjust the limit at the end of each window"""
+        self._window_latencies.append(latency)
+        if len(self._window_latencies) >= max(self.limit, CONCURRENCY_CONFIG["min_window"]):
+            self._adjust()
+
+    def _adjust(self):
+        elapsed = time.perf_counter() - self._window_start
+        completed = len(self._window_latencies)
+        throughput = completed / elapsed if elapsed > 0 else 0.0
+        mean_latency = sum(self._window_latencies) / completed
+        self.rss_mb = total_rss_mb()
+
+        if self.baseline_latency is None or mean_latency < self.baseline_latency:
+            self.baseline_latency = mean_latency
+
+        previous_limit = self.limit
+        if self.memory_limit_mb and self.rss_mb > self.memory_limit_mb:
+            action, reason = "decrease", "memory"
+        elif mean_latency > self.baseline_latency * self.latency_tolerance:
+            action, reason = "decrease", "latency"
+        elif self.memory_limit_mb and self.rss_mb > self.memory_limit_mb * self.memory_headroom:
+            action, reason = "hold", "memory_headroom"
+        elif self.last_throughput is not None and throughput < self.last_throughput * 0.95:
+            action, reason = "hold", "throughput"
+        else:
+            action, reason = "increase", "throughput"
+
+        if action == "decrease":
+            self.limit = max(self.min_limit, int(self.limit * self.decrease_factor))
+        elif action == "increase":
+            self.limit = min(self.max_limit, self.limit + 1)
+
+        decision = {
+            "time": datetime.now().isoformat(),
+            "action": action,
+            "reason": reason,
+            "previous_limit": previous_limit,
+            "limit": self.limit,
+            "rss_mb": self.rss_mb,
+            "mean_latency": mean_latency,
+            "throughput": throughput
+        }
+        self.decisions.append(decision)
+        self.adjustments[action] += 1
+        if self.limit != previous_limit:
+            logger.info(
+                f"Concurrency {action} ({reason}): {previous_limit} -> {self.limit} in-flight tasks "
+                f"(RSS {self.rss_mb:.0f}MB, latency {mean_latency:.2f}s, {throughput:.2f} docs/s)"
+            )
+
+        self.baseline_latency += (mean_latency - self.baseline_latency) * self.baseline_decay
+        self.last_throughput = throughput
+        self._window_start = time.perf_counter()
+        self._window_latencies = []
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "memory_limit_mb": self.memory_limit_mb,
+            "rss_mb": self.rss_mb,
+            "baseline_latency": self.baseline_latency,
+            "last_throughput": self.last_throughput,
+            "adjustments": dict(self.adjustments),
+            "recent_decisions": list(self.decisions)
+        }
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from typing import Dict, Any
 
 # Model configurations
@@ -12,11 +13,53 @@ MODEL_CONFIG: Dict[str, Any] = {
     "keywords_ngram_range": (1, 3)
 }
 
+# Model tiers selectable per run; each overrides MODEL_CONFIG entries
+MODEL_TIERS: Dict[str, Dict[str, Any]] = {
+    "full": {
+        "summarizer_model": "facebook/bart-large-cnn",
+        "keywords_top_n": 15,
+        "keywords_ngram_range": (1, 3)
+    },
+    "fast": {
+        "summarizer_model": "sshleifer/distilbart-cnn-12-6",
+        "keywords_top_n": 10,
+        "keywords_ngram_range": (1, 2)
+    }
+}
+
 # File processing configurations
 FILE_CONFIG: Dict[str, Any] = {
     "max_file_size_mb": 50,
     "max_pages_extract": 2,
-    "text_chunk_size": 3000
+    "text_chunk_size": 3000,
+    "use_pdf_metadata": True
+}
+
+# Streaming upload configurations
+UPLOAD_CONFIG: Dict[str, Any] = {
+    "spool_max_size": 8 * 1024 * 1024,  # uploads up to this size are processed from memory
+    "chunk_size": 64 * 1024,  # bytes read from the request body at a time
+    "max_parts": 1000
+}
+
+# ZIP/TAR archive ingestion configurations
+ARCHIVE_CONFIG: Dict[str, Any] = {
+    "max_members": 10000,  # PDFs read from one archive
+    "max_member_size_mb": 50,  # uncompressed size of one PDF member
+    "max_total_size_mb": 10240,  # uncompressed size of all PDF members of one archive
+    "max_upload_size_mb": 2048  # archive uploads to /batch
+}
+
+# Sandboxed PDF extraction configurations
+EXTRACTION_CONFIG: Dict[str, Any] = {
+    "sandboxed": True,
+    "workers": 4,
+    "cpu_time_limit": 30,  # CPU seconds per document
+    "wall_time_limit": 60,  # seconds per document
+    "memory_limit_mb": 1024,  # RSS per worker
+    "max_tasks_per_worker": 50,
+    "start_method": "forkserver" if os.name == "posix" else "spawn",
+    "poll_interval": 0.05
 }
 
 # UI configurations
@@ -30,12 +73,74 @@ UI_CONFIG: Dict[str, Any] = {
 BATCH_CONFIG: Dict[str, Any] = {
     "max_workers": 4,
     "chunk_size": 1000,
-    "progress_update_interval": 1
+    "progress_update_interval": 1,
+    "max_in_flight": None,  # files submitted at once when streaming; None means 2 * max_workers
+    "journal_fsync": False,  # fsync the checkpoint journal after every file
+    "schedule": True  # dispatch by priority, then longest predicted cost first
+}
+
+# Adaptive batch concurrency configurations
+CONCURRENCY_CONFIG: Dict[str, Any] = {
+    "enabled": False,  # adapt the number of in-flight files instead of using max_workers
+    "min_limit": 1,
+    "max_limit": None,  # None means os.cpu_count()
+    "memory_limit_mb": None,  # RSS ceiling including extraction workers; None disables the check
+    "memory_headroom": 0.9,  # stop growing above this share of the ceiling
+    "latency_tolerance": 2.0,  # shrink when mean latency exceeds the baseline by this factor
+    "baseline_decay": 0.25,  # share of the gap to a slower window the latency baseline closes
+    "decrease_factor": 0.5,
+    "min_window": 4,  # completions between decisions
+    "decision_history": 50
+}
+
+# Shared SQLite work queue configurations
+QUEUE_CONFIG: Dict[str, Any] = {
+    "path": "work_queue.sqlite3",
+    "lease_timeout": 300,  # seconds a job stays leased without a heartbeat
+    "heartbeat_interval": None,  # None means lease_timeout / 3
+    "max_attempts": 3,
+    "retry_delay": 30,  # seconds before a failed job is retried, multiplied by its attempt count
+    "poll_interval": 5,  # seconds between lease attempts when no job is available
+    "busy_timeout": 30  # seconds to wait for another worker's transaction
+}
+
+# Batch scheduling cost model configurations
+SCHEDULER_CONFIG: Dict[str, Any] = {
+    "model_path": os.path.join("exports", "cost_model.json"),
+    "prior_weights": [1.0, 0.5, 0.0, 0.0],  # seconds: intercept, per MB, per page, per 1k tokens
+    "max_known_files": 10000,  # paths whose observed page and token counts are kept for planning
+    "history_size": 500,
+    "min_observations": 10,
+    "min_cost": 0.01
+}
+
+# Near-duplicate detection configurations
+DEDUP_CONFIG: Dict[str, Any] = {
+    "enabled": True,
+    "threshold": 0.8,  # estimated Jaccard similarity of text shingles
+    "num_perm": 128,
+    "shingle_size": 5,  # words per shingle
+    "max_documents": 100000,  # documents kept in the LSH index
+    "recent_results": 1000,  # finished originals whose reused outputs are kept for later duplicates
+    "wait_timeout": 600,  # seconds a duplicate waits for its original before being processed itself
+    "mode": "reuse"  # "reuse" copies the original's outputs, "mark" only flags the duplicate
+}
+
+# Hot folder watcher configurations
+WATCH_CONFIG: Dict[str, Any] = {
+    "index_path": "hot_folder_index.sqlite3",
+    "poll_interval": 10,  # seconds between rescans
+    "settle_time": 5  # seconds a file must be unchanged before it is processed
 }
 
 # Analytics configurations
 ANALYTICS_CONFIG: Dict[str, Any] = {
     "similarity_threshold": 0.3,
+    "similarity_method": "auto",  # "exact" sparse products, "lsh" MinHash candidates, or "auto" by size
+    "similarity_lsh_min_documents": 50000,  # "auto" switches to "lsh" from this many documents
+    "similarity_lsh_num_perm": 128,
+    "similarity_lsh_threshold_ratio": 0.7,  # LSH bands target this fraction of the threshold; lower finds more pairs, slower
+    "similarity_block_size": 1024,  # document rows per sparse product
     "max_clusters": 10,
     "keyword_cloud_max_words": 50
 }
@@ -44,7 +149,16 @@ ANALYTICS_CONFIG: Dict[str, Any] = {
 EXPORT_CONFIG: Dict[str, Any] = {
     "output_directory": "exports",
     "supported_formats": ["json", "csv", "excel", "word", "pdf"],
-    "default_format": "json"
+    "default_format": "json",
+    "compact_json": False  # write JSON exports without indentation
+}
+
+# JSON serialization and response compression configurations
+SERIALIZATION_CONFIG: Dict[str, Any] = {
+    "backend": "auto",  # "auto" uses orjson when installed; "json" forces the standard library
+    "compress_min_size": 16 * 1024,  # bytes; smaller responses are sent uncompressed
+    "gzip_level": 1,  # higher levels save little more on JSON at several times the CPU
+    "zstd_level": 3  # used when the zstandard package is installed and the client accepts zstd
 }
 
 # API configurations
@@ -52,7 +166,84 @@ API_CONFIG: Dict[str, Any] = {
     "host": "0.0.0.0",
     "port": 5000,
     "debug": True,
-    "max_content_length": 50 * 1024 * 1024  # 50MB
+    "max_content_length": 50 * 1024 * 1024,  # 50MB
+    # Production serving (serve.py)
+    "workers": None,  # pre-forked worker processes; None means os.cpu_count()
+    "threads_per_worker": 1,
+    "preload_models": True,  # load models once in the master and share them copy-on-write
+    "max_requests": 1000,  # recycle a worker after this many requests; 0 disables
+    "max_requests_jitter": 100,
+    "graceful_timeout": 30,  # seconds a stopping worker may spend finishing requests
+    "backlog": 128
+}
+
+# Admission control for the expensive API endpoints
+ADMISSION_CONFIG: Dict[str, Any] = {
+    "enabled": True,
+    "max_concurrent": 2,  # requests processed at once per API process (per worker under serve.py)
+    "max_queue": 16,  # further requests allowed to wait; beyond this they get 503
+    "queue_timeout": 30,  # seconds a request may wait for a slot before being dropped
+    "deadline_header": "X-Request-Timeout",  # seconds the client is willing to wait in total
+    "rate_per_client": 2.0,  # sustained requests per second per client and API process
+    "burst_per_client": 10,
+    "client_header": "X-API-Key",
+    "api_keys": set(),  # keys in client_header that identify a client; others are limited by remote address
+    "max_clients": 10000,
+    "reserved_interactive": 1,  # slots only the interactive lane may use
+    "lane_policy": "weighted",  # "weighted" fair sharing or "strict" priority between lanes
+    "lane_weights": {"interactive": 4, "bulk": 1},  # share of freed slots when both lanes wait
+    "lane_header": "X-Priority",  # "bulk" moves an interactive request to the bulk lane
+    "preempt_bulk": True,  # pause bulk documents at stage boundaries while interactive requests run
+    "preempt_max_pause": 10,  # seconds one bulk document may be held at one boundary
+    "preempt_max_total": 30,  # seconds one bulk document may be held in all
+    "preempt_poll_interval": 0.1,  # seconds between checks for interactive requests in other processes
+    # Shared lock through which processes on this host see each other's interactive requests
+    "interactive_lock_path": os.path.join(tempfile.gettempdir(), "pdf_nlp_interactive.lock")
+}
+
+# /process result cache configurations
+RESULT_CACHE_CONFIG: Dict[str, Any] = {
+    "enabled": True,
+    "max_entries": 1024,  # least recently used results are evicted beyond this
+    "ttl_seconds": 3600
+}
+
+# Asynchronous batch job API configurations
+JOBS_CONFIG: Dict[str, Any] = {
+    "max_concurrent_jobs": 2,
+    "workers_per_job": 4,
+    "retention_seconds": 3600,  # keep finished jobs and their results this long
+    "max_retained_jobs": 1000,
+    # Job state shared between API worker processes
+    "state_dir": os.path.join(tempfile.gettempdir(), "pdf_nlp_jobs"),
+    "snapshot_interval": 1.0  # seconds between state snapshots of a running job
+}
+
+# Resumable chunked upload sessions (/uploads)
+UPLOAD_SESSION_CONFIG: Dict[str, Any] = {
+    "state_dir": os.path.join(tempfile.gettempdir(), "pdf_nlp_uploads"),
+    "max_chunk_size": 32 * 1024 * 1024,  # bytes per chunk request, below max_content_length
+    "max_files": 10000,  # files per session
+    "max_session_size_mb": 20480,  # declared bytes per session
+    "retention_seconds": 24 * 3600  # keep session state this long after its last activity
+}
+
+# Server-side result datasets for /analyze, /compare and /cluster
+DATASETS_CONFIG: Dict[str, Any] = {
+    "state_dir": os.path.join(tempfile.gettempdir(), "pdf_nlp_datasets"),
+    "max_in_memory": 16,  # datasets kept warm per process
+    "max_cached_answers": 4,  # similarity thresholds and cluster counts whose answers each dataset keeps
+    "retention_seconds": 24 * 3600  # delete datasets unused for this long
+}
+
+# Prometheus-style metrics configurations
+METRICS_CONFIG: Dict[str, Any] = {
+    "enabled": True,
+    "latency_buckets": (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),  # seconds
+    # Directory where each serve.py worker publishes its metrics for /metrics to
+    # merge; serve.py creates one per run
+    "multiprocess_dir": None,
+    "snapshot_interval": 5.0  # seconds between a worker's metric snapshots
 }
 
 # Logging configuration
@@ -0,0 +1,185 @@
+"""
+Server-side datasets of processing results for the analytics endpoints
+"""
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from analytics import DocumentAnalytics, DocumentComparator
+from config import DATASETS_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+def _valid_id(dataset_id: str) -> bool:
+    # Dataset ids are hex uuids; anything else cannot name a file
+    return bool(dataset_id) and all(c in "0123456789abcdef" for c in dataset_id)
+
+
+class Dataset:
+    """Results stored under an id, with analytics structures built on first use.
+
+    The DataFrame, keyword index and TF-IDF matrix are built once and reused, as
+    is the report. Answers for the max_cached_answers most recently used
+    thresholds and cluster counts are kept too.
+    """
+
+    def __init__(self, results: List[Dict[str, Any]], dataset_id: Optional[str] = None,
+                 source: Optional[str] = None, created_at: Optional[str] = None):
+        self.dataset_id = dataset_id or uuid.uuid4().hex
+        self.results = results
+        self.source = source
+        self.created_at = created_at or datetime.now().isoformat()
+        self._analytics: Optional[DocumentAnalytics] = None
+        self._comparator: Optional[DocumentComparator] = None
+        self._report: Optional[Dict[str, Any]] = None
+        self._similar: "OrderedDict[float, List[Dict[str, Any]]]" = OrderedDict()
+        self._clusters: "OrderedDict[int, Dict[str, List[str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def analytics(self) -> DocumentAnalytics:
+        with self._lock:
+            if self._analytics is None:
+                self._analytics = DocumentAnalytics(self.results)
+            return self._analytics
+
+    @property
+    def comparator(self) -> DocumentComparator:
+        with self._lock:
+            if self._comparator is None:
+                self._comparator = DocumentComparator(self.results)
+            return self._comparator
+
+    def report(self) -> Dict[str, Any]:
+        if self._report is None:
+            self._report = self.analytics.generate_report()
+        return self._report
+
+    def _cached(self, cache: OrderedDict, key: Any, compute: Callable[[], Any]) -> Any:
+        """Look key up in a least recently used cache of answers, computing and adding it if missing"""
+        with self._lock:
+            if key in cache:
+                cache.move_to_end(key)
+                return cache[key]
+        value = compute()
+        with self._lock:
+            cache[key] = value
+            while len(cache) > DATASETS_CONFIG["max_cached_answers"]:
+                cache.popitem(last=False)
+        return value
+
+    def similar_documents(self, threshold: float) -> List[Dict[str, Any]]:
+        return self._cached(self._similar, threshold, lambda: self.comparator.find_similar_documents(threshold))
+
+    def clusters(self, n_clusters: int) -> Dict[str, List[str]]:
+        return self._cached(self._clusters, n_clusters, lambda: self.comparator.cluster_documents(n_clusters))
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "dataset_id": self.dataset_id,
+            "source": self.source,
+            "total_documents": len(self.results),
+            "created_at": self.created_at
+        }
+
+
+class DatasetStore:
+    """Keep datasets on disk under state_dir and the most recently used ones in memory.
+
+    Datasets are written to disk so that every API worker process (serve.py)
+    can load one created by another; each process keeps its own warm copies.
+    Datasets unused for retention_seconds are deleted.
+    """
+
+    def __init__(self, state_dir: Optional[str] = None, max_in_memory: Optional[int] = None,
+                 retention_seconds: Optional[float] = None):
+        self.state_dir = state_dir or DATASETS_CONFIG["state_dir"]
+        self.max_in_memory = max_in_memory or DATASETS_CONFIG["max_in_memory"]
+        self.retention_seconds = retention_seconds or DATASETS_CONFIG["retention_seconds"]
+        os.makedirs(self.state_dir, exist_ok=True)
+        self._datasets: "OrderedDict[str, Dataset]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+
+    def _path(self, dataset_id: str) -> str:
+        return os.path.join(self.state_dir, f"{dataset_id}.json")
+
+    def _remember(self, dataset: Dataset):
+        with self._lock:
+            self._datasets[dataset.dataset_id] = dataset
+            self._datasets.move_to_end(dataset.dataset_id)
+            while len(self._datasets) > self.max_in_memory:
+                self._datasets.popitem(last=False)
+
+    def create(self, results: List[Dict[str, Any]], source: Optional[str] = None) -> Dataset:
+        """Store results and return the new dataset"""
+        self.purge_expired()
+        dataset = Dataset(results, source=source)
+        path = self._path(dataset.dataset_id)
+        with open(path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump({"info": dataset.info(), "results": dataset.results}, f, ensure_ascii=False, default=str)
+        os.replace(path + ".tmp", path)
+        self._remember(dataset)
+        logger.info(f"Stored dataset {dataset.dataset_id} with {len(dataset.results)} results")
+        return dataset
+
+    def get(self, dataset_id: str) -> Optional[Dataset]:
+        """The dataset, loading it from disk if another process created it"""
+        with self._lock:
+            dataset = self._datasets.get(dataset_id)
+            if dataset is not None:
+                self._datasets.move_to_end(dataset_id)
+        if dataset is None:
+            if not _valid_id(dataset_id):
+                return None
+            try:
+                with open(self._path(dataset_id), encoding='utf-8') as f:
+                    state = json.load(f)
+            except (OSError, ValueError):
+                return None
+            info = state["info"]
+            dataset = Dataset(state["results"], dataset_id=dataset_id,
+                              source=info.get("source"), created_at=info.get("created_at"))
+            self._remember(dataset)
+        try:
+            # The file's mtime records when the dataset was last used
+            os.utime(self._path(dataset_id))
+        except FileNotFoundError:
+            # Deleted or expired by another process
+            with self._lock:
+                self._datasets.pop(dataset_id, None)
+            return None
+        return dataset
+
+    def delete(self, dataset_id: str) -> bool:
+        with self._lock:
+            self._datasets.pop(dataset_id, None)
+        if not _valid_id(dataset_id):
+            return False
+        try:
+            os.unlink(self._path(dataset_id))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def purge_expired(self):
+        """Delete datasets not used for retention_seconds, checked at most once a minute"""
+        now = time.time()
+        if now - self._last_purge < 60:
+            return
+        self._last_purge = now
+        for entry in os.scandir(self.state_dir):
+            try:
+                if now - entry.stat().st_mtime > self.retention_seconds:
+                    os.unlink(entry.path)
+                    with self._lock:
+                        self._datasets.pop(entry.name.split(".")[0], None)
+            except OSError:
+                pass
@@ -0,0 +1,214 @@
+"""
+Near-duplicate detection with MinHash signatures and an LSH index
+"""
+import re
+import zlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Iterable, Tuple, Set
+
+import numpy as np
+
+from config import DEDUP_CONFIG
+
+logger = logging.getLogger(__name__)
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+# Outputs a near-duplicate copies from its original
+REUSED_FIELDS = ("title", "authors", "extraction_strategy", "summary", "keywords")
+
+
+def shingles(text: str, size: Optional[int] = None) -> Set[str]:
+    """Word shingles of a text after lowercasing and stripping punctuation"""
+    size = size or DEDUP_CONFIG["shingle_size"]
+    words = re.findall(r'[^\W_]+', text.replace("-\n", "").lower())
+    if len(words) < size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+class MinHasher:
+    """Compute MinHash signatures of string sets with num_perm hash permutations"""
+
+    def __init__(self, num_perm: Optional[int] = None, seed: int = 1):
+        self.num_perm = num_perm or DEDUP_CONFIG["num_perm"]
+        generator = np.random.RandomState(seed)
+        self._a = generator.randint(1, (1 << 61) - 1, size=self.num_perm, dtype=np.uint64)
+        self._b = generator.randint(0, (1 << 61) - 1, size=self.num_perm, dtype=np.uint64)
+
+    def signature(self, items: Iterable[str]) -> np.ndarray:
+        hashes = np.array([zlib.crc32(item.encode('utf-8')) for item in items], dtype=np.uint64)
+        if hashes.size == 0:
+            return np.full(self.num_perm, _MAX_HASH, dtype=np.uint64)
+        # Overflow in the multiply wraps, which is fine for hashing
+        with np.errstate(over='ignore'):
+            permuted = (np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=0)
+
+
+def estimate_jaccard(signature1: np.ndarray, signature2: np.ndarray) -> float:
+    """Estimate Jaccard similarity from the share of matching MinHash values"""
+    return float(np.mean(signature1 == signature2))
+
+
+def optimal_bands(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """Pick (bands, rows) with bands * rows <= num_perm whose S-curve midpoint is closest to threshold"""
+    best = (1, num_perm)
+    best_distance = float('inf')
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        distance = abs((1 / bands) ** (1 / rows) - threshold)
+        if distance < best_distance:
+            best, best_distance = (bands, rows), distance
+    return best
+
+
+class LSHIndex:
+    """Banded locality-sensitive hashing index over MinHash signatures"""
+
+    def __init__(self, num_perm: int, threshold: float):
+        self.threshold = threshold
+        self.bands, self.rows = optimal_bands(num_perm, threshold)
+        self._buckets: List[Dict[bytes, List[Any]]] = [{} for _ in range(self.bands)]
+        self.signatures: Dict[Any, np.ndarray] = {}
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [
+            signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            for band in range(self.bands)
+        ]
+
+    def insert(self, key: Any, signature: np.ndarray):
+        self.signatures[key] = signature
+        for band, band_key in enumerate(self._band_keys(signature)):
+            self._buckets[band].setdefault(band_key, []).append(key)
+
+    def candidates(self, signature: np.ndarray) -> Set[Any]:
+        found = set()
+        for band, band_key in enumerate(self._band_keys(signature)):
+            found.update(self._buckets[band].get(band_key, ()))
+        return found
+
+    def query(self, signature: np.ndarray) -> List[Tuple[Any, float]]:
+        """Candidates whose estimated Jaccard similarity reaches the threshold, best first"""
+        matches = []
+        for key in self.candidates(signature):
+            similarity = estimate_jaccard(signature, self.signatures[key])
+            if similarity >= self.threshold:
+                matches.append((key, similarity))
+        return sorted(matches, key=lambda match: match[1], reverse=True)
+
+    def __len__(self):
+        return len(self.signatures)
+
+
+def candidate_pairs(signatures: np.ndarray, threshold: float) -> np.ndarray:
+    """Index pairs (i < j) of rows of an (n, num_perm) signature array that share an LSH band.
+
+    The batch counterpart of LSHIndex for comparing a whole collection at once;
+    returns a sorted (m, 2) array without duplicates.
+    """
+    count, num_perm = signatures.shape
+    bands, rows = optimal_bands(num_perm, threshold)
+    found = np.empty(0, dtype=np.int64)
+    positions_all = np.arange(count)
+    for band in range(bands):
+        # Fold each band into one 64-bit key; a collision only adds a candidate
+        keys = np.zeros(count, dtype=np.uint64)
+        with np.errstate(over='ignore'):
+            for column in range(band * rows, (band + 1) * rows):
+                keys = keys * np.uint64(0x100000001B3) ^ signatures[:, column]
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        starts = np.concatenate(([0], np.flatnonzero(sorted_keys[1:] != sorted_keys[:-1]) + 1))
+        run_ends = np.repeat(np.append(starts[1:], count), np.diff(np.append(starts, count)))
+
+        # Pair each bucket member with every later member of its bucket
+        later = run_ends - positions_all - 1
+        first = np.repeat(positions_all, later)
+        if first.size:
+            step = np.arange(first.size) - np.repeat(np.cumsum(later) - later, later) + 1
+            first, second = order[first], order[first + step]
+            codes = np.minimum(first, second) * count + np.maximum(first, second)
+            merged = np.sort(np.concatenate((found, codes)))
+            found = merged[np.append(True, merged[1:] != merged[:-1])]
+    return np.stack((found // count, found % count), axis=1) if count else np.empty((0, 2), dtype=np.int64)
+
+
+class DuplicateDetector:
+    """Find near-duplicate documents before inference and share the original's result.
+
+    Originals register their text as soon as it is extracted and publish their
+    result when done; a duplicate waits for its original's result instead of
+    running the models itself. Only signatures are kept for every document:
+    results are reduced to the reused fields and held while duplicates wait on
+    them, plus for the recent_results most recently finished originals, so a
+    duplicate of an older original is processed normally.
+    """
+
+    def __init__(self, threshold: Optional[float] = None, num_perm: Optional[int] = None,
+                 max_documents: Optional[int] = None, recent_results: Optional[int] = None):
+        self.threshold = threshold or DEDUP_CONFIG["threshold"]
+        self.max_documents = max_documents or DEDUP_CONFIG["max_documents"]
+        self.recent_results = DEDUP_CONFIG["recent_results"] if recent_results is None else recent_results
+        self.hasher = MinHasher(num_perm)
+        self.index = LSHIndex(self.hasher.num_perm, self.threshold)
+        self._lock = threading.Lock()
+        # Originals still being processed, and how many duplicates wait on each
+        self._pending: Dict[str, threading.Event] = {}
+        self._waiters: Dict[str, int] = {}
+        self._results: Dict[str, Tuple[Optional[Dict[str, Any]], float]] = {}
+        self._recent: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+
+    def register(self, key: str, text: str) -> Optional[Tuple[str, float]]:
+        """Return (original key, similarity) for a near-duplicate, otherwise index the text"""
+        signature = self.hasher.signature(shingles(text))
+        with self._lock:
+            matches = [(match, similarity) for match, similarity in self.index.query(signature)
+                       if match != key]
+            if matches:
+                return matches[0]
+            if len(self.index) < self.max_documents:
+                self.index.insert(key, signature)
+                self._pending[key] = threading.Event()
+        return None
+
+    def publish(self, key: str, result: Optional[Dict[str, Any]], inference_time: float = 0.0):
+        """Share an original's result (None if it failed) with waiting duplicates"""
+        with self._lock:
+            event = self._pending.pop(key, None)
+            if event is None:
+                return
+            reused = {field: result[field] for field in REUSED_FIELDS} if result else None
+            if self._waiters.get(key):
+                self._results[key] = (reused, inference_time)
+            if reused and self.recent_results:
+                self._recent[key] = (reused, inference_time)
+                while len(self._recent) > self.recent_results:
+                    self._recent.popitem(last=False)
+        event.set()
+
+    def wait_for_result(self, key: str, timeout: Optional[float] = None) -> Tuple[Optional[Dict[str, Any]], float]:
+        """Block until the original publishes; returns (reused fields, inference seconds).
+
+        Returns (None, 0.0) if the original failed, does not publish within
+        timeout, or finished too long ago to still be held.
+        """
+        with self._lock:
+            event = self._pending.get(key)
+            if event is None:
+                if key in self._recent:
+                    self._recent.move_to_end(key)
+                return self._recent.get(key, (None, 0.0))
+            self._waiters[key] = self._waiters.get(key, 0) + 1
+        event.wait(timeout)
+        with self._lock:
+            result = self._results.get(key, (None, 0.0))
+            self._waiters[key] -= 1
+            if not self._waiters[key]:
+                del self._waiters[key]
+                self._results.pop(key, None)
+        return result
@@ -2,13 +2,15 @@
 Export functionality for multiple formats
 """
 import os
-import json
 import pandas as pd
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 import logging
 from pathlib import Path
 
+from serialization import dumps
+from config import EXPORT_CONFIG
+
 # For Word document export
 try:
     from docx import Document
@@ -38,8 +40,11 @@ class ExportManager:
         self.output_dir = output_dir
         os.makedirs(output_dir, exist_ok=True)
     
-    def export_to_json(self, results: List[Dict[str, Any]], filename: Optional[str] = None) -> str:
-        """Export results to JSON format"""
+    def export_to_json(self, results: List[Dict[str, Any]], filename: Optional[str] = None,
+                       compact: Optional[bool] = None) -> str:
+        """Export results to JSON format, indented unless compact"""
+        if compact is None:
+            compact = EXPORT_CONFIG["compact_json"]
         if not filename:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             filename = f"pdf_analysis_{timestamp}.json"
@@ -55,8 +60,8 @@ class ExportManager:
             "results": results
         }
         
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(export_data, f, indent=2, ensure_ascii=False)
+        with open(filepath, 'wb') as f:
+            f.write(dumps(export_data, indent=not compact))
         
         logger.info(f"Exported {len(results)} documents to JSON: {filepath}")
         return filepath
@@ -0,0 +1,290 @@
+"""
+Sandboxed PDF parsing in a supervised pool of worker subprocesses
+"""
+import os
+import time
+import queue
+import atexit
+import signal
+import logging
+import threading
+import multiprocessing
+from functools import lru_cache
+from typing import Dict, Any, Optional
+
+try:
+    import resource
+    RESOURCE_AVAILABLE = True
+except ImportError:
+    RESOURCE_AVAILABLE = False
+
+from pdf_parser import parse_pdf
+from config import EXTRACTION_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+class ExtractionError(Exception):
+    """PDF parsing failed inside an extraction worker"""
+
+    kind = "error"
+
+    def __init__(self, pdf_path: str, message: str):
+        super().__init__(message)
+        self.pdf_path = pdf_path
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "file_path": self.pdf_path,
+            "error": str(self),
+            "error_type": self.kind
+        }
+
+
+class ExtractionTimeoutError(ExtractionError):
+    """The worker exceeded its CPU-time or wall-clock limit"""
+
+    kind = "timeout"
+
+
+class ExtractionMemoryError(ExtractionError):
+    """The worker exceeded its memory limit"""
+
+    kind = "memory"
+
+
+class ExtractionCrashError(ExtractionError):
+    """The worker died without reporting a result"""
+
+    kind = "crash"
+
+
+def _set_cpu_deadline(cpu_time_limit: Optional[float]):
+    """Let the current process use at most cpu_time_limit more CPU seconds"""
+    if not RESOURCE_AVAILABLE or not cpu_time_limit:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    soft = int(usage.ru_utime + usage.ru_stime) + int(cpu_time_limit)
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def _worker_main(conn, cpu_time_limit: Optional[float], max_tasks: int):
+    """Parse PDFs sent over conn until told to stop or max_tasks is reached"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    for _ in range(max_tasks):
+        try:
+            task = conn.recv()
+        except EOFError:
+            break
+        if task is None:
+            break
+
+        pdf_path, max_pages, data = task
+        _set_cpu_deadline(cpu_time_limit)
+        try:
+            conn.send(("ok", parse_pdf(pdf_path, max_pages=max_pages, data=data)))
+        except MemoryError:
+            conn.send(("memory", "Out of memory while parsing PDF"))
+        except Exception as e:
+            conn.send(("error", f"Error extracting text from PDF: {e}"))
+    conn.close()
+
+
+class _Worker:
+    """Handle on a single extraction subprocess"""
+
+    def __init__(self, context, cpu_time_limit: Optional[float], max_tasks: int):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main,
+            args=(child_conn, cpu_time_limit, max_tasks),
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.tasks_done = 0
+
+    def rss_bytes(self) -> int:
+        """Resident set size of the worker, or 0 where /proc is unavailable"""
+        try:
+            with open(f"/proc/{self.process.pid}/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, IndexError):
+            return 0
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def stop(self, timeout: float = 1.0):
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class ExtractionPool:
+    """Supervised pool of subprocesses that parse PDFs under CPU-time and RSS limits.
+
+    Workers are started lazily, recycled after max_tasks_per_worker documents and
+    replaced whenever one is killed for exceeding a limit.
+    """
+
+    def __init__(self, workers: Optional[int] = None, cpu_time_limit: Optional[float] = None,
+                 wall_time_limit: Optional[float] = None, memory_limit_mb: Optional[int] = None,
+                 max_tasks_per_worker: Optional[int] = None, start_method: Optional[str] = None):
+        self.workers = workers or EXTRACTION_CONFIG["workers"]
+        self.cpu_time_limit = cpu_time_limit or EXTRACTION_CONFIG["cpu_time_limit"]
+        self.wall_time_limit = wall_time_limit or EXTRACTION_CONFIG["wall_time_limit"]
+        self.memory_limit_mb = memory_limit_mb or EXTRACTION_CONFIG["memory_limit_mb"]
+        self.max_tasks_per_worker = max_tasks_per_worker or EXTRACTION_CONFIG["max_tasks_per_worker"]
+        self.poll_interval = EXTRACTION_CONFIG["poll_interval"]
+
+        start_method = start_method or EXTRACTION_CONFIG["start_method"]
+        self._context = multiprocessing.get_context(start_method)
+        if start_method == "forkserver":
+            self._context.set_forkserver_preload(["pdf_parser"])
+
+        # Each slot holds an idle worker, or None until one is needed
+        self._idle = queue.Queue()
+        for _ in range(self.workers):
+            self._idle.put(None)
+
+        # Counters are updated by every thread that extracts through the pool
+        self._lock = threading.Lock()
+        self.stats = {
+            "documents": 0,
+            "timeouts": 0,
+            "memory_errors": 0,
+            "crashes": 0,
+            "recycled": 0
+        }
+
+    def _count(self, stat: str):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def extract(self, pdf_path: str, max_pages: Optional[int] = None,
+                data: Optional[bytes] = None) -> Dict[str, Any]:
+        """Parse a PDF in a worker; see pdf_parser.parse_pdf for the result format"""
+        worker = self._idle.get()
+        try:
+            if worker is not None and worker.tasks_done >= self.max_tasks_per_worker:
+                worker.stop()
+                self._count("recycled")
+                worker = None
+            if worker is None or not worker.process.is_alive():
+                worker = _Worker(self._context, self.cpu_time_limit, self.max_tasks_per_worker)
+            return self._run(worker, pdf_path, max_pages, data)
+        finally:
+            self._idle.put(worker)
+
+    def _run(self, worker: _Worker, pdf_path: str, max_pages: Optional[int],
+             data: Optional[bytes]) -> Dict[str, Any]:
+        self._count("documents")
+        memory_limit = self.memory_limit_mb * 1024 * 1024
+        deadline = time.monotonic() + self.wall_time_limit
+
+        # A worker that died before reading its task breaks the pipe; handle it as a crash
+        try:
+            worker.conn.send((pdf_path, max_pages, data))
+        except OSError:
+            raise self._exit_error(worker, pdf_path)
+        worker.tasks_done += 1
+
+        while True:
+            try:
+                message = worker.conn.recv() if worker.conn.poll(self.poll_interval) else None
+            except (OSError, EOFError):
+                break
+            if message is not None:
+                status, payload = message
+                if status == "ok":
+                    return payload
+                if status == "memory":
+                    worker.kill()
+                    self._count("memory_errors")
+                    raise ExtractionMemoryError(pdf_path, payload)
+                raise ExtractionError(pdf_path, payload)
+
+            if not worker.process.is_alive():
+                break
+
+            if worker.rss_bytes() > memory_limit:
+                worker.kill()
+                self._count("memory_errors")
+                logger.warning(f"Extraction worker exceeded {self.memory_limit_mb}MB on {pdf_path}")
+                raise ExtractionMemoryError(
+                    pdf_path, f"PDF parsing exceeded the {self.memory_limit_mb}MB memory limit"
+                )
+
+            if time.monotonic() > deadline:
+                worker.kill()
+                self._count("timeouts")
+                logger.warning(f"Extraction worker exceeded {self.wall_time_limit}s on {pdf_path}")
+                raise ExtractionTimeoutError(
+                    pdf_path, f"PDF parsing exceeded the {self.wall_time_limit}s time limit"
+                )
+
+        raise self._exit_error(worker, pdf_path)
+
+    def _exit_error(self, worker: _Worker, pdf_path: str) -> ExtractionError:
+        """Reap a worker that stopped without a result and return the error its exit code implies"""
+        worker.process.join(1.0)
+        exitcode = worker.process.exitcode
+        worker.kill()
+        if RESOURCE_AVAILABLE and exitcode == -signal.SIGXCPU:
+            self._count("timeouts")
+            return ExtractionTimeoutError(
+                pdf_path, f"PDF parsing exceeded the {self.cpu_time_limit}s CPU-time limit"
+            )
+        if exitcode == -signal.SIGKILL:
+            self._count("memory_errors")
+            return ExtractionMemoryError(pdf_path, "Extraction worker was killed, likely out of memory")
+        self._count("crashes")
+        return ExtractionCrashError(pdf_path, f"Extraction worker exited with code {exitcode}")
+
+    def close(self):
+        """Stop all idle workers"""
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if worker is not None:
+                worker.stop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+@lru_cache(maxsize=1)
+def get_extraction_pool() -> ExtractionPool:
+    """Shared extraction pool, created on first use"""
+    pool = ExtractionPool()
+    atexit.register(pool.close)
+    return pool
+
+
+def parse_document(pdf_path: str, max_pages: Optional[int] = None,
+                   data: Optional[bytes] = None) -> Dict[str, Any]:
+    """Parse a PDF, in the sandboxed pool when EXTRACTION_CONFIG["sandboxed"] is set.
+
+    With data, the PDF is parsed from memory and pdf_path only names it.
+    """
+    if EXTRACTION_CONFIG["sandboxed"]:
+        return get_extraction_pool().extract(pdf_path, max_pages=max_pages, data=data)
+    return parse_pdf(pdf_path, max_pages=max_pages, data=data)
@@ -0,0 +1,221 @@
+"""
+Continuous ingestion of PDFs dropped into a watched folder
+"""
+import os
+import time
+import sqlite3
+import argparse
+import logging
+import threading
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
+
+from batch_processor import BatchProcessor, iter_pdf_entries
+from job_journal import file_content_hash
+from result_sinks import ResultSink, create_sink
+from config import WATCH_CONFIG, BATCH_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+class FileIndex:
+    """Persistent (path, size, mtime, hash, status) index backed by SQLite.
+
+    The whole index is held in memory for scanning and written through to disk,
+    so a rescan costs one stat per file.
+    """
+
+    def __init__(self, index_path: str):
+        index_dir = os.path.dirname(index_path)
+        if index_dir:
+            os.makedirs(index_dir, exist_ok=True)
+        self.index_path = index_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(index_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, "
+            "content_hash TEXT, status TEXT, processed_at TEXT)"
+        )
+        self._conn.commit()
+        self.entries = {
+            path: {"size": size, "mtime_ns": mtime_ns, "content_hash": content_hash, "status": status}
+            for path, size, mtime_ns, content_hash, status in self._conn.execute(
+                "SELECT path, size, mtime_ns, content_hash, status FROM files"
+            )
+        }
+
+    def is_unchanged(self, path: str, size: int, mtime_ns: int) -> bool:
+        entry = self.entries.get(path)
+        return entry is not None and entry["size"] == size and entry["mtime_ns"] == mtime_ns
+
+    def update(self, path: str, size: int, mtime_ns: int, content_hash: str, status: str):
+        with self._lock:
+            self.entries[path] = {
+                "size": size, "mtime_ns": mtime_ns, "content_hash": content_hash, "status": status
+            }
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)",
+                (path, size, mtime_ns, content_hash, status, datetime.now().isoformat())
+            )
+            self._conn.commit()
+
+    def remove(self, paths: List[str]):
+        with self._lock:
+            for path in paths:
+                self.entries.pop(path, None)
+            self._conn.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in paths])
+            self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+
+class HotFolderWatcher:
+    """Watch a directory and process new or changed PDFs with a BatchProcessor.
+
+    Files are only queued once their mtime is at least settle_time seconds old
+    or their size and mtime have been stable for settle_time seconds across
+    scans, so partially written uploads are not picked up. Files whose stat
+    changed but whose content hash did not are re-indexed without reprocessing.
+    Failed files are retried only when they change.
+    """
+
+    def __init__(self, directory: str, processor: Optional[BatchProcessor] = None,
+                 index_path: Optional[str] = None, sinks: Optional[List[ResultSink]] = None,
+                 poll_interval: Optional[float] = None, settle_time: Optional[float] = None):
+        self.directory = directory
+        self.processor = processor or BatchProcessor(max_workers=BATCH_CONFIG["max_workers"])
+        self.index = FileIndex(index_path or WATCH_CONFIG["index_path"])
+        self.sinks = sinks or []
+        self.poll_interval = poll_interval if poll_interval is not None else WATCH_CONFIG["poll_interval"]
+        self.settle_time = settle_time if settle_time is not None else WATCH_CONFIG["settle_time"]
+        # path -> (size, mtime_ns, first seen with this stat)
+        self._pending: Dict[str, Tuple[int, int, float]] = {}
+        self._stop = threading.Event()
+
+    def scan(self) -> List[Tuple[str, int, int, str]]:
+        """Stat every PDF once and return (path, size, mtime_ns, hash) for files ready to process"""
+        now = time.time()
+        seen = set()
+        ready = []
+
+        for entry in iter_pdf_entries(self.directory):
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            path = entry.path
+            seen.add(path)
+
+            if self.index.is_unchanged(path, stat.st_size, stat.st_mtime_ns):
+                self._pending.pop(path, None)
+                continue
+
+            # Debounce files that are still being written: wait until the stat has
+            # been stable for settle_time, unless the mtime is already that old
+            settled = now - stat.st_mtime_ns / 1e9 >= self.settle_time
+            pending = self._pending.get(path)
+            if pending is None or pending[:2] != (stat.st_size, stat.st_mtime_ns):
+                self._pending[path] = (stat.st_size, stat.st_mtime_ns, now)
+                if not settled:
+                    continue
+            elif not settled and now - pending[2] < self.settle_time:
+                continue
+            del self._pending[path]
+
+            try:
+                content_hash = file_content_hash(path)
+            except OSError as e:
+                logger.warning(f"Cannot hash {path}: {e}")
+                continue
+
+            indexed = self.index.entries.get(path)
+            if indexed and indexed["content_hash"] == content_hash:
+                self.index.update(path, stat.st_size, stat.st_mtime_ns, content_hash, indexed["status"])
+                continue
+
+            ready.append((path, stat.st_size, stat.st_mtime_ns, content_hash))
+
+        vanished = [path for path in self.index.entries if path not in seen]
+        if vanished:
+            self.index.remove(vanished)
+        for path in [path for path in self._pending if path not in seen]:
+            del self._pending[path]
+
+        return ready
+
+    def run_once(self) -> Dict[str, Any]:
+        """Scan once and process every ready file; returns aggregate counts"""
+        ready = self.scan()
+        if not ready:
+            return {"queued": 0, "successful": 0, "failed": 0}
+
+        logger.info(f"Hot folder {self.directory}: {len(ready)} new or changed files")
+        file_stats = {path: (size, mtime_ns, content_hash) for path, size, mtime_ns, content_hash in ready}
+        successful = failed = 0
+
+        for result in self.processor.iter_batch(list(file_stats)):
+            size, mtime_ns, content_hash = file_stats[result["file_path"]]
+            self.index.update(result["file_path"], size, mtime_ns, content_hash, result["status"])
+            for sink in self.sinks:
+                sink.write(result)
+            if result["status"] == "success":
+                successful += 1
+            else:
+                failed += 1
+
+        return {"queued": len(ready), "successful": successful, "failed": failed}
+
+    def run_forever(self):
+        """Rescan every poll_interval seconds until stop() is called"""
+        logger.info(f"Watching {self.directory} every {self.poll_interval}s")
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Hot folder scan failed: {e}")
+            self._stop.wait(self.poll_interval)
+
+    def stop(self):
+        self._stop.set()
+
+    def close(self):
+        self.index.close()
+        for sink in self.sinks:
+            sink.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Continuously process PDFs dropped into a folder")
+    parser.add_argument("directory", help="Directory to watch")
+    parser.add_argument("--index", default=WATCH_CONFIG["index_path"], help="SQLite index path")
+    parser.add_argument("--sink", choices=["jsonl", "csv", "sqlite"], default="jsonl")
+    parser.add_argument("--output", default=os.path.join("exports", "hot_folder_results.jsonl"))
+    parser.add_argument("--workers", type=int, default=BATCH_CONFIG["max_workers"])
+    parser.add_argument("--poll-interval", type=float, default=WATCH_CONFIG["poll_interval"])
+    parser.add_argument("--settle-time", type=float, default=WATCH_CONFIG["settle_time"])
+    parser.add_argument("--once", action="store_true", help="Scan and process once, then exit")
+    args = parser.parse_args()
+
+    watcher = HotFolderWatcher(
+        args.directory,
+        processor=BatchProcessor(max_workers=args.workers),
+        index_path=args.index,
+        sinks=[create_sink(args.sink, args.output)],
+        poll_interval=args.poll_interval,
+        settle_time=args.settle_time
+    )
+    try:
+        if args.once:
+            logger.info(watcher.run_once())
+        else:
+            watcher.run_forever()
+    except KeyboardInterrupt:
+        watcher.stop()
+    finally:
+        watcher.close()
+
+
+if __name__ == "__main__":
+    main()
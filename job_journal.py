@@ -0,0 +1,115 @@
+"""
+Append-only checkpoint journal for resumable batch jobs
+"""
+import os
+import json
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Any, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def file_content_hash(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """SHA-256 of a file's contents, read in chunks"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class JobJournal:
+    """JSONL journal with one line per finished file.
+
+    Each line holds the file path, its content hash, the output fields that
+    were requested, the status and the full result, and is flushed as soon as
+    the file finishes, so a crashed or killed run loses at most the files that
+    were in flight.
+    """
+
+    def __init__(self, journal_path: str, fsync: bool = False):
+        self.journal_path = journal_path
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._file = None
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        """Return the latest journal entry for each file path"""
+        entries = {}
+        if not os.path.exists(self.journal_path):
+            return entries
+
+        with open(self.journal_path, 'r', encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn final line is expected after a crash mid-write
+                    logger.warning(f"Skipping unreadable journal line {line_number} in {self.journal_path}")
+                    continue
+                entries[entry["file_path"]] = entry
+        return entries
+
+    def completed(self) -> Dict[str, Dict[str, Any]]:
+        """Journal entries for files that finished successfully"""
+        return {path: entry for path, entry in self.load().items() if entry.get("status") == "success"}
+
+    def record(self, result: Dict[str, Any], content_hash: Optional[str], fields: Optional[Iterable[str]] = None):
+        """Append a finished file's result to the journal, with the output fields it was computed for"""
+        entry = {
+            "file_path": result["file_path"],
+            "content_hash": content_hash,
+            "fields": sorted(fields) if fields is not None else None,
+            "status": result["status"],
+            "result": result,
+            "recorded_at": datetime.now().isoformat()
+        }
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+
+        with self._lock:
+            if self._file is None:
+                journal_dir = os.path.dirname(self.journal_path)
+                if journal_dir:
+                    os.makedirs(journal_dir, exist_ok=True)
+                self._truncate_torn_line()
+                self._file = open(self.journal_path, 'a', encoding='utf-8')
+            self._file.write(line)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+
+    def _truncate_torn_line(self, chunk_size: int = 64 * 1024):
+        """Cut the journal back to its last newline, so new lines are not appended to a torn one"""
+        if not os.path.exists(self.journal_path):
+            return
+        with open(self.journal_path, 'rb+') as f:
+            size = end = f.seek(0, os.SEEK_END)
+            while end > 0:
+                step = min(end, chunk_size)
+                f.seek(end - step)
+                newline = f.read(step).rfind(b"\n")
+                if newline != -1:
+                    end += newline + 1 - step
+                    break
+                end -= step
+            if end < size:
+                logger.warning(f"Dropping a torn final line of {size - end} bytes from {self.journal_path}")
+                f.truncate(end)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,375 @@
+"""
+Background batch jobs for the asynchronous job API
+"""
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from batch_processor import BatchProcessor, BatchStatistics
+from dataset_store import DatasetStore
+from archives import is_archive
+from config import JOBS_CONFIG
+
+logger = logging.getLogger(__name__)
+
+FINISHED_STATES = {"completed", "failed", "cancelled"}
+
+
+class BatchJob:
+    """State of one background batch: progress counts and final summary.
+
+    Its results are appended to a JSONL file as they arrive rather than kept here.
+    """
+
+    def __init__(self, pdf_paths: List[str], file_names: Dict[str, str], cleanup: bool):
+        self.job_id = uuid.uuid4().hex
+        self.pdf_paths = pdf_paths
+        self.file_names = file_names
+        self.cleanup = cleanup
+        self.status = "queued"
+        self.processed = 0
+        self.successful = 0
+        self.results_file = None
+        self.summary: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.dataset_id: Optional[str] = None
+        self.created_at = datetime.now().isoformat()
+        self.started_at: Optional[str] = None
+        self.finished_at: Optional[str] = None
+        self.finished_time: Optional[float] = None
+        self.last_saved = 0.0
+        self.cancel_event = threading.Event()
+        self.lock = threading.Lock()
+        self.future: Optional[Future] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Status, progress and summary, without results"""
+        with self.lock:
+            processed, successful = self.processed, self.successful
+            # An archive's PDF count is only known once it has been read
+            total = None if any(is_archive(path) for path in self.pdf_paths) else len(self.pdf_paths)
+            if total:
+                percent = min(100.0, 100.0 * processed / total)
+            elif total == 0 or self.status == "completed":
+                percent = 100.0
+            else:
+                percent = None
+            return {
+                "job_id": self.job_id,
+                "status": self.status,
+                "progress": {
+                    "total": total,
+                    "processed": processed,
+                    "successful": successful,
+                    "failed": processed - successful,
+                    "percent": percent
+                },
+                "summary": self.summary,
+                "error": self.error,
+                "dataset_id": self.dataset_id,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at
+            }
+
+
+class JobManager:
+    """Run batches on a background pool and keep finished jobs for a retention period.
+
+    At most max_concurrent_jobs batches run at once; the rest wait in the pool's
+    queue. Finished jobs are dropped after retention_seconds, or oldest first once
+    more than max_retained_jobs are kept.
+
+    With a dataset store, each completed job's successful results are stored as
+    a dataset whose id is reported with the job.
+
+    Each job's status and progress are also snapshotted to state_dir and its
+    results appended there to a JSONL file, so that when the API runs in several
+    worker processes (serve.py) any of them can report on or cancel a job owned
+    by another.
+    """
+
+    def __init__(self, max_concurrent_jobs: Optional[int] = None,
+                 retention_seconds: Optional[float] = None, max_retained_jobs: Optional[int] = None,
+                 state_dir: Optional[str] = None, datasets: Optional[DatasetStore] = None,
+                 checkpoint: Optional[Callable[[float], float]] = None):
+        self.datasets = datasets
+        self.checkpoint = checkpoint
+        self.retention_seconds = retention_seconds or JOBS_CONFIG["retention_seconds"]
+        self.max_retained_jobs = max_retained_jobs or JOBS_CONFIG["max_retained_jobs"]
+        self.state_dir = state_dir or JOBS_CONFIG["state_dir"]
+        os.makedirs(self.state_dir, exist_ok=True)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrent_jobs or JOBS_CONFIG["max_concurrent_jobs"],
+            thread_name_prefix="batch-job"
+        )
+        self._jobs: Dict[str, BatchJob] = {}
+        self._lock = threading.Lock()
+        self._last_state_purge = 0.0
+        self._accepting = True
+
+    def _snapshot_path(self, job_id: str) -> str:
+        return os.path.join(self.state_dir, f"{job_id}.json")
+
+    def _cancel_path(self, job_id: str) -> str:
+        return os.path.join(self.state_dir, f"{job_id}.cancel")
+
+    def _results_path(self, job_id: str) -> str:
+        return os.path.join(self.state_dir, f"{job_id}.results.jsonl")
+
+    def _save(self, job: BatchJob, force: bool = False):
+        """Write the job's status and progress for other processes, at most every snapshot_interval seconds"""
+        now = time.time()
+        if not force and now - job.last_saved < JOBS_CONFIG["snapshot_interval"]:
+            return
+        job.last_saved = now
+        path = self._snapshot_path(job.job_id)
+        try:
+            with open(path + ".tmp", 'w', encoding='utf-8') as f:
+                json.dump(job.to_dict(), f, ensure_ascii=False, default=str)
+            os.replace(path + ".tmp", path)
+        except OSError as e:
+            logger.warning(f"Cannot save state of job {job.job_id}: {e}")
+
+    def _load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        # Job ids are hex uuids; anything else cannot name a snapshot
+        if not all(c in "0123456789abcdef" for c in job_id):
+            return None
+        try:
+            with open(self._snapshot_path(job_id), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _read_results(self, job_id: str, offset: int = 0) -> List[Dict[str, Any]]:
+        """Results from offset onwards, skipping a last line still being written"""
+        results = []
+        try:
+            with open(self._results_path(job_id), encoding='utf-8') as f:
+                for index, line in enumerate(f):
+                    if index >= offset and line.endswith("\n"):
+                        results.append(json.loads(line))
+        except OSError:
+            pass
+        return results
+
+    def _remove_state(self, job_id: str):
+        for path in (self._snapshot_path(job_id), self._cancel_path(job_id), self._results_path(job_id)):
+            if os.path.exists(path):
+                os.unlink(path)
+
+    def submit(self, pdf_paths: List[str], file_names: Optional[Dict[str, str]] = None,
+               cleanup: bool = False) -> BatchJob:
+        """Queue a batch and return its job at once.
+
+        file_names maps paths to the names reported in results; with cleanup the
+        files are deleted once the job finishes. Raises RuntimeError once the
+        manager is shutting down.
+        """
+        if not self._accepting:
+            raise RuntimeError("Not accepting jobs while shutting down")
+        self.purge_expired()
+        job = BatchJob(pdf_paths, file_names or {}, cleanup)
+        with self._lock:
+            self._jobs[job.job_id] = job
+        self._save(job, force=True)
+        job.future = self._executor.submit(self._run, job)
+        logger.info(f"Queued job {job.job_id} with {len(pdf_paths)} files")
+        return job
+
+    def _cancel_requested(self, job: BatchJob) -> bool:
+        return job.cancel_event.is_set() or os.path.exists(self._cancel_path(job.job_id))
+
+    def _run(self, job: BatchJob):
+        try:
+            self._process(job)
+        finally:
+            # Only this thread reads the files, so only it removes them
+            self._remove_uploads(job)
+
+    def _process(self, job: BatchJob):
+        if self._cancel_requested(job):
+            self._finish(job, "cancelled")
+            return
+
+        with job.lock:
+            if job.status != "queued":
+                return
+            job.status = "running"
+            job.started_at = datetime.now().isoformat()
+        self._save(job, force=True)
+
+        statistics = BatchStatistics()
+        status = "completed"
+        results = None
+        try:
+            job.results_file = open(self._results_path(job.job_id), 'a', encoding='utf-8')
+            processor = BatchProcessor(max_workers=JOBS_CONFIG["workers_per_job"], checkpoint=self.checkpoint,
+                                       cancelled=lambda: self._cancel_requested(job))
+            results = processor.iter_batch(job.pdf_paths)
+            for result in results:
+                if result["file_path"] in job.file_names:
+                    result["file_name"] = job.file_names[result["file_path"]]
+                statistics.add(result)
+                line = json.dumps(result, ensure_ascii=False, default=str) + "\n"
+                with job.lock:
+                    # Failed by shutdown() while results were still arriving
+                    if job.status in FINISHED_STATES:
+                        status = job.status
+                        break
+                    job.results_file.write(line)
+                    job.results_file.flush()
+                    job.processed += 1
+                    job.successful += result["status"] != "error"
+                self._save(job)
+                # Leaving iter_batch lets running files finish; queued ones are skipped
+                if self._cancel_requested(job):
+                    status = "cancelled"
+                    break
+        except Exception as e:
+            logger.error(f"Job {job.job_id} failed: {e}")
+            job.error = str(e)
+            status = "failed"
+        finally:
+            if results is not None:
+                # Waits for the files still running
+                results.close()
+            job.summary = statistics.summary()
+            if status == "completed" and self.datasets is not None:
+                try:
+                    successful = [result for result in self._read_results(job.job_id)
+                                  if result["status"] == "success"]
+                    job.dataset_id = self.datasets.create(successful, source=f"job:{job.job_id}").dataset_id
+                except OSError as e:
+                    logger.warning(f"Cannot store results of job {job.job_id} as a dataset: {e}")
+            self._finish(job, status)
+
+    def _finish(self, job: BatchJob, status: str):
+        with job.lock:
+            # A job failed by shutdown() may still be finishing in its thread
+            if job.status in FINISHED_STATES:
+                return
+            job.status = status
+            job.finished_at = datetime.now().isoformat()
+            job.finished_time = time.time()
+            if job.results_file is not None:
+                job.results_file.close()
+        self._save(job, force=True)
+        if os.path.exists(self._cancel_path(job.job_id)):
+            os.unlink(self._cancel_path(job.job_id))
+        logger.info(f"Job {job.job_id} {status}: {job.processed} files processed")
+
+    def _remove_uploads(self, job: BatchJob):
+        if job.cleanup:
+            for pdf_path in job.pdf_paths:
+                if os.path.exists(pdf_path):
+                    os.unlink(pdf_path)
+
+    def shutdown(self, timeout: float):
+        """Stop taking jobs, give this process's jobs up to timeout seconds to finish, then fail the rest.
+
+        Jobs run in this process's threads, so a serve.py worker calls this
+        before it exits; failed jobs are snapshotted at once, and their files are
+        removed by the job's thread after the files it is extracting finish.
+        """
+        self._accepting = False
+        deadline = time.time() + timeout
+        while True:
+            with self._lock:
+                unfinished = [job for job in self._jobs.values() if job.status not in FINISHED_STATES]
+            if not unfinished or time.time() >= deadline:
+                break
+            time.sleep(0.2)
+        for job in unfinished:
+            job.cancel_event.set()
+            job.error = "The worker running this job stopped before it finished"
+            self._finish(job, "failed")
+            if job.future is not None and job.future.cancel():
+                # Never started, so no thread will remove its files
+                self._remove_uploads(job)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def get(self, job_id: str) -> Optional[BatchJob]:
+        """A job owned by this process"""
+        self.purge_expired()
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def status(self, job_id: str, offset: int = 0) -> Optional[Dict[str, Any]]:
+        """Status, progress and results from offset of a job owned by any process"""
+        job = self.get(job_id)
+        state = job.to_dict() if job is not None else self._load(job_id)
+        if state is not None:
+            state["results"] = self._read_results(job_id, offset)
+            state["next_offset"] = offset + len(state["results"])
+        return state
+
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs owned by this process per status"""
+        counts = {"queued": 0, "running": 0, "completed": 0, "failed": 0, "cancelled": 0}
+        with self._lock:
+            for job in self._jobs.values():
+                counts[job.status] += 1
+        return counts
+
+    def cancel(self, job_id: str) -> bool:
+        """Ask a queued or running job to stop; files already running are completed"""
+        job = self.get(job_id)
+        if job is not None:
+            job.cancel_event.set()
+            return True
+        state = self._load(job_id)
+        if state is None or state["status"] in FINISHED_STATES:
+            return False
+        # The owning process checks for this file after every result
+        open(self._cancel_path(job_id), 'w').close()
+        return True
+
+    def delete(self, job_id: str) -> bool:
+        """Forget a finished job"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                if job.status not in FINISHED_STATES:
+                    return False
+                del self._jobs[job_id]
+        if job is None:
+            state = self._load(job_id)
+            if state is None or state["status"] not in FINISHED_STATES:
+                return False
+        self._remove_state(job_id)
+        return True
+
+    def purge_expired(self):
+        """Drop finished jobs past the retention period or over the retention cap"""
+        now = time.time()
+        with self._lock:
+            finished = sorted(
+                (job for job in self._jobs.values() if job.finished_time is not None),
+                key=lambda job: job.finished_time
+            )
+            excess = len(finished) - self.max_retained_jobs
+            expired = [
+                job.job_id for index, job in enumerate(finished)
+                if index < excess or now - job.finished_time > self.retention_seconds
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+        for job_id in expired:
+            self._remove_state(job_id)
+
+        # Snapshots left by other processes, including ones that died mid-job
+        if now - self._last_state_purge > JOBS_CONFIG["snapshot_interval"] * 60:
+            self._last_state_purge = now
+            for entry in os.scandir(self.state_dir):
+                try:
+                    if now - entry.stat().st_mtime > self.retention_seconds:
+                        os.unlink(entry.path)
+                except OSError:
+                    pass
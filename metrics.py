@@ -0,0 +1,406 @@
+"""
+In-process metrics in the Prometheus text exposition format
+"""
+import os
+import json
+import math
+import logging
+import threading
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from config import METRICS_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Counters and histograms of exited worker processes, folded into one file
+ARCHIVE_FILE = "archive.json"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames: Sequence[str], labelvalues: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> List[Tuple[Tuple[str, ...], Any]]:
+        with self._lock:
+            return [(key, _copy(value)) for key, value in self._values.items()]
+
+
+def _copy(value):
+    return [list(value[0]), value[1], value[2]] if isinstance(value, list) else value
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    """Value that goes up and down, or is read from a function at collection time.
+
+    merge says how values from several serve.py workers combine: "sum" for
+    quantities such as in-flight requests or RSS, "max" for values every worker
+    shares, such as the model load time inherited from the master.
+    """
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), merge: str = "sum"):
+        super().__init__(name, documentation, labelnames)
+        self.merge = merge
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, function: Callable[[], float]):
+        """Read the (unlabelled) value from function whenever metrics are collected"""
+        self._function = function
+
+    def samples(self) -> List[Tuple[Tuple[str, ...], Any]]:
+        if self._function is not None:
+            try:
+                return [((), float(self._function()))]
+            except Exception as e:
+                logger.debug(f"Cannot collect {self.name}: {e}")
+                return []
+        return super().samples()
+
+
+class Histogram(_Metric):
+    """Counts of observations in cumulative buckets, plus their sum and count"""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+
+class Registry:
+    """Named metrics, rendered together and optionally merged across worker processes"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._ratios: List[Tuple[str, str, str, str, Tuple[str, ...]]] = []
+        self._collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (), merge: str = "sum") -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, merge))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = ()) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def ratio(self, name: str, documentation: str, counter: Counter, label: str, hit_values: Sequence[str]):
+        """Derive a gauge of hits over all events from a counter, computed after merging"""
+        self._ratios.append((name, documentation, counter.name, label, tuple(hit_values)))
+
+    def add_collector(self, function: Callable[[], None]):
+        """Call function before every snapshot, to refresh metrics whose values are kept elsewhere"""
+        self._collectors.append(function)
+
+    def snapshot(self) -> Dict[str, Any]:
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception as e:
+                logger.debug(f"Metrics collector failed: {e}")
+        return {name: [[list(key), value] for key, value in metric.samples()]
+                for name, metric in self._metrics.items()}
+
+    @staticmethod
+    def _as_snapshot(merged: Dict[str, Dict[Tuple[str, ...], Any]]) -> Dict[str, Any]:
+        return {name: [[list(key), value] for key, value in values.items()] for name, values in merged.items()}
+
+    def write_snapshot(self, path: str):
+        with open(path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump({"pid": os.getpid(), "metrics": self.snapshot()}, f)
+        os.replace(path + ".tmp", path)
+
+    def _merged(self, snapshots: List[Tuple[bool, Dict[str, Any]]]) -> Dict[str, Dict[Tuple[str, ...], Any]]:
+        """Combine (alive, snapshot) pairs; gauges of exited processes are dropped"""
+        merged: Dict[str, Dict[Tuple[str, ...], Any]] = {name: {} for name in self._metrics}
+        for alive, snapshot in snapshots:
+            for name, samples in snapshot.items():
+                metric = self._metrics.get(name)
+                if metric is None or (metric.kind == "gauge" and not alive):
+                    continue
+                values = merged[name]
+                for key, value in samples:
+                    key = tuple(key)
+                    current = values.get(key)
+                    if current is None:
+                        values[key] = _copy(value)
+                    elif metric.kind == "histogram":
+                        current[0] = [a + b for a, b in zip(current[0], value[0])]
+                        current[1] += value[1]
+                        current[2] += value[2]
+                    elif metric.kind == "gauge" and metric.merge == "max":
+                        values[key] = max(current, value)
+                    else:
+                        values[key] = current + value
+        return merged
+
+    def archive_exited(self, directory: str, paths: List[str]) -> bool:
+        """Fold the counters and histograms of exited processes' snapshots into ARCHIVE_FILE and delete them.
+
+        Keeps the number of snapshot files, and the work of merging them, bounded
+        by the live workers. Returns False where file locks are unavailable.
+        """
+        if fcntl is None:
+            return False
+        archive_path = os.path.join(directory, ARCHIVE_FILE)
+        with open(os.path.join(directory, "archive.lock"), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            # Another process may have folded some of them while we waited
+            paths = [path for path in paths if os.path.exists(path)]
+            if not paths:
+                return True
+            snapshots = [(False, _read_state(path).get("metrics", {})) for path in [archive_path] + paths]
+            state = {"pid": None, "metrics": self._as_snapshot(self._merged(snapshots))}
+            with open(archive_path + ".tmp", 'w', encoding='utf-8') as f:
+                json.dump(state, f)
+            os.replace(archive_path + ".tmp", archive_path)
+            for path in paths:
+                os.unlink(path)
+        return True
+
+    def _collect(self) -> Dict[str, Dict[Tuple[str, ...], Any]]:
+        """This process's metrics, merged with the snapshots of other worker processes"""
+        snapshots = [(True, self.snapshot())]
+        directory = METRICS_CONFIG["multiprocess_dir"]
+        if directory and os.path.isdir(directory):
+            states = {
+                entry.path: _read_state(entry.path) for entry in os.scandir(directory)
+                if entry.name.endswith(".json") and entry.name != f"{os.getpid()}.json"
+            }
+            alive = {path: state.get("pid") is not None and _pid_alive(state["pid"])
+                     for path, state in states.items()}
+            exited = [path for path, state in states.items() if state.get("pid") is not None and not alive[path]]
+            try:
+                if exited and self.archive_exited(directory, exited):
+                    archive_path = os.path.join(directory, ARCHIVE_FILE)
+                    for path in exited:
+                        del states[path]
+                    states[archive_path] = _read_state(archive_path)
+                    alive[archive_path] = False
+            except OSError as e:
+                logger.warning(f"Cannot archive metrics of exited workers: {e}")
+            for path, state in states.items():
+                if state:
+                    snapshots.append((alive[path], state["metrics"]))
+        return self._merged(snapshots)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        merged = self._collect()
+        lines = []
+        for name, metric in self._metrics.items():
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            for key, value in sorted(merged[name].items()):
+                if metric.kind == "histogram":
+                    cumulative = 0
+                    for bound, count in zip(metric.buckets, value[0]):
+                        cumulative += count
+                        le = 'le="' + _format_value(bound) + '"'
+                        lines.append(f"{name}_bucket{_format_labels(metric.labelnames, key, le)} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(metric.labelnames, key)} {_format_value(value[1])}")
+                    lines.append(f"{name}_count{_format_labels(metric.labelnames, key)} {value[2]}")
+                else:
+                    lines.append(f"{name}{_format_labels(metric.labelnames, key)} {_format_value(value)}")
+
+        for name, documentation, counter_name, label, hit_values in self._ratios:
+            counter = self._metrics[counter_name]
+            index = counter.labelnames.index(label)
+            groups: Dict[Tuple[str, ...], List[float]] = {}
+            for key, value in merged[counter_name].items():
+                group = key[:index] + key[index + 1:]
+                totals = groups.setdefault(group, [0.0, 0.0])
+                totals[1] += value
+                if key[index] in hit_values:
+                    totals[0] += value
+            labelnames = counter.labelnames[:index] + counter.labelnames[index + 1:]
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} gauge")
+            for group, (hits, total) in sorted(groups.items()):
+                lines.append(f"{name}{_format_labels(labelnames, group)} {_format_value(hits / total if total else 0.0)}")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: str):
+        """Write the metrics to path atomically, for node_exporter's textfile collector"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path + ".tmp", 'w', encoding='utf-8') as f:
+            f.write(self.render())
+        os.replace(path + ".tmp", path)
+
+
+def _read_state(path: str) -> Dict[str, Any]:
+    """A snapshot file's contents, or {} if it is missing or being replaced"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.counter(
+    "pdf_nlp_http_requests_total", "HTTP requests by endpoint, method and status", ("endpoint", "method", "status"))
+HTTP_LATENCY = REGISTRY.histogram(
+    "pdf_nlp_http_request_duration_seconds", "HTTP request latency by endpoint", ("endpoint",),
+    METRICS_CONFIG["latency_buckets"])
+HTTP_IN_FLIGHT = REGISTRY.gauge("pdf_nlp_http_requests_in_flight", "HTTP requests being handled")
+STAGE_LATENCY = REGISTRY.histogram(
+    "pdf_nlp_stage_duration_seconds", "Wall time of each processing stage per document", ("stage",),
+    METRICS_CONFIG["latency_buckets"])
+DOCUMENTS = REGISTRY.counter("pdf_nlp_documents_total", "Documents processed by outcome", ("status",))
+MODEL_LOAD_SECONDS = REGISTRY.gauge(
+    "pdf_nlp_model_load_seconds", "Time taken by the last load of each model", ("model",), merge="max")
+BATCH_FILES = REGISTRY.gauge(
+    "pdf_nlp_batch_files", "Batch files submitted to workers, waiting or running", ("state",))
+JOBS = REGISTRY.gauge("pdf_nlp_jobs", "Background jobs held by the API by status", ("status",))
+CACHE_REQUESTS = REGISTRY.counter(
+    "pdf_nlp_cache_requests_total", "Cache lookups by cache and result", ("cache", "result"))
+REGISTRY.ratio("pdf_nlp_cache_hit_ratio", "Share of cache lookups answered without recomputing",
+               CACHE_REQUESTS, "result", ("hit", "shared"))
+ADMISSION_ACTIVE = REGISTRY.gauge("pdf_nlp_admission_active", "Requests holding an admission slot by lane", ("lane",))
+ADMISSION_QUEUE = REGISTRY.gauge("pdf_nlp_admission_queued", "Requests waiting for an admission slot by lane", ("lane",))
+ADMISSION_QUEUE_SECONDS = REGISTRY.histogram(
+    "pdf_nlp_admission_queue_seconds", "Time admitted requests waited for a slot by lane", ("lane",),
+    METRICS_CONFIG["latency_buckets"])
+BULK_PREEMPTED_SECONDS = REGISTRY.counter(
+    "pdf_nlp_bulk_preempted_seconds_total", "Time bulk documents were paused for interactive requests")
+ADMISSION_REJECTED = REGISTRY.counter(
+    "pdf_nlp_admission_rejected_total", "Requests refused or dropped by admission control", ("reason",))
+RSS_BYTES = REGISTRY.gauge("pdf_nlp_process_resident_memory_bytes",
+                           "Resident memory of the serving or batch processes and their extraction workers")
+
+
+def _total_rss_bytes() -> float:
+    from concurrency import total_rss_mb
+    return total_rss_mb() * 1024 * 1024
+
+
+RSS_BYTES.set_function(_total_rss_bytes)
+
+
+def observe_stages(stages: Dict[str, Dict[str, float]]):
+    """Record a document's per-stage wall times, as reported in its result's timings"""
+    if not METRICS_CONFIG["enabled"]:
+        return
+    for stage, recorded in stages.items():
+        STAGE_LATENCY.observe(recorded["wall"], stage=stage)
+
+
+class SnapshotWriter:
+    """Background thread writing this process's metrics to multiprocess_dir for its siblings"""
+
+    def __init__(self, directory: str, interval: Optional[float] = None):
+        self.directory = directory
+        self.path = os.path.join(directory, f"{os.getpid()}.json")
+        self.interval = interval or METRICS_CONFIG["snapshot_interval"]
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-snapshot", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.write()
+
+    def write(self):
+        try:
+            REGISTRY.write_snapshot(self.path)
+        except OSError as e:
+            logger.warning(f"Cannot write metrics snapshot: {e}")
+
+    def start(self):
+        if os.path.exists(self.path):
+            # Left by an exited worker that had this pid; keep its counters instead of overwriting them
+            try:
+                REGISTRY.archive_exited(self.directory, [self.path])
+            except OSError as e:
+                logger.warning(f"Cannot archive metrics snapshot {self.path}: {e}")
+        self.write()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.write()
@@ -0,0 +1,183 @@
+"""
+PyMuPDF parsing helpers.
+
+Kept free of model imports so sandboxed extraction workers start quickly.
+"""
+import fitz
+import re
+import html
+import logging
+from timing import StageTimer
+from config import FILE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+def _page_font_spans(page):
+    """Return (text, font size) pairs for every non-empty span on a page"""
+    text_with_font = []
+    blocks = page.get_text("dict")["blocks"]
+
+    for block in blocks:
+        if "lines" in block:
+            for line in block["lines"]:
+                if "spans" in line:
+                    for span in line["spans"]:
+                        if "text" in span and "size" in span:
+                            text = span["text"].strip()
+                            size = span["size"]
+                            if text:
+                                text_with_font.append((text, size))
+    return text_with_font
+
+
+def _parse_xmp_field(xmp, field):
+    """Return the rdf:li values of a Dublin Core field in an XMP packet"""
+    match = re.search(rf'<dc:{field}\b[^>]*>(.*?)</dc:{field}>', xmp, re.DOTALL)
+    if not match:
+        return []
+    values = re.findall(r'<rdf:li\b[^>]*>(.*?)</rdf:li>', match.group(1), re.DOTALL)
+    return [html.unescape(value).strip() for value in values if value.strip()]
+
+
+def _split_names(text):
+    """Split comma-separated names, turning "Last, First" pairs into "First Last".
+
+    A single-word piece is a surname followed by its given names, and a piece
+    of only initials ("J." or "J. R.") belongs to the name before it.
+    """
+    pieces = [piece.strip() for piece in text.split(",") if piece.strip()]
+    names = []
+    i = 0
+    while i < len(pieces):
+        piece = pieces[i]
+        if len(piece.split()) == 1 and i + 1 < len(pieces):
+            names.append(f"{pieces[i + 1]} {piece}")
+            i += 2
+            continue
+        if names and re.fullmatch(r'(?:[A-Z]\.\s*)+', piece):
+            names[-1] = f"{piece} {names[-1]}"
+        else:
+            names.append(piece)
+        i += 1
+    return names
+
+
+def _split_author_field(author):
+    """Split an /Author string into names, on ";" if present and otherwise on "and" or "&" """
+    if ";" in author:
+        parts = author.split(";")
+    else:
+        parts = re.split(r'\band\b|&', author)
+    return [name for part in parts for name in _split_names(part)]
+
+
+def _document_metadata(doc):
+    """Read /Title and /Author from an open document, falling back to XMP"""
+    embedded = {"title": "", "authors": [], "first_page_text": ""}
+    if len(doc) == 0:
+        return embedded
+
+    info = doc.metadata or {}
+    embedded["title"] = (info.get("title") or "").strip()
+    author = (info.get("author") or "").strip()
+    if author:
+        embedded["authors"] = _split_author_field(author)
+
+    if not embedded["title"] or not embedded["authors"]:
+        xmp = doc.get_xml_metadata() or ""
+        if xmp:
+            if not embedded["title"]:
+                titles = _parse_xmp_field(xmp, "title")
+                embedded["title"] = titles[0] if titles else ""
+            if not embedded["authors"]:
+                embedded["authors"] = [
+                    name for creator in _parse_xmp_field(xmp, "creator") for name in _split_names(creator)
+                ]
+
+    embedded["first_page_text"] = doc[0].get_text()
+    return embedded
+
+
+def extract_text_from_pdf(pdf_path, max_pages=None):
+    """Extract text from PDF with font information for the first page"""
+    if max_pages is None:
+        max_pages = FILE_CONFIG["max_pages_extract"]
+
+    try:
+        with fitz.open(pdf_path) as doc:
+            full_text = ""
+            for page in doc[:max_pages]:
+                full_text += page.get_text()
+            return full_text
+    except Exception as e:
+        logger.error(f"Error extracting text from PDF: {e}")
+        raise
+
+
+def extract_text_with_font_info(pdf_path):
+    """Extract text with font size information from the first page"""
+    try:
+        with fitz.open(pdf_path) as doc:
+            if len(doc) == 0:
+                return []
+            return _page_font_spans(doc[0])
+    except Exception as e:
+        logger.error(f"Error extracting font info: {e}")
+        return []
+
+
+def read_embedded_metadata(pdf_path):
+    """Read /Title and /Author from the PDF info dictionary, falling back to XMP.
+
+    Also returns the first page text so the fields can be validated against it.
+    """
+    try:
+        with fitz.open(pdf_path) as doc:
+            return _document_metadata(doc)
+    except Exception as e:
+        logger.error(f"Error reading embedded PDF metadata: {e}")
+        return {"title": "", "authors": [], "first_page_text": ""}
+
+
+def parse_pdf(pdf_path, max_pages=None, data=None):
+    """Open a PDF once and return everything the pipeline needs from it.
+
+    With data, the PDF is read from those bytes and pdf_path only names it.
+    Returns a dict with "text", "text_with_font", "embedded_metadata", the
+    "page_count" and the per-stage "timings" of the parse.
+    """
+    if max_pages is None:
+        max_pages = FILE_CONFIG["max_pages_extract"]
+
+    timer = StageTimer()
+    with (fitz.open(stream=data, filetype="pdf") if data is not None else fitz.open(pdf_path)) as doc:
+        with timer.stage("extract"):
+            full_text = ""
+            for page in doc[:max_pages]:
+                full_text += page.get_text()
+
+        text_with_font = []
+        embedded_metadata = {"title": "", "authors": [], "first_page_text": ""}
+        if len(doc) > 0:
+            with timer.stage("font_parse"):
+                try:
+                    text_with_font = _page_font_spans(doc[0])
+                except Exception as e:
+                    logger.error(f"Error extracting font info: {e}")
+            if FILE_CONFIG["use_pdf_metadata"]:
+                with timer.stage("embedded_metadata"):
+                    try:
+                        embedded_metadata = _document_metadata(doc)
+                    except Exception as e:
+                        logger.error(f"Error reading embedded PDF metadata: {e}")
+
+        page_count = doc.page_count
+
+    return {
+        "text": full_text,
+        "text_with_font": text_with_font,
+        "embedded_metadata": embedded_metadata,
+        "page_count": page_count,
+        "timings": timer.as_dict()
+    }
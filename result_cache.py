@@ -0,0 +1,98 @@
+"""
+Content-addressed result cache with single-flight computation
+"""
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from config import RESULT_CACHE_CONFIG, MODEL_CONFIG, FILE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+def cache_key(content_hash: str, stages: Optional[Iterable[str]] = None,
+              fields: Optional[Iterable[str]] = None) -> str:
+    """Key for a document's results under the current model and extraction settings.
+    
+    Switching model tier or page limits changes the key, so stale results are
+    never served after a configuration change. Partial results computed for a
+    subset of stages or fields are keyed apart from full ones.
+    """
+    settings = {"models": MODEL_CONFIG, "max_pages": FILE_CONFIG["max_pages_extract"],
+                "use_pdf_metadata": FILE_CONFIG["use_pdf_metadata"]}
+    if stages is not None:
+        settings["stages"] = sorted(stages)
+    if fields is not None:
+        settings["fields"] = sorted(fields)
+    settings = json.dumps(settings, sort_keys=True, default=str)
+    return hashlib.sha256(f"{content_hash}:{settings}".encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """Bounded LRU cache of results that also collapses concurrent identical work.
+
+    run_once() lets the first caller for a key compute while later callers for
+    the same key wait and share its outcome, including any exception. The cache
+    lives in one process; each serve.py worker keeps its own.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, ttl_seconds: Optional[float] = None):
+        self.max_entries = max_entries or RESULT_CACHE_CONFIG["max_entries"]
+        self.ttl_seconds = ttl_seconds or RESULT_CACHE_CONFIG["ttl_seconds"]
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._in_flight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "shared": 0, "evictions": 0}
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry[1]
+
+    def put(self, key: str, value: Any):
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def run_once(self, key: str, compute: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Run compute() unless it is already running for key; returns (value, shared)"""
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+            else:
+                self.stats["shared"] += 1
+
+        if not leader:
+            logger.info(f"Waiting for in-flight computation of {key[:12]}")
+            return future.result(), True
+
+        try:
+            future.set_result(compute())
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+        return future.result(), False
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,153 @@
+"""
+Pluggable sinks that receive batch results as they complete
+"""
+import os
+import csv
+import json
+import sqlite3
+import logging
+from typing import List, Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+CSV_FIELDS = [
+    "file_name", "file_path", "file_size", "status", "title", "authors", "summary",
+    "keywords", "character_count", "word_count", "sentence_count", "compression_ratio",
+    "error", "processed_at"
+]
+
+
+def flatten_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Flatten a result dict into CSV_FIELDS columns"""
+    statistics = result.get("statistics", {})
+    return {
+        "file_name": result.get("file_name", ""),
+        "file_path": result.get("file_path", ""),
+        "file_size": result.get("file_size", 0),
+        "status": result.get("status", ""),
+        "title": result.get("title", ""),
+        "authors": result.get("authors", ""),
+        "summary": result.get("summary", ""),
+        "keywords": ", ".join(result.get("keywords", [])),
+        "character_count": statistics.get("character_count", 0),
+        "word_count": statistics.get("word_count", 0),
+        "sentence_count": statistics.get("sentence_count", 0),
+        "compression_ratio": statistics.get("compression_ratio", 0),
+        "error": result.get("error", ""),
+        "processed_at": result.get("processed_at", "")
+    }
+
+
+def _ensure_parent_dir(path: str):
+    parent = os.path.dirname(path)
+    if parent:
+        os.makedirs(parent, exist_ok=True)
+
+
+class ResultSink:
+    """Receives each batch result as soon as it is available"""
+
+    def write(self, result: Dict[str, Any]):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class MemorySink(ResultSink):
+    """Collect results in lists, split into successes, errors and marked duplicates"""
+
+    def __init__(self, results: Optional[List[Dict[str, Any]]] = None,
+                 errors: Optional[List[Dict[str, Any]]] = None):
+        self.results = results if results is not None else []
+        self.errors = errors if errors is not None else []
+        self.duplicates = []
+
+    def write(self, result: Dict[str, Any]):
+        if result["status"] == "success":
+            self.results.append(result)
+        elif result["status"] == "duplicate":
+            self.duplicates.append(result)
+        else:
+            self.errors.append(result)
+
+
+class JSONLSink(ResultSink):
+    """Write one JSON document per line"""
+
+    def __init__(self, path: str):
+        _ensure_parent_dir(path)
+        self.path = path
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def write(self, result: Dict[str, Any]):
+        self._file.write(json.dumps(result, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class CSVSink(ResultSink):
+    """Write flattened results as CSV rows"""
+
+    def __init__(self, path: str):
+        _ensure_parent_dir(path)
+        write_header = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.path = path
+        self._file = open(path, 'a', encoding='utf-8', newline='')
+        self._writer = csv.DictWriter(self._file, fieldnames=CSV_FIELDS)
+        if write_header:
+            self._writer.writeheader()
+
+    def write(self, result: Dict[str, Any]):
+        self._writer.writerow(flatten_result(result))
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class SQLiteSink(ResultSink):
+    """Insert results into a SQLite table, keeping the full result as JSON"""
+
+    def __init__(self, path: str, table: str = "results"):
+        _ensure_parent_dir(path)
+        self.path = path
+        self.table = table
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        columns = ", ".join(f"{field} TEXT" for field in CSV_FIELDS)
+        self._conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ({columns}, result_json TEXT)")
+        self._conn.commit()
+
+    def write(self, result: Dict[str, Any]):
+        row = flatten_result(result)
+        placeholders = ", ".join("?" for _ in range(len(CSV_FIELDS) + 1))
+        self._conn.execute(
+            f"INSERT INTO {self.table} ({', '.join(CSV_FIELDS)}, result_json) VALUES ({placeholders})",
+            [row[field] for field in CSV_FIELDS] + [json.dumps(result, ensure_ascii=False)]
+        )
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+
+SINK_TYPES = {
+    "jsonl": JSONLSink,
+    "csv": CSVSink,
+    "sqlite": SQLiteSink
+}
+
+
+def create_sink(sink_type: str, path: str) -> ResultSink:
+    """Create a sink by name ("jsonl", "csv" or "sqlite")"""
+    if sink_type not in SINK_TYPES:
+        raise ValueError(f"Unsupported sink type: {sink_type}")
+    return SINK_TYPES[sink_type](path)
@@ -0,0 +1,159 @@
+"""
+Size-aware job scheduling for batch processing
+"""
+import os
+import json
+import logging
+import threading
+from functools import lru_cache
+from collections import OrderedDict, deque
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from config import SCHEDULER_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+class CostEstimator:
+    """Predict per-file processing seconds from file size, page count and token count.
+
+    A linear model (intercept, per MB, per page, per 1k tokens) refitted by least
+    squares over a bounded history of observed costs, persisted between runs so
+    the estimates improve over time. Planning never opens a PDF: page and token
+    counts are those observed when a file was last processed, or otherwise
+    estimated from its size at the pages and tokens per MB seen so far.
+    """
+
+    def __init__(self, model_path: Optional[str] = None, history_size: Optional[int] = None):
+        self.model_path = model_path
+        self.history = deque(maxlen=history_size or SCHEDULER_CONFIG["history_size"])
+        self.weights = list(SCHEDULER_CONFIG["prior_weights"])
+        # Observed (pages, tokens) per path, least recently observed first
+        self.known_counts: "OrderedDict[str, Tuple[int, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        if model_path and os.path.exists(model_path):
+            self.load()
+
+    def _per_mb(self) -> Tuple[float, float]:
+        """Average pages and tokens per MB over the history"""
+        size_mb = sum(observed[1] for observed, _ in self.history)
+        if not size_mb:
+            return 0.0, 0.0
+        return (sum(observed[2] for observed, _ in self.history) / size_mb,
+                sum(observed[3] for observed, _ in self.history) * 1000 / size_mb)
+
+    def features(self, pdf_path: str, pages: Optional[int] = None,
+                 tokens: Optional[int] = None) -> List[float]:
+        """Feature vector for a file, filling unknown page and token counts in without opening it"""
+        try:
+            size_mb = os.path.getsize(pdf_path) / (1024 * 1024)
+        except OSError:
+            size_mb = 0.0
+        with self._lock:
+            known_pages, known_tokens = self.known_counts.get(pdf_path, (None, None))
+            pages_per_mb, tokens_per_mb = self._per_mb()
+        if pages is None:
+            pages = known_pages if known_pages is not None else size_mb * pages_per_mb
+        if tokens is None:
+            tokens = known_tokens if known_tokens is not None else size_mb * tokens_per_mb
+        return [1.0, size_mb, float(pages), tokens / 1000]
+
+    def predict(self, features: List[float]) -> float:
+        cost = sum(weight * value for weight, value in zip(self.weights, features))
+        return max(cost, SCHEDULER_CONFIG["min_cost"])
+
+    def observe(self, pdf_path: str, features: List[float], actual_cost: float,
+                pages: Optional[int] = None, tokens: Optional[int] = None):
+        """Record an observed cost with the page and token counts seen while processing, and refit"""
+        observed = list(features)
+        if pages is not None:
+            observed[2] = float(pages)
+        if tokens is not None:
+            observed[3] = tokens / 1000
+        with self._lock:
+            if pages is not None and tokens is not None:
+                self.known_counts[pdf_path] = (pages, tokens)
+                self.known_counts.move_to_end(pdf_path)
+                while len(self.known_counts) > SCHEDULER_CONFIG["max_known_files"]:
+                    self.known_counts.popitem(last=False)
+            self.history.append((observed, actual_cost))
+            if len(self.history) >= SCHEDULER_CONFIG["min_observations"]:
+                X = np.array([row for row, _ in self.history])
+                y = np.array([cost for _, cost in self.history])
+                self.weights = np.linalg.lstsq(X, y, rcond=None)[0].tolist()
+
+    def save(self):
+        """Write the model atomically, so concurrent saves and readers never see a partial file"""
+        if not self.model_path:
+            return
+        model_dir = os.path.dirname(self.model_path)
+        if model_dir:
+            os.makedirs(model_dir, exist_ok=True)
+        temp_path = f"{self.model_path}.{os.getpid()}.tmp"
+        with self._lock:
+            model = {
+                "weights": self.weights,
+                "history": list(self.history),
+                "known_counts": [[path, pages, tokens] for path, (pages, tokens) in self.known_counts.items()]
+            }
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(model, f)
+            os.replace(temp_path, self.model_path)
+
+    def load(self):
+        try:
+            with open(self.model_path, 'r', encoding='utf-8') as f:
+                model = json.load(f)
+            self.weights = model["weights"]
+            self.history.extend((features, cost) for features, cost in model["history"])
+            for path, pages, tokens in model.get("known_counts", [])[-SCHEDULER_CONFIG["max_known_files"]:]:
+                self.known_counts[path] = (pages, tokens)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable cost model {self.model_path}: {e}")
+
+
+class JobScheduler:
+    """Order files by priority, then longest predicted processing time first (LPT).
+
+    Dispatching the longest jobs first keeps one large PDF submitted last from
+    holding up the whole batch after the other workers have gone idle.
+    """
+
+    def __init__(self, estimator: Optional[CostEstimator] = None):
+        self.estimator = estimator or CostEstimator(model_path=SCHEDULER_CONFIG["model_path"])
+
+    def plan(self, pdf_paths: List[str], priorities: Optional[Dict[str, int]] = None,
+             hints: Optional[Dict[str, Dict[str, int]]] = None) -> List[Tuple[str, Dict[str, Any]]]:
+        """Return (path, job info) pairs in dispatch order.
+
+        priorities maps paths to integers (higher runs first, default 0); hints maps
+        paths to known "pages" and "tokens" counts.
+        """
+        priorities = priorities or {}
+        hints = hints or {}
+        jobs = []
+        for pdf_path in pdf_paths:
+            hint = hints.get(pdf_path, {})
+            features = self.estimator.features(pdf_path, pages=hint.get("pages"), tokens=hint.get("tokens"))
+            jobs.append((pdf_path, {
+                "priority": priorities.get(pdf_path, 0),
+                "features": features,
+                "predicted_cost": self.estimator.predict(features)
+            }))
+        jobs.sort(key=lambda job: (-job[1]["priority"], -job[1]["predicted_cost"]))
+        return jobs
+
+    def record(self, pdf_path: str, job: Dict[str, Any], actual_cost: float,
+               pages: Optional[int] = None, tokens: Optional[int] = None):
+        self.estimator.observe(pdf_path, job["features"], actual_cost, pages=pages, tokens=tokens)
+
+    def save(self):
+        self.estimator.save()
+
+
+@lru_cache(maxsize=1)
+def get_scheduler() -> JobScheduler:
+    """Scheduler shared by every batch in this process, so concurrent batches feed one cost model"""
+    return JobScheduler()
@@ -0,0 +1,90 @@
+"""
+Fast JSON serialization and negotiated response compression
+"""
+import gzip
+import json
+import logging
+from datetime import date, datetime
+from typing import Any, Optional, Tuple
+
+from config import SERIALIZATION_CONFIG
+
+# Optional fast JSON backend
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Optional zstd compression
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+def _default(obj: Any) -> Any:
+    """Encode numpy scalars and arrays, dates and anything else as a string"""
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    return str(obj)
+
+
+def use_orjson() -> bool:
+    return ORJSON_AVAILABLE and SERIALIZATION_CONFIG["backend"] in ("auto", "orjson")
+
+
+def dumps(obj: Any, indent: bool = False) -> bytes:
+    """UTF-8 JSON with orjson when available, else the json module; compact unless indent"""
+    if use_orjson():
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(obj, default=_default, option=option)
+        except TypeError as e:
+            # orjson is stricter, e.g. about integers beyond 64 bits
+            logger.debug(f"orjson could not encode payload, using json: {e}")
+    separators = None if indent else (",", ":")
+    return json.dumps(obj, indent=2 if indent else None, separators=separators,
+                      ensure_ascii=False, default=_default).encode("utf-8")
+
+
+def choose_encoding(accept_encoding) -> Optional[str]:
+    """The best of zstd and gzip that the client accepts, or None"""
+    if ZSTD_AVAILABLE and accept_encoding["zstd"]:
+        return "zstd"
+    if accept_encoding["gzip"]:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=SERIALIZATION_CONFIG["zstd_level"]).compress(body)
+    return gzip.compress(body, compresslevel=SERIALIZATION_CONFIG["gzip_level"])
+
+
+def compress_response(response, accept_encoding) -> Tuple[Any, Optional[str]]:
+    """Compress a buffered response in place when it is large enough and the client accepts it"""
+    if (response.direct_passthrough or response.is_streamed or response.status_code < 200
+            or response.status_code in (204, 304) or "Content-Encoding" in response.headers):
+        return response, None
+    mimetype = response.mimetype or ""
+    if not (mimetype.startswith("text/") or mimetype.endswith("json")):
+        return response, None
+    response.vary.add("Accept-Encoding")
+    body = response.get_data()
+    if len(body) < SERIALIZATION_CONFIG["compress_min_size"]:
+        return response, None
+    encoding = choose_encoding(accept_encoding)
+    if encoding is None:
+        return response, None
+    response.set_data(compress(body, encoding))
+    response.headers["Content-Encoding"] = encoding
+    return response, encoding
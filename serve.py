@@ -0,0 +1,259 @@
+"""
+Pre-forking production server that shares preloaded models across workers
+"""
+import os
+import gc
+import sys
+import time
+import random
+import shutil
+import signal
+import socket
+import argparse
+import logging
+import threading
+import tempfile
+from typing import Callable, Dict, Optional
+
+from werkzeug.serving import make_server
+
+from config import API_CONFIG, METRICS_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+class _RequestCounter:
+    """WSGI middleware that asks the worker to retire after max_requests requests"""
+
+    def __init__(self, app, max_requests: int, on_limit):
+        self.app = app
+        self.max_requests = max_requests
+        self.on_limit = on_limit
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, environ, start_response):
+        try:
+            return self.app(environ, start_response)
+        finally:
+            with self._lock:
+                self.count += 1
+                if self.max_requests and self.count == self.max_requests:
+                    self.on_limit()
+
+
+class PreforkServer:
+    """Load the models once in a master process, then fork workers that share them.
+
+    Workers inherit the loaded weights copy-on-write and accept connections on a
+    listening socket bound by the master. The master restarts workers that exit,
+    including those retired after max_requests requests. Workers publish their
+    metrics to a shared directory so /metrics on any of them covers all. SIGHUP reloads the
+    models and replaces workers one at a time; SIGTERM or SIGINT stops workers
+    gracefully, killing any still busy after graceful_timeout seconds. drain,
+    if given, is called in a stopping worker once it has stopped serving, with
+    the seconds it has left, to finish or fail its background work.
+    """
+
+    def __init__(self, app, host: Optional[str] = None, port: Optional[int] = None,
+                 workers: Optional[int] = None, threads: Optional[int] = None,
+                 max_requests: Optional[int] = None, max_requests_jitter: Optional[int] = None,
+                 graceful_timeout: Optional[float] = None, drain: Optional[Callable[[float], None]] = None):
+        self.app = app
+        self.drain = drain
+        self.host = host or API_CONFIG["host"]
+        self.port = port or API_CONFIG["port"]
+        self.workers = workers or API_CONFIG["workers"] or os.cpu_count() or 1
+        self.threads = threads or API_CONFIG["threads_per_worker"]
+        self.max_requests = max_requests if max_requests is not None else API_CONFIG["max_requests"]
+        self.max_requests_jitter = (max_requests_jitter if max_requests_jitter is not None
+                                    else API_CONFIG["max_requests_jitter"])
+        self.graceful_timeout = graceful_timeout or API_CONFIG["graceful_timeout"]
+        self.socket: Optional[socket.socket] = None
+        self._children: Dict[int, float] = {}  # pid -> start time
+        self._stopping = False
+        self._reload_requested = False
+
+    def preload(self):
+        """Load models in the master and freeze the heap so forked workers keep sharing its pages"""
+        from summarizer import get_models
+        start_time = time.perf_counter()
+        get_models()
+        logger.info(f"Preloaded models in {time.perf_counter() - start_time:.1f}s")
+        gc.collect()
+        # Objects in the permanent generation are never scanned by the cyclic
+        # collector, so its refcount-free traversal cannot dirty shared pages
+        gc.freeze()
+
+    def run(self):
+        if API_CONFIG["preload_models"]:
+            self.preload()
+
+        created_metrics_dir = None
+        if not METRICS_CONFIG["multiprocess_dir"]:
+            created_metrics_dir = METRICS_CONFIG["multiprocess_dir"] = tempfile.mkdtemp(prefix="pdf_nlp_metrics-")
+
+        self.socket = socket.create_server((self.host, self.port), backlog=API_CONFIG["backlog"])
+        # Workers race to accept; the losers must not block in accept()
+        self.socket.setblocking(False)
+        self.socket.set_inheritable(True)
+        logger.info(f"Listening on http://{self.host}:{self.port} with {self.workers} workers")
+
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+        signal.signal(signal.SIGHUP, self._handle_reload)
+
+        try:
+            while not self._stopping:
+                self._reap()
+                if self._reload_requested:
+                    self._reload_requested = False
+                    self._reload()
+                while len(self._children) < self.workers and not self._stopping:
+                    self._spawn()
+                time.sleep(0.5)
+        finally:
+            self._shutdown()
+            self.socket.close()
+            if created_metrics_dir:
+                shutil.rmtree(created_metrics_dir, ignore_errors=True)
+
+    def _handle_stop(self, signum, frame):
+        self._stopping = True
+
+    def _handle_reload(self, signum, frame):
+        self._reload_requested = True
+
+    def _spawn(self) -> int:
+        pid = os.fork()
+        if pid == 0:
+            try:
+                self._worker()
+            except Exception as e:
+                logger.error(f"Worker {os.getpid()} crashed: {e}")
+                os._exit(1)
+            os._exit(0)
+        self._children[pid] = time.time()
+        logger.info(f"Started worker {pid}")
+        return pid
+
+    def _worker(self):
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        self._limit_torch_threads()
+
+        max_requests = self.max_requests
+        if max_requests and self.max_requests_jitter:
+            # Spread retirements so workers do not all restart at once
+            max_requests += random.randint(0, self.max_requests_jitter)
+
+        server = None
+        stopped_at = []
+
+        def retire():
+            stopped_at.append(time.time())
+            threading.Thread(target=server.shutdown, daemon=True).start()
+
+        app = _RequestCounter(self.app, max_requests, retire)
+        server = make_server(self.host, self.port, app, threaded=self.threads > 1, fd=self.socket.fileno())
+        if self.threads > 1:
+            # Let requests in flight finish before the worker exits
+            server.daemon_threads = False
+            server.block_on_close = True
+        signal.signal(signal.SIGTERM, lambda signum, frame: retire())
+
+        from metrics import SnapshotWriter
+        snapshots = SnapshotWriter(METRICS_CONFIG["multiprocess_dir"]).start()
+        server.serve_forever(poll_interval=0.5)
+        server.server_close()
+        if self.drain:
+            # Leave a second before the master's SIGKILL to record what is left
+            remaining = self.graceful_timeout - (time.time() - (stopped_at[0] if stopped_at else time.time()))
+            self.drain(max(0.0, remaining - 1))
+        snapshots.stop()
+        if max_requests and app.count >= max_requests:
+            logger.info(f"Worker {os.getpid()} retiring after {app.count} requests")
+
+        # Workers leave through os._exit, which skips atexit handlers
+        from extraction_pool import get_extraction_pool
+        if get_extraction_pool.cache_info().currsize:
+            get_extraction_pool().close()
+
+    def _limit_torch_threads(self):
+        """Split the cores between workers instead of every worker using all of them"""
+        try:
+            import torch
+        except ImportError:
+            return
+        torch.set_num_threads(max(1, (os.cpu_count() or 1) // self.workers))
+
+    def _reap(self):
+        # Wait on worker pids only, leaving other children (such as an extraction
+        # pool started in the master) to their owners
+        for pid in list(self._children):
+            try:
+                reaped, status = os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                reaped, status = pid, 0
+            if reaped == 0:
+                continue
+            del self._children[pid]
+            if not self._stopping:
+                logger.info(f"Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}")
+
+    def _stop_workers(self, pids):
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.time() + self.graceful_timeout
+        while time.time() < deadline and any(pid in self._children for pid in pids):
+            self._reap()
+            time.sleep(0.1)
+        for pid in pids:
+            if pid in self._children:
+                logger.warning(f"Worker {pid} did not stop within {self.graceful_timeout}s; killing it")
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                    os.waitpid(pid, 0)
+                except (ProcessLookupError, ChildProcessError):
+                    pass
+                self._children.pop(pid, None)
+
+    def _reload(self):
+        """Reload the models, then replace each worker after its successor has started"""
+        logger.info("Reloading workers")
+        if API_CONFIG["preload_models"]:
+            from summarizer import clear_models
+            gc.unfreeze()
+            clear_models()
+            self.preload()
+        for pid in list(self._children):
+            self._spawn()
+            self._stop_workers([pid])
+
+    def _shutdown(self):
+        logger.info("Stopping workers")
+        self._stop_workers(list(self._children))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the PDF NLP API with pre-forked workers")
+    parser.add_argument("--host", default=API_CONFIG["host"])
+    parser.add_argument("--port", type=int, default=API_CONFIG["port"])
+    parser.add_argument("--workers", type=int, default=API_CONFIG["workers"])
+    parser.add_argument("--threads", type=int, default=API_CONFIG["threads_per_worker"])
+    args = parser.parse_args()
+
+    if not hasattr(os, "fork"):
+        sys.exit("serve.py needs os.fork; use api.py on this platform")
+
+    from api import app, job_manager
+    # Background jobs run in worker threads, so a stopping worker finishes or fails them first
+    PreforkServer(app, host=args.host, port=args.port, workers=args.workers, threads=args.threads,
+                  drain=job_manager.shutdown).run()
+
+
+if __name__ == "__main__":
+    main()
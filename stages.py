@@ -0,0 +1,71 @@
+"""
+Selective pipeline execution: map requested output fields to the stages that produce them
+"""
+from typing import FrozenSet, Iterable, Optional, Tuple, Union
+
+# Fields each stage adds to a result
+STAGE_FIELDS = {
+    "metadata": ("title", "authors", "extraction_strategy"),
+    "summarize": ("summary", "statistics"),
+    "keywords": ("keywords",),
+}
+
+# Stages that must run before a stage can; keywords are extracted from the summary
+STAGE_DEPENDENCIES = {
+    "metadata": (),
+    "summarize": (),
+    "keywords": ("summarize",),
+}
+
+ALL_STAGES: FrozenSet[str] = frozenset(STAGE_FIELDS)
+ALL_FIELDS: FrozenSet[str] = frozenset(field for fields in STAGE_FIELDS.values() for field in fields)
+FIELD_STAGE = {field: stage for stage, fields in STAGE_FIELDS.items() for field in fields}
+
+
+def _names(value: Union[None, str, Iterable[str]]) -> Optional[FrozenSet[str]]:
+    """Accept None, a comma-separated string or an iterable of names"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.split(",")
+    names = frozenset(name.strip() for name in value if name and name.strip())
+    return names or None
+
+
+def resolve_stages(fields: Union[None, str, Iterable[str]] = None,
+                   stages: Union[None, str, Iterable[str]] = None) -> Tuple[FrozenSet[str], FrozenSet[str]]:
+    """Stages to run and fields to return for the requested fields and/or stages.
+
+    With neither, the full pipeline runs. Requested stages return all of their
+    fields; requested fields return only themselves, though the stages they
+    depend on still run. Raises ValueError for unknown names.
+    """
+    fields, stages = _names(fields), _names(stages)
+    if fields is None and stages is None:
+        return ALL_STAGES, ALL_FIELDS
+
+    unknown = sorted((fields or frozenset()) - ALL_FIELDS) + sorted((stages or frozenset()) - ALL_STAGES)
+    if unknown:
+        raise ValueError(
+            f"Unknown field or stage: {', '.join(unknown)}. "
+            f"Fields: {', '.join(sorted(ALL_FIELDS))}; stages: {', '.join(sorted(ALL_STAGES))}"
+        )
+
+    requested = set(stages or ())
+    returned = set(fields or ())
+    requested.update(FIELD_STAGE[field] for field in returned)
+    for stage in stages or ():
+        returned.update(STAGE_FIELDS[stage])
+
+    pending = list(requested)
+    while pending:
+        for dependency in STAGE_DEPENDENCIES[pending.pop()]:
+            if dependency not in requested:
+                requested.add(dependency)
+                pending.append(dependency)
+    return frozenset(requested), frozenset(returned)
+
+
+def select_fields(result: dict, fields: FrozenSet[str]) -> dict:
+    """Drop output fields that were computed only as dependencies"""
+    return {key: value for key, value in result.items() if key not in ALL_FIELDS or key in fields}
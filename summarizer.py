@@ -1,10 +1,15 @@
-import fitz
 from keybert import KeyBERT
 from transformers import pipeline
 import re
+import time
 import logging
 from functools import lru_cache
-from config import MODEL_CONFIG, FILE_CONFIG, LOGGING_CONFIG
+from config import MODEL_CONFIG, MODEL_TIERS, FILE_CONFIG, LOGGING_CONFIG
+from pdf_parser import (
+    extract_text_from_pdf, extract_text_with_font_info, read_embedded_metadata, parse_pdf
+)
+from timing import StageTimer
+from metrics import MODEL_LOAD_SECONDS
 
 logging.basicConfig(
     level=getattr(logging, LOGGING_CONFIG["level"]),
@@ -12,66 +17,84 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+def _load(name, loader):
+    logger.info(f"Loading {name} model...")
+    start_time = time.perf_counter()
+    model = loader()
+    MODEL_LOAD_SECONDS.set(time.perf_counter() - start_time, model=name)
+    return model
+
+
+@lru_cache(maxsize=1)
+def get_keyword_model():
+    """Load KeyBERT on first use only"""
+    return _load("keyword", lambda: KeyBERT(model=MODEL_CONFIG["keybert_model"]))
+
+
 @lru_cache(maxsize=1)
+def get_summarizer():
+    """Load the summarization pipeline on first use only"""
+    # Use CPU to avoid device issues
+    return _load("summarizer", lambda: pipeline("summarization", model=MODEL_CONFIG["summarizer_model"], device=-1))
+
+
 def get_models():
-    """Cache model loading to avoid reloading on each function call"""
-    logger.info("Loading models...")
-    try:
-        kw_model = KeyBERT(model=MODEL_CONFIG["keybert_model"])
-        summarizer = pipeline("summarization", model=MODEL_CONFIG["summarizer_model"], device=-1)  # Use CPU to avoid device issues
-        return kw_model, summarizer
-    except Exception as e:
-        logger.error(f"Error loading models: {e}")
-        # Fallback to CPU-only models
-        kw_model = KeyBERT(model=MODEL_CONFIG["keybert_model"])
-        summarizer = pipeline("summarization", model=MODEL_CONFIG["summarizer_model"], device=-1)
-        return kw_model, summarizer
+    """Both models, loading whichever is not loaded yet"""
+    return get_keyword_model(), get_summarizer()
 
 
-def extract_text_from_pdf(pdf_path, max_pages=None):
-    """Extract text from PDF with font information for the first page"""
-    if max_pages is None:
-        max_pages = FILE_CONFIG["max_pages_extract"]
-    
-    try:
-        doc = fitz.open(pdf_path)
-        full_text = ""
-        for page in doc[:max_pages]:
-            full_text += page.get_text()
-        doc.close()
-        return full_text
-    except Exception as e:
-        logger.error(f"Error extracting text from PDF: {e}")
-        raise
+def clear_models():
+    """Drop the loaded models so the next use reloads them"""
+    get_keyword_model.cache_clear()
+    get_summarizer.cache_clear()
 
 
-def extract_text_with_font_info(pdf_path):
-    """Extract text with font size information from the first page"""
-    try:
-        doc = fitz.open(pdf_path)
-        if len(doc) == 0:
-            doc.close()
-            return []
-
-        page = doc[0]
-        text_with_font = []
-        blocks = page.get_text("dict")["blocks"]
-
-        for block in blocks:
-            if "lines" in block:
-                for line in block["lines"]:
-                    if "spans" in line:
-                        for span in line["spans"]:
-                            if "text" in span and "size" in span:
-                                text = span["text"].strip()
-                                size = span["size"]
-                                if text:
-                                    text_with_font.append((text, size))
-        doc.close()
-        return text_with_font
-    except Exception as e:
-        logger.error(f"Error extracting font info: {e}")
-        return []
+def apply_model_tier(tier):
+    """Switch MODEL_CONFIG to a MODEL_TIERS preset; models reload on next use"""
+    if tier not in MODEL_TIERS:
+        raise ValueError(f"Unknown model tier: {tier}")
+    MODEL_CONFIG.update(MODEL_TIERS[tier])
+    clear_models()
+
+
+def _normalize_for_match(text):
+    """Lowercase and collapse everything but letters and digits to single spaces"""
+    text = text.replace("-\n", "")
+    return " ".join(re.findall(r'[^\W_]+', text.lower()))
+
+
+def validate_metadata_title(embedded_metadata):
+    """Return the embedded title if it looks genuine and appears on the first page"""
+    title = clean_title(embedded_metadata.get("title", ""))
+    if not title or len(title) <= 10:
+        return None
+    if re.search(r'(^microsoft word\b|^untitled\b|\.(pdf|docx?|tex|dvi)$)', title.lower()):
+        return None
+
+    normalized_title = _normalize_for_match(title)
+    page_text = _normalize_for_match(embedded_metadata.get("first_page_text", ""))
+    if normalized_title and normalized_title in page_text:
+        return title
+    return None
+
+
+def validate_metadata_authors(embedded_metadata):
+    """Return the embedded authors if every surname appears on the first page"""
+    authors = embedded_metadata.get("authors", [])
+    if not authors:
+        return None
+
+    page_words = set(_normalize_for_match(embedded_metadata.get("first_page_text", "")).split())
+    for author in authors:
+        name_parts = _normalize_for_match(author).split()
+        if not name_parts or len(name_parts) > 6:
+            return None
+        if name_parts[0] in {"author", "admin", "administrator", "user", "unknown"}:
+            return None
+        if name_parts[-1] not in page_words:
+            return None
+
+    return ", ".join(authors)
 
 
 def extract_title_from_font_info(text_with_font):
@@ -111,9 +134,28 @@ def extract_title_from_font_info(text_with_font):
 
 def extract_authors(text, title=None, pdf_path=None):
     """Extract author names from the text after the title"""
-    if pdf_path:
+    authors, _ = extract_authors_with_strategy(text, title=title, pdf_path=pdf_path)
+    return authors
+
+
+def extract_authors_with_strategy(text, title=None, pdf_path=None, embedded_metadata=None,
+                                  text_with_font=None):
+    """Extract authors and report which strategy produced them.
+
+    Strategies, in order: "metadata", "font", "text", "first_lines", "none".
+    Pre-parsed embedded_metadata and text_with_font avoid reopening the PDF.
+    """
+    if FILE_CONFIG["use_pdf_metadata"] and (pdf_path or embedded_metadata is not None):
+        if embedded_metadata is None:
+            embedded_metadata = read_embedded_metadata(pdf_path)
+        metadata_authors = validate_metadata_authors(embedded_metadata)
+        if metadata_authors:
+            return metadata_authors, "metadata"
+
+    if pdf_path or text_with_font is not None:
         try:
-            text_with_font = extract_text_with_font_info(pdf_path)
+            if text_with_font is None:
+                text_with_font = extract_text_with_font_info(pdf_path)
 
             if title:
                 title_end_index = -1
@@ -140,7 +182,7 @@ def extract_authors(text, title=None, pdf_path=None):
                             break
 
                     if potential_authors:
-                        return " ".join(potential_authors)
+                        return " ".join(potential_authors), "font"
         except Exception as e:
             logger.error(f"Font-based author extraction error: {e}")
 
@@ -184,7 +226,7 @@ def extract_authors(text, title=None, pdf_path=None):
                 filtered_authors.append(candidate)
 
             if filtered_authors:
-                return " ".join(filtered_authors)
+                return " ".join(filtered_authors), "text"
 
     lines = text.strip().split("\n")
     for i in range(min(10, len(lines))):
@@ -192,9 +234,9 @@ def extract_authors(text, title=None, pdf_path=None):
         if (',' in line and ' and ' in line.lower() and
                 not re.search(r'\b(abstract|introduction|http|www)\b', line.lower()) and
                 len(line) < 150):
-            return line
+            return line, "first_lines"
 
-    return "Authors not found"
+    return "Authors not found", "none"
 
 
 def clean_title(title):
@@ -218,14 +260,32 @@ def clean_title(title):
 def improved_extract_title(text, pdf_path=None):
     """Extract title using multiple strategies for scientific papers.
     If pdf_path is provided, use font information for better accuracy."""
-    if pdf_path:
+    title, _ = extract_title_with_strategy(text, pdf_path=pdf_path)
+    return title
+
+
+def extract_title_with_strategy(text, pdf_path=None, embedded_metadata=None, text_with_font=None):
+    """Extract title and report which strategy produced it.
+
+    Strategies, in order: "metadata", "font", "text", "keybert", "first_line", "none".
+    Pre-parsed embedded_metadata and text_with_font avoid reopening the PDF.
+    """
+    if FILE_CONFIG["use_pdf_metadata"] and (pdf_path or embedded_metadata is not None):
+        if embedded_metadata is None:
+            embedded_metadata = read_embedded_metadata(pdf_path)
+        metadata_title = validate_metadata_title(embedded_metadata)
+        if metadata_title:
+            return metadata_title, "metadata"
+
+    if pdf_path or text_with_font is not None:
         try:
-            text_with_font = extract_text_with_font_info(pdf_path)
+            if text_with_font is None:
+                text_with_font = extract_text_with_font_info(pdf_path)
             font_based_title = extract_title_from_font_info(text_with_font)
             if font_based_title and len(font_based_title) > 10:
                 cleaned_title = clean_title(font_based_title)
                 if cleaned_title and len(cleaned_title) > 10:
-                    return cleaned_title
+                    return cleaned_title, "font"
         except Exception as e:
             logger.error(f"Font-based extraction error: {e}")
 
@@ -277,11 +337,11 @@ def improved_extract_title(text, pdf_path=None):
         raw_title = " ".join(title_lines)
         cleaned_title = clean_title(raw_title)
         if cleaned_title and len(cleaned_title) > 10:
-            return cleaned_title
-        return raw_title
+            return cleaned_title, "text"
+        return raw_title, "text"
 
     try:
-        kw_model, _ = get_models()
+        kw_model = get_keyword_model()
         first_text = " ".join(content_lines[:15])
         keywords = kw_model.extract_keywords(
             first_text,
@@ -293,8 +353,8 @@ def improved_extract_title(text, pdf_path=None):
         if keywords:
             cleaned_keyword = clean_title(keywords[0][0])
             if cleaned_keyword and len(cleaned_keyword) > 10:
-                return cleaned_keyword
-            return keywords[0][0]
+                return cleaned_keyword, "keybert"
+            return keywords[0][0], "keybert"
     except Exception as e:
         logger.error(f"KeyBERT fallback error: {e}")
 
@@ -302,10 +362,54 @@ def improved_extract_title(text, pdf_path=None):
         if len(line) > 15 and len(line) < 200:
             cleaned_line = clean_title(line)
             if cleaned_line and len(cleaned_line) > 10:
-                return cleaned_line
-            return line
+                return cleaned_line, "first_line"
+            return line, "first_line"
+
+    return "Unknown Title", "none"
+
+
+def extract_title_and_authors(text, pdf_path=None, embedded_metadata=None, text_with_font=None,
+                              timer=None):
+    """Extract title and authors, parsing the PDF's metadata and fonts only once.
 
-    return "Unknown Title"
+    Returns a dict with "title", "authors" and "extraction_strategy", which maps
+    each field to the strategy that produced it. An optional StageTimer records
+    the "title" and "authors" stages.
+    """
+    timer = timer or StageTimer()
+
+    if pdf_path and embedded_metadata is None and FILE_CONFIG["use_pdf_metadata"]:
+        with timer.stage("embedded_metadata"):
+            embedded_metadata = read_embedded_metadata(pdf_path)
+
+    if pdf_path and text_with_font is None:
+        served_by_metadata = (
+            FILE_CONFIG["use_pdf_metadata"]
+            and validate_metadata_title(embedded_metadata)
+            and validate_metadata_authors(embedded_metadata)
+        )
+        if not served_by_metadata:
+            with timer.stage("font_parse"):
+                text_with_font = extract_text_with_font_info(pdf_path)
+
+    with timer.stage("title"):
+        title, title_strategy = extract_title_with_strategy(
+            text, pdf_path=pdf_path, embedded_metadata=embedded_metadata,
+            text_with_font=text_with_font
+        )
+    with timer.stage("authors"):
+        authors, authors_strategy = extract_authors_with_strategy(
+            text, title=title, pdf_path=pdf_path, embedded_metadata=embedded_metadata,
+            text_with_font=text_with_font
+        )
+    return {
+        "title": title,
+        "authors": authors,
+        "extraction_strategy": {
+            "title": title_strategy,
+            "authors": authors_strategy
+        }
+    }
 
 
 def clean_text(text):
@@ -318,7 +422,7 @@ def extract_keywords_with_bert(text, top_n=None):
     if top_n is None:
         top_n = MODEL_CONFIG['keywords_top_n']
     
-    kw_model, _ = get_models()
+    kw_model = get_keyword_model()
     keywords = kw_model.extract_keywords(
         text, 
         keyphrase_ngram_range=MODEL_CONFIG['keywords_ngram_range'], 
@@ -329,7 +433,7 @@ def extract_keywords_with_bert(text, top_n=None):
 
 
 def summarize(text):
-    _, summarizer = get_models()
+    summarizer = get_summarizer()
     max_input_length = MODEL_CONFIG["max_input_length"]
     if len(text.split()) > max_input_length:
         text = " ".join(text.split()[:max_input_length])
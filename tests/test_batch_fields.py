@@ -0,0 +1,74 @@
+"""
+Batches that return only some fields while running the full pipeline
+"""
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import fitz
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import batch_processor
+from batch_processor import BatchProcessor
+from dedup import DuplicateDetector
+from scheduler import JobScheduler, CostEstimator
+from config import EXTRACTION_CONFIG, DEDUP_CONFIG
+
+TEXT = ("Near-duplicate detection skips inference for documents that repeat one already seen. "
+        "The original's summary and keywords are reused for every copy in the batch.")
+FIELDS = ["title", "authors", "summary", "keywords"]
+
+
+class NarrowedFieldsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.pdf_paths = []
+        for name in ("original.pdf", "copy.pdf"):
+            path = os.path.join(self.directory, name)
+            doc = fitz.open()
+            doc.new_page().insert_textbox(fitz.Rect(72, 72, 540, 720), TEXT)
+            doc.save(path)
+            doc.close()
+            self.pdf_paths.append(path)
+
+        self.scheduler = JobScheduler(CostEstimator())
+        patches = [
+            mock.patch.dict(EXTRACTION_CONFIG, {"sandboxed": False}),
+            mock.patch.object(batch_processor, "summarize", lambda text: text[:80]),
+            mock.patch.object(batch_processor, "extract_keywords_with_bert", lambda text: ["duplicate"]),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def run_batch(self, deduplicator=None):
+        processor = BatchProcessor(max_workers=1, scheduler=self.scheduler,
+                                   deduplicator=deduplicator, fields=FIELDS)
+        return list(processor.iter_batch(self.pdf_paths))
+
+    def test_duplicates_reuse_results_without_extraction_strategy(self):
+        results = self.run_batch(DuplicateDetector())
+        self.assertEqual([result["status"] for result in results], ["success", "success"])
+        self.assertEqual(sum("duplicate" in result for result in results), 1)
+        for result in results:
+            self.assertEqual(result["keywords"], ["duplicate"])
+            self.assertNotIn("extraction_strategy", result)
+            self.assertNotIn("statistics", result)
+
+    def test_cost_is_recorded_without_statistics(self):
+        with mock.patch.dict(DEDUP_CONFIG, {"enabled": False}):
+            results = self.run_batch()
+        self.assertEqual([result["status"] for result in results], ["success", "success"])
+        self.assertEqual(len(self.scheduler.estimator.history), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+"""
+Chunk offset, conflict and resume handling of resumable upload sessions
+"""
+import os
+import sys
+import shutil
+import hashlib
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from upload_sessions import UploadSessions, UploadSessionError
+
+DATA = bytes(range(256)) * 40  # 10240 bytes
+CHUNK = 4096
+
+
+class UploadSessionsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.state_dir = tempfile.mkdtemp()
+        self.sessions = UploadSessions(self.state_dir)
+        self.session_id = self.sessions.create()["session_id"]
+        self.file_id = self.sessions.add_file(self.session_id, "paper.pdf", len(DATA),
+                                              hashlib.sha256(DATA).hexdigest())["file_id"]
+
+    def tearDown(self):
+        shutil.rmtree(self.state_dir, ignore_errors=True)
+
+    def write(self, offset, data, checksum=None):
+        return self.sessions.write_chunk(self.session_id, self.file_id, offset, data, checksum=checksum)
+
+    def assert_rejected(self, status, received, offset, data, checksum=None):
+        with self.assertRaises(UploadSessionError) as caught:
+            self.write(offset, data, checksum)
+        self.assertEqual(caught.exception.status, status)
+        self.assertEqual(caught.exception.received, received)
+
+    def test_chunks_in_order_complete_the_file(self):
+        for offset in range(0, len(DATA), CHUNK):
+            info = self.write(offset, DATA[offset:offset + CHUNK])
+        self.assertTrue(info["complete"])
+        self.assertEqual(info["received"], len(DATA))
+
+    def test_resent_chunk_is_accepted_without_writing_twice(self):
+        self.write(0, DATA[:CHUNK])
+        info = self.write(0, DATA[:CHUNK])
+        self.assertEqual(info["received"], CHUNK)
+
+    def test_overlapping_chunk_appends_only_new_bytes(self):
+        self.write(0, DATA[:CHUNK])
+        info = self.write(CHUNK // 2, DATA[CHUNK // 2:2 * CHUNK])
+        self.assertEqual(info["received"], 2 * CHUNK)
+
+    def test_gap_is_rejected_with_offset_to_resume_from(self):
+        self.write(0, DATA[:CHUNK])
+        self.assert_rejected(409, CHUNK, 2 * CHUNK, DATA[2 * CHUNK:3 * CHUNK])
+
+    def test_conflicting_chunk_is_rejected(self):
+        self.write(0, DATA[:CHUNK])
+        self.assert_rejected(409, CHUNK, 0, b"x" * CHUNK)
+        self.assertEqual(self.sessions.file_info(self.session_id, self.file_id)["received"], CHUNK)
+
+    def test_chunk_checksum_mismatch_is_rejected(self):
+        self.assert_rejected(400, None, 0, DATA[:CHUNK], checksum="0" * 64)
+        info = self.write(0, DATA[:CHUNK], checksum=hashlib.sha256(DATA[:CHUNK]).hexdigest())
+        self.assertEqual(info["received"], CHUNK)
+
+    def test_chunk_past_declared_size_is_rejected(self):
+        self.assert_rejected(400, None, len(DATA) - 10, DATA[:CHUNK])
+
+    def test_resume_from_reported_offset(self):
+        self.write(0, DATA[:CHUNK])
+        # A new client instance, as after a restart, asks where to resume
+        resumed = UploadSessions(self.state_dir)
+        received = resumed.file_info(self.session_id, self.file_id)["received"]
+        info = resumed.write_chunk(self.session_id, self.file_id, received, DATA[received:])
+        self.assertTrue(info["complete"])
+
+    def test_file_not_matching_its_sha256_restarts_from_zero(self):
+        corrupt = DATA[:-1] + b"\x00"
+        self.write(0, corrupt[:CHUNK])
+        self.assert_rejected(422, 0, CHUNK, corrupt[CHUNK:])
+        self.assertEqual(self.sessions.file_info(self.session_id, self.file_id)["received"], 0)
+        self.assertTrue(self.write(0, DATA)["complete"])
+
+    def test_chunk_after_completion_is_a_no_op(self):
+        self.write(0, DATA)
+        info = self.write(0, DATA[:CHUNK])
+        self.assertTrue(info["complete"])
+
+    def test_commit_needs_complete_files_and_starts_one_job(self):
+        started = []
+
+        def start_job(paths, names):
+            started.append((paths, names))
+            return "0" * 32
+
+        with self.assertRaises(UploadSessionError) as caught:
+            self.sessions.commit(self.session_id, start_job)
+        self.assertEqual(caught.exception.status, 409)
+
+        self.write(0, DATA)
+        session = self.sessions.commit(self.session_id, start_job)
+        self.assertEqual(session["job_id"], "0" * 32)
+        self.assertTrue(session["committed"])
+        self.sessions.commit(self.session_id, start_job)
+        self.assertEqual(len(started), 1)
+        paths, names = started[0]
+        self.assertEqual(list(names.values()), ["paper.pdf"])
+        with open(paths[0], 'rb') as f:
+            self.assertEqual(f.read(), DATA)
+
+    def test_failed_job_start_leaves_session_open(self):
+        self.write(0, DATA)
+
+        def start_job(paths, names):
+            raise RuntimeError("Not accepting jobs while shutting down")
+
+        with self.assertRaises(RuntimeError):
+            self.sessions.commit(self.session_id, start_job)
+        self.assertFalse(self.sessions.info(self.session_id)["committed"])
+
+
+if __name__ == "__main__":
+    unittest.main()
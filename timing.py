@@ -0,0 +1,80 @@
+"""
+Per-stage timing instrumentation and latency aggregation
+"""
+import time
+import random
+from contextlib import contextmanager
+from typing import List, Dict, Any
+
+
+class StageTimer:
+    """Record wall-clock and CPU seconds for named processing stages.
+
+    CPU time is measured with time.thread_time, so it covers the calling thread
+    only; work the models hand off to their own thread pools is not included.
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, Dict[str, float]] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - wall_start, time.thread_time() - cpu_start)
+
+    def add(self, name: str, wall: float, cpu: float):
+        """Add time to a stage, accumulating if it was already recorded"""
+        recorded = self.stages.setdefault(name, {"wall": 0.0, "cpu": 0.0})
+        recorded["wall"] += wall
+        recorded["cpu"] += cpu
+
+    def merge(self, stages: Dict[str, Dict[str, float]]):
+        for name, recorded in stages.items():
+            self.add(name, recorded["wall"], recorded["cpu"])
+
+    def as_dict(self) -> Dict[str, Dict[str, float]]:
+        return {name: dict(recorded) for name, recorded in self.stages.items()}
+
+
+class LatencyReservoir:
+    """Running count, mean and max plus percentiles over a bounded random sample"""
+
+    def __init__(self, capacity: int = 10000):
+        self.capacity = capacity
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._sample: List[float] = []
+
+    def add(self, value: float):
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        if len(self._sample) < self.capacity:
+            self._sample.append(value)
+        else:
+            index = random.randrange(self.count)
+            if index < self.capacity:
+                self._sample[index] = value
+
+    def summary(self) -> Dict[str, Any]:
+        ordered = sorted(self._sample)
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": _percentile(ordered, 50),
+            "p90": _percentile(ordered, 90),
+            "p99": _percentile(ordered, 99),
+            "max": self.max
+        }
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
@@ -0,0 +1,314 @@
+"""
+Resumable chunked upload sessions for large batch submissions
+"""
+import os
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from werkzeug.utils import secure_filename
+
+from uploads import UploadError
+from archives import is_archive
+from config import UPLOAD_SESSION_CONFIG, ARCHIVE_CONFIG, FILE_CONFIG
+
+# Serializes chunk writes across serve.py worker processes; without it (Windows)
+# writes are serialized within one process only
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+
+def _valid_id(value: str) -> bool:
+    # Session and file ids are hex uuids; anything else cannot name a file
+    return bool(value) and all(c in "0123456789abcdef" for c in value)
+
+
+class UploadSessionError(UploadError):
+    """A rejected session operation; received is the offset to resume from, when relevant"""
+
+    def __init__(self, message: str, status: int = 400, received: Optional[int] = None):
+        super().__init__(message, status)
+        self.received = received
+
+    def to_dict(self) -> Dict[str, Any]:
+        error = {"error": str(self)}
+        if self.received is not None:
+            error["received"] = self.received
+        return error
+
+
+class UploadSessions:
+    """Upload sessions kept on disk so any API worker process can take any chunk.
+
+    A session holds declared files, each written by chunks at explicit offsets.
+    Chunks are idempotent: a chunk resent after a lost response is accepted if
+    it matches what was already received. A file whose bytes (and declared
+    SHA-256) are complete is moved into place; commit() hands the session's
+    files to processing once all of them are.
+    """
+
+    def __init__(self, state_dir: Optional[str] = None):
+        self.state_dir = state_dir or UPLOAD_SESSION_CONFIG["state_dir"]
+        os.makedirs(self.state_dir, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _dir(self, session_id: str) -> str:
+        if not _valid_id(session_id):
+            raise UploadSessionError("Upload session not found or expired", 404)
+        path = os.path.join(self.state_dir, session_id)
+        if not os.path.isdir(path):
+            raise UploadSessionError("Upload session not found or expired", 404)
+        return path
+
+    def _file_path(self, session_dir: str, file_id: str, suffix: str) -> str:
+        return os.path.join(session_dir, "files", f"{file_id}{suffix}")
+
+    def _read_json(self, path: str) -> Dict[str, Any]:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write_json(self, path: str, data: Dict[str, Any]):
+        with open(path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+
+    def _touch(self, session_dir: str):
+        # The session directory's mtime records its last activity
+        os.utime(session_dir)
+
+    @contextmanager
+    def _file_lock(self, session_dir: str, file_id: str):
+        with open(self._file_path(session_dir, file_id, ".lock"), 'a') as handle:
+            if fcntl is None:
+                with self._lock:
+                    yield
+                return
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def create(self, files: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """Start a session, optionally declaring its files up front"""
+        self.purge_expired()
+        session_id = uuid.uuid4().hex
+        session_dir = os.path.join(self.state_dir, session_id)
+        os.makedirs(os.path.join(session_dir, "files"))
+        self._write_json(os.path.join(session_dir, "session.json"), {
+            "session_id": session_id,
+            "created_at": datetime.now().isoformat(),
+            "job_id": None
+        })
+        try:
+            for declared in files or []:
+                self.add_file(session_id, declared.get("name", ""), declared.get("size"), declared.get("sha256"))
+        except UploadSessionError:
+            shutil.rmtree(session_dir, ignore_errors=True)
+            raise
+        logger.info(f"Created upload session {session_id}")
+        return self.info(session_id)
+
+    def add_file(self, session_id: str, name: str, size: Any, sha256: Optional[str] = None) -> Dict[str, Any]:
+        """Declare a file of size bytes; its SHA-256, if given, is checked once it is complete"""
+        session_dir = self._dir(session_id)
+        if os.path.exists(os.path.join(session_dir, "committed")):
+            raise UploadSessionError("Session is already committed", 409)
+        if not name.lower().endswith(".pdf") and not is_archive(name):
+            raise UploadSessionError(f"Invalid file type: {name}. Only PDF, ZIP and TAR files are allowed")
+        max_size = (ARCHIVE_CONFIG["max_upload_size_mb"] if is_archive(name) else FILE_CONFIG["max_file_size_mb"]) * MB
+        if not isinstance(size, int) or isinstance(size, bool) or not 0 < size <= max_size:
+            raise UploadSessionError(f"size of {name} must be a whole number of bytes up to {max_size // MB}MB")
+        if sha256 is not None and (len(sha256) != 64 or not _valid_id(sha256.lower())):
+            raise UploadSessionError(f"sha256 of {name} must be 64 hex digits")
+
+        declared = self._declared(session_dir)
+        if len(declared) >= UPLOAD_SESSION_CONFIG["max_files"]:
+            raise UploadSessionError(f"A session holds at most {UPLOAD_SESSION_CONFIG['max_files']} files", 413)
+        if sum(meta["size"] for meta in declared) + size > UPLOAD_SESSION_CONFIG["max_session_size_mb"] * MB:
+            raise UploadSessionError(
+                f"A session holds at most {UPLOAD_SESSION_CONFIG['max_session_size_mb']}MB", 413
+            )
+
+        file_id = uuid.uuid4().hex[:16]
+        meta = {
+            "file_id": file_id,
+            "name": name,
+            "safe_name": secure_filename(name) or "upload.pdf",
+            "size": size,
+            "sha256": sha256.lower() if sha256 else None
+        }
+        self._write_json(self._file_path(session_dir, file_id, ".json"), meta)
+        self._touch(session_dir)
+        return self._file_info(session_dir, meta)
+
+    def _declared(self, session_dir: str) -> List[Dict[str, Any]]:
+        metas = []
+        for entry in os.scandir(os.path.join(session_dir, "files")):
+            if entry.name.endswith(".json"):
+                try:
+                    metas.append(self._read_json(entry.path))
+                except (OSError, ValueError):
+                    pass
+        return metas
+
+    def _meta(self, session_dir: str, file_id: str) -> Dict[str, Any]:
+        if not _valid_id(file_id):
+            raise UploadSessionError("File not found in upload session", 404)
+        try:
+            return self._read_json(self._file_path(session_dir, file_id, ".json"))
+        except (OSError, ValueError):
+            raise UploadSessionError("File not found in upload session", 404)
+
+    def _final_path(self, session_dir: str, meta: Dict[str, Any]) -> str:
+        # Stored under the file's own name so results report it as the file name
+        return os.path.join(self._file_path(session_dir, meta["file_id"], ""), meta["safe_name"])
+
+    def _file_info(self, session_dir: str, meta: Dict[str, Any]) -> Dict[str, Any]:
+        complete = os.path.exists(self._file_path(session_dir, meta["file_id"], ".done"))
+        part = self._file_path(session_dir, meta["file_id"], ".part")
+        received = meta["size"] if complete else (os.path.getsize(part) if os.path.exists(part) else 0)
+        return {
+            "file_id": meta["file_id"],
+            "name": meta["name"],
+            "size": meta["size"],
+            "received": received,
+            "complete": complete
+        }
+
+    def file_info(self, session_id: str, file_id: str) -> Dict[str, Any]:
+        session_dir = self._dir(session_id)
+        return self._file_info(session_dir, self._meta(session_dir, file_id))
+
+    def write_chunk(self, session_id: str, file_id: str, offset: int, data: bytes,
+                    checksum: Optional[str] = None) -> Dict[str, Any]:
+        """Write data at offset; resending a chunk already received is a no-op.
+
+        offset may not skip past the bytes received so far; the error then
+        carries the offset to resume from. checksum is the chunk's SHA-256.
+        """
+        session_dir = self._dir(session_id)
+        meta = self._meta(session_dir, file_id)
+        if len(data) > UPLOAD_SESSION_CONFIG["max_chunk_size"]:
+            raise UploadSessionError(f"Chunks may be at most {UPLOAD_SESSION_CONFIG['max_chunk_size'] // MB}MB", 413)
+        if checksum and hashlib.sha256(data).hexdigest() != checksum.strip().lower():
+            raise UploadSessionError("Chunk checksum mismatch")
+        end = offset + len(data)
+        if offset < 0 or end > meta["size"]:
+            raise UploadSessionError(f"Chunk [{offset}, {end}) is outside the file's {meta['size']} bytes")
+
+        part = self._file_path(session_dir, file_id, ".part")
+        with self._file_lock(session_dir, file_id):
+            if os.path.exists(self._file_path(session_dir, file_id, ".done")):
+                return self._file_info(session_dir, meta)
+            received = os.path.getsize(part) if os.path.exists(part) else 0
+            if offset > received:
+                raise UploadSessionError(f"Expected a chunk at offset {received}", 409, received)
+            with open(part, 'a+b') as f:
+                if offset < received:
+                    f.seek(offset)
+                    if f.read(min(end, received) - offset) != data[:received - offset]:
+                        raise UploadSessionError("Chunk conflicts with data already received", 409, received)
+                # Append mode writes at the end whatever the read position
+                f.write(data[received - offset:])
+            if max(received, end) == meta["size"]:
+                self._complete(session_dir, meta)
+        self._touch(session_dir)
+        return self._file_info(session_dir, meta)
+
+    def _complete(self, session_dir: str, meta: Dict[str, Any]):
+        """Verify a fully received file and move it into place for processing"""
+        part = self._file_path(session_dir, meta["file_id"], ".part")
+        if meta["sha256"]:
+            digest = hashlib.sha256()
+            with open(part, 'rb') as f:
+                for block in iter(lambda: f.read(MB), b""):
+                    digest.update(block)
+            if digest.hexdigest() != meta["sha256"]:
+                os.unlink(part)
+                raise UploadSessionError(f"{meta['name']} does not match its sha256; upload it again", 422, 0)
+        final = self._final_path(session_dir, meta)
+        os.makedirs(os.path.dirname(final), exist_ok=True)
+        os.replace(part, final)
+        open(self._file_path(session_dir, meta["file_id"], ".done"), 'w').close()
+        logger.info(f"Received {meta['name']} ({meta['size']} bytes) in upload session {os.path.basename(session_dir)}")
+
+    def info(self, session_id: str) -> Dict[str, Any]:
+        """Session state with each file's progress"""
+        session_dir = self._dir(session_id)
+        session = self._read_json(os.path.join(session_dir, "session.json"))
+        files = sorted((self._file_info(session_dir, meta) for meta in self._declared(session_dir)),
+                       key=lambda info: info["name"])
+        session.update({
+            "committed": os.path.exists(os.path.join(session_dir, "committed")),
+            "files": files,
+            "total_bytes": sum(info["size"] for info in files),
+            "received_bytes": sum(info["received"] for info in files)
+        })
+        return session
+
+    def commit(self, session_id: str, start_job: Callable[[List[str], Dict[str, str]], str]) -> Dict[str, Any]:
+        """Close the session once every declared file is complete and start processing it.
+
+        start_job(paths, names) is called once, by whichever request commits
+        first, with the completed files and their original names, and returns
+        the id of the job processing them. Committing again, e.g. after a lost
+        response, returns the session as it stands.
+        """
+        session_dir = self._dir(session_id)
+        metas = self._declared(session_dir)
+        if not metas:
+            raise UploadSessionError("No files declared in upload session")
+        incomplete = [meta["name"] for meta in metas if not self._file_info(session_dir, meta)["complete"]]
+        if incomplete:
+            raise UploadSessionError(f"Files not yet complete: {', '.join(sorted(incomplete))}", 409)
+
+        marker = os.path.join(session_dir, "committed")
+        try:
+            os.close(os.open(marker, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            return self.info(session_id)
+        try:
+            paths = {self._final_path(session_dir, meta): meta["name"] for meta in metas}
+            job_id = start_job(list(paths), paths)
+        except Exception:
+            # Leave the session open so the commit can be retried
+            os.unlink(marker)
+            raise
+        path = os.path.join(session_dir, "session.json")
+        session = self._read_json(path)
+        session["job_id"] = job_id
+        self._write_json(path, session)
+        self._touch(session_dir)
+        return self.info(session_id)
+
+    def delete(self, session_id: str) -> bool:
+        try:
+            session_dir = self._dir(session_id)
+        except UploadSessionError:
+            return False
+        shutil.rmtree(session_dir, ignore_errors=True)
+        return True
+
+    def purge_expired(self):
+        """Remove sessions inactive for longer than retention_seconds"""
+        now = time.time()
+        for entry in os.scandir(self.state_dir):
+            try:
+                if entry.is_dir() and now - entry.stat().st_mtime > UPLOAD_SESSION_CONFIG["retention_seconds"]:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+            except OSError:
+                pass
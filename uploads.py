@@ -0,0 +1,144 @@
+"""
+Streaming multipart upload handling with in-memory spooling
+"""
+import os
+import uuid
+import hashlib
+import shutil
+import logging
+import tempfile
+from io import BytesIO
+from typing import Iterator, Optional, Tuple, BinaryIO
+
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.http import parse_options_header
+from werkzeug.sansio.multipart import MultipartDecoder, File, Data, Epilogue, NeedData
+from werkzeug.utils import secure_filename
+
+from archives import is_archive
+from config import UPLOAD_CONFIG, FILE_CONFIG, ARCHIVE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+class UploadError(ValueError):
+    """A malformed or oversized upload, with the HTTP status to answer it with"""
+
+    kind = "upload"
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+class SpooledUpload:
+    """One uploaded file, held in memory until it grows past spool_max_size.
+
+    Larger files spill to a temporary file named after the upload. Either way the
+    name handed to the pipeline is unique per upload and its basename is the
+    uploaded file name.
+    """
+
+    def __init__(self, filename: str, spool_max_size: int):
+        self.filename = filename
+        self.safe_name = secure_filename(filename) or "upload.pdf"
+        self.name = os.path.join(f"upload-{uuid.uuid4().hex[:12]}", self.safe_name)
+        self.spool_max_size = spool_max_size
+        self.size = 0
+        self._digest = hashlib.sha256()
+        self.path: Optional[str] = None
+        self._buffer: Optional[BytesIO] = BytesIO()
+        self._file: Optional[BinaryIO] = None
+        self._dir: Optional[str] = None
+
+    def write(self, chunk: bytes):
+        self.size += len(chunk)
+        self._digest.update(chunk)
+        if self._buffer is not None and self.size > self.spool_max_size:
+            self._dir = tempfile.mkdtemp(prefix="upload-")
+            self.path = os.path.join(self._dir, self.safe_name)
+            self._file = open(self.path, 'wb')
+            self._file.write(self._buffer.getbuffer())
+            self._buffer = None
+        if self._file is not None:
+            self._file.write(chunk)
+        else:
+            self._buffer.write(chunk)
+
+    def finish(self):
+        if self._file is not None:
+            self._file.close()
+
+    @property
+    def content_hash(self) -> str:
+        """SHA-256 of the contents received so far, as job_journal.file_content_hash"""
+        return self._digest.hexdigest()
+
+    @property
+    def in_memory(self) -> bool:
+        return self._buffer is not None
+
+    def source(self) -> Tuple[str, Optional[bytes]]:
+        """(name or path, bytes or None) as accepted by parse_document and iter_batch"""
+        if self.in_memory:
+            return self.name, self._buffer.getvalue()
+        return self.path, None
+
+    def cleanup(self):
+        self.finish()
+        self._buffer = None
+        if self._dir:
+            shutil.rmtree(self._dir, ignore_errors=True)
+            self._dir = None
+
+
+def iter_uploads(stream: BinaryIO, content_type: Optional[str], field_name: str,
+                 spool_max_size: Optional[int] = None, allow_archives: bool = False) -> Iterator[SpooledUpload]:
+    """Yield each file of a multipart body under field_name as soon as it has been received.
+
+    The body is read in chunks while the caller works on earlier files. Parts of
+    other fields are skipped. The caller owns and must clean up yielded uploads.
+    With allow_archives, ZIP and TAR files may be up to the archive upload limit.
+    """
+    spool_max_size = spool_max_size if spool_max_size is not None else UPLOAD_CONFIG["spool_max_size"]
+    max_pdf_size = FILE_CONFIG["max_file_size_mb"] * 1024 * 1024
+    max_archive_size = ARCHIVE_CONFIG["max_upload_size_mb"] * 1024 * 1024
+    max_file_size = max_pdf_size
+    mimetype, options = parse_options_header(content_type or "")
+    if mimetype != "multipart/form-data" or "boundary" not in options:
+        raise UploadError("Expected a multipart/form-data upload")
+
+    decoder = MultipartDecoder(options["boundary"].encode("latin-1"), max_parts=UPLOAD_CONFIG["max_parts"])
+    current: Optional[SpooledUpload] = None
+    try:
+        while True:
+            chunk = stream.read(UPLOAD_CONFIG["chunk_size"])
+            decoder.receive_data(chunk or None)
+            event = decoder.next_event()
+            while not isinstance(event, (NeedData, Epilogue)):
+                if isinstance(event, File) and event.name == field_name:
+                    current = SpooledUpload(event.filename, spool_max_size)
+                    archive = allow_archives and is_archive(event.filename)
+                    max_file_size = max_archive_size if archive else max_pdf_size
+                elif isinstance(event, Data) and current is not None:
+                    current.write(event.data)
+                    if current.size > max_file_size:
+                        raise UploadError(
+                            f"{current.filename} is larger than {max_file_size // (1024 * 1024)}MB", 413
+                        )
+                    if not event.more_data:
+                        current.finish()
+                        upload, current = current, None
+                        yield upload
+                event = decoder.next_event()
+            if isinstance(event, Epilogue) or not chunk:
+                return
+    except UploadError:
+        raise
+    except RequestEntityTooLarge:
+        raise UploadError("Upload too large", 413)
+    except ValueError as e:
+        raise UploadError(f"Malformed multipart upload: {e}")
+    finally:
+        if current is not None:
+            current.cleanup()
@@ -180,11 +180,16 @@ class DocumentVisualizer:
         if self.df.empty:
             return go.Figure()
         
-        # Extract processing times (simplified)
+        # Use measured processing times, estimating from file size for older results
         processing_times = []
         for i, doc in enumerate(self.results):
-            # Simulate processing time based on file size
-            processing_time = doc['file_size'] / (1024 * 1024) * 0.1  # Rough estimate
+            timings = doc.get('timings', {})
+            if 'total_wall' in timings:
+                processing_time = timings['total_wall']
+            elif timings.get('stages'):
+                processing_time = sum(stage['wall'] for stage in timings['stages'].values())
+            else:
+                processing_time = doc['file_size'] / (1024 * 1024) * 0.1  # Rough estimate
             processing_times.append(processing_time)
         
         cumulative_time = np.cumsum(processing_times)
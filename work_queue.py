@@ -0,0 +1,286 @@
+"""
+Durable SQLite work queue with leases for multi-process and multi-host batches
+"""
+import os
+import time
+import socket
+import sqlite3
+import argparse
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Iterable
+
+from config import QUEUE_CONFIG, BATCH_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+def default_worker_id() -> str:
+    """Identify this process across hosts as host:pid"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class WorkQueue:
+    """Queue of PDF paths in a SQLite file that any number of workers can lease from.
+
+    A lease gives one worker exclusive use of a job until it expires; workers
+    extend their leases with heartbeat() and finish with complete() or fail().
+    Expired leases are reclaimed by the next lease() call from any worker, so a
+    crashed worker's jobs are picked up without a broker. Lease expiry uses wall
+    clock time, so hosts sharing a queue need synchronised clocks. The rollback
+    journal is used rather than WAL so the file can live on a network filesystem.
+    """
+
+    def __init__(self, queue_path: Optional[str] = None, lease_timeout: Optional[float] = None,
+                 max_attempts: Optional[int] = None, retry_delay: Optional[float] = None):
+        self.queue_path = queue_path or QUEUE_CONFIG["path"]
+        self.lease_timeout = lease_timeout or QUEUE_CONFIG["lease_timeout"]
+        self.max_attempts = max_attempts or QUEUE_CONFIG["max_attempts"]
+        self.retry_delay = retry_delay if retry_delay is not None else QUEUE_CONFIG["retry_delay"]
+
+        queue_dir = os.path.dirname(self.queue_path)
+        if queue_dir:
+            os.makedirs(queue_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.queue_path, timeout=QUEUE_CONFIG["busy_timeout"],
+                                     isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._transaction():
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, path TEXT NOT NULL UNIQUE, "
+                "priority INTEGER NOT NULL DEFAULT 0, predicted_cost REAL NOT NULL DEFAULT 0, "
+                "status TEXT NOT NULL DEFAULT 'pending', attempts INTEGER NOT NULL DEFAULT 0, "
+                "lease_owner TEXT, lease_expires REAL, available_at REAL NOT NULL DEFAULT 0, "
+                "error TEXT, enqueued_at TEXT, finished_at TEXT)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS jobs_dispatch ON jobs (status, priority, predicted_cost)"
+            )
+
+    @contextmanager
+    def _transaction(self):
+        """Serialise writers across threads, processes and hosts with BEGIN IMMEDIATE"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def enqueue(self, pdf_paths: Iterable[str], priorities: Optional[Dict[str, int]] = None,
+                predicted_costs: Optional[Dict[str, float]] = None) -> int:
+        """Add paths not already queued; returns how many were added.
+
+        Paths are stored as absolute paths, so workers running in other
+        directories can open them. Jobs are leased by priority, then longest
+        predicted cost first.
+        """
+        priorities = priorities or {}
+        predicted_costs = predicted_costs or {}
+        enqueued_at = datetime.now().isoformat()
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO jobs (path, priority, predicted_cost, enqueued_at) VALUES (?, ?, ?, ?)",
+                ((os.path.abspath(path), priorities.get(path, 0), predicted_costs.get(path, 0.0), enqueued_at)
+                 for path in pdf_paths)
+            )
+            return conn.total_changes - before
+
+    def lease(self, worker_id: str, count: int = 1, lease_timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Lease up to count pending or expired jobs; returns [{"id", "path", "attempts"}]"""
+        now = time.time()
+        lease_timeout = lease_timeout or self.lease_timeout
+        with self._transaction() as conn:
+            # Jobs whose lease expired on their last allowed attempt have
+            # probably been killing their workers; give up on them
+            abandoned = conn.execute(
+                "UPDATE jobs SET status = 'failed', error = 'lease expired', lease_owner = NULL, "
+                "finished_at = ? WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (datetime.now().isoformat(), now, self.max_attempts)
+            ).rowcount
+            if abandoned:
+                logger.warning(f"Gave up on {abandoned} jobs whose leases expired {self.max_attempts} times")
+
+            rows = conn.execute(
+                "SELECT id, path, attempts, status FROM jobs "
+                "WHERE (status = 'pending' AND available_at <= ?) OR (status = 'leased' AND lease_expires < ?) "
+                "ORDER BY priority DESC, predicted_cost DESC, id LIMIT ?",
+                (now, now, count)
+            ).fetchall()
+            reclaimed = sum(1 for row in rows if row["status"] == "leased")
+            if reclaimed:
+                logger.info(f"Reclaimed {reclaimed} expired leases for {worker_id}")
+            conn.executemany(
+                "UPDATE jobs SET status = 'leased', lease_owner = ?, lease_expires = ?, "
+                "attempts = attempts + 1 WHERE id = ?",
+                [(worker_id, now + lease_timeout, row["id"]) for row in rows]
+            )
+        return [{"id": row["id"], "path": row["path"], "attempts": row["attempts"] + 1} for row in rows]
+
+    def heartbeat(self, job_ids: List[int], worker_id: str, lease_timeout: Optional[float] = None) -> int:
+        """Extend leases still held by worker_id; returns how many were extended"""
+        if not job_ids:
+            return 0
+        expires = time.time() + (lease_timeout or self.lease_timeout)
+        with self._transaction() as conn:
+            return sum(
+                conn.execute(
+                    "UPDATE jobs SET lease_expires = ? WHERE id = ? AND lease_owner = ? AND status = 'leased'",
+                    (expires, job_id, worker_id)
+                ).rowcount
+                for job_id in job_ids
+            )
+
+    def complete(self, job_id: int, worker_id: str) -> bool:
+        """Mark a leased job done; False if the lease was lost to another worker"""
+        with self._transaction() as conn:
+            return conn.execute(
+                "UPDATE jobs SET status = 'done', lease_owner = NULL, lease_expires = NULL, "
+                "error = NULL, finished_at = ? WHERE id = ? AND lease_owner = ? AND status = 'leased'",
+                (datetime.now().isoformat(), job_id, worker_id)
+            ).rowcount == 1
+
+    def fail(self, job_id: int, worker_id: str, error: str, retry: bool = True) -> bool:
+        """Release a leased job for another attempt after a backoff, or fail it for good.
+
+        Returns False if the lease was lost to another worker.
+        """
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT attempts FROM jobs WHERE id = ? AND lease_owner = ? AND status = 'leased'",
+                (job_id, worker_id)
+            ).fetchone()
+            if row is None:
+                return False
+            if retry and row["attempts"] < self.max_attempts:
+                conn.execute(
+                    "UPDATE jobs SET status = 'pending', lease_owner = NULL, lease_expires = NULL, "
+                    "error = ?, available_at = ? WHERE id = ?",
+                    (error, time.time() + self.retry_delay * row["attempts"], job_id)
+                )
+            else:
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', lease_owner = NULL, lease_expires = NULL, "
+                    "error = ?, finished_at = ? WHERE id = ?",
+                    (error, datetime.now().isoformat(), job_id)
+                )
+            return True
+
+    def retry_failed(self) -> int:
+        """Return failed jobs to pending with a fresh attempt count"""
+        with self._transaction() as conn:
+            return conn.execute(
+                "UPDATE jobs SET status = 'pending', attempts = 0, available_at = 0, finished_at = NULL "
+                "WHERE status = 'failed'"
+            ).rowcount
+
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs per status"""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {"pending": 0, "leased": 0, "done": 0, "failed": 0}
+        counts.update({status: count for status, count in rows})
+        return counts
+
+    def is_drained(self) -> bool:
+        """True when no job is pending or leased by any worker"""
+        counts = self.counts()
+        return counts["pending"] == 0 and counts["leased"] == 0
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class LeaseKeeper:
+    """Background thread that heartbeats every lease a worker currently holds"""
+
+    def __init__(self, queue: WorkQueue, worker_id: str, interval: Optional[float] = None):
+        self.queue = queue
+        self.worker_id = worker_id
+        self.interval = interval or QUEUE_CONFIG["heartbeat_interval"] or queue.lease_timeout / 3
+        self._job_ids = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="lease-heartbeat", daemon=True)
+
+    def add(self, job_id: int):
+        with self._lock:
+            self._job_ids.add(job_id)
+
+    def discard(self, job_id: int):
+        with self._lock:
+            self._job_ids.discard(job_id)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                job_ids = list(self._job_ids)
+            try:
+                extended = self.queue.heartbeat(job_ids, self.worker_id)
+                if extended < len(job_ids):
+                    logger.warning(f"{self.worker_id} lost {len(job_ids) - extended} leases")
+            except sqlite3.Error as e:
+                logger.error(f"Lease heartbeat failed: {e}")
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+def main():
+    from batch_processor import BatchProcessor, find_pdf_files
+    from result_sinks import create_sink
+
+    parser = argparse.ArgumentParser(description="Shared SQLite work queue for batch processing")
+    parser.add_argument("--queue", default=QUEUE_CONFIG["path"], help="SQLite queue path")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    enqueue_parser = commands.add_parser("enqueue", help="Queue every PDF under the given directories")
+    enqueue_parser.add_argument("directories", nargs="+")
+
+    work_parser = commands.add_parser("work", help="Lease and process jobs until the queue is drained")
+    work_parser.add_argument("--sink", choices=["jsonl", "csv", "sqlite"], default="jsonl")
+    work_parser.add_argument("--output", help="Result path; defaults to one file per worker under exports/")
+    work_parser.add_argument("--workers", type=int, default=BATCH_CONFIG["max_workers"])
+    work_parser.add_argument("--follow", action="store_true", help="Keep polling for new jobs when drained")
+
+    commands.add_parser("status", help="Print job counts per status")
+    commands.add_parser("retry-failed", help="Return failed jobs to the queue")
+    args = parser.parse_args()
+
+    with WorkQueue(args.queue) as queue:
+        if args.command == "enqueue":
+            added = sum(queue.enqueue(find_pdf_files(directory)) for directory in args.directories)
+            logger.info(f"Queued {added} new files in {args.queue}")
+        elif args.command == "work":
+            worker_id = default_worker_id()
+            output = args.output or os.path.join(
+                "exports", f"queue_results_{worker_id.replace(':', '_')}.{args.sink}"
+            )
+            processor = BatchProcessor(max_workers=args.workers)
+            with create_sink(args.sink, output) as sink:
+                summary = processor.run_queue(queue, sinks=[sink], worker_id=worker_id, follow=args.follow)
+            logger.info(f"{worker_id} finished: {summary['successful']} successful, {summary['failed']} failed")
+        elif args.command == "retry-failed":
+            logger.info(f"Requeued {queue.retry_failed()} failed jobs")
+        logger.info(f"Queue {args.queue}: {queue.counts()}")
+
+
+if __name__ == "__main__":
+    main()